@@ -0,0 +1 @@
+"""init for common package."""
@@ -0,0 +1,233 @@
+"""Attribution of the blocked wall time to the call sites of the test set.
+
+When enabled, the calls where the host process waits are timed:
+    - time.sleep
+    - pexpect expect (target sessions, pexpect.run...), with its timeout
+    - subprocess runs and waits (run, call, check_output...) and os.system
+Each blocking call is attributed to the innermost frame of a test module
+which led to it, e.g. the test line calling legato.make_install for the
+subprocess waits of mkapp, or wait_for_system_ready for its polls. The
+helpers of common and the conftests are skipped; a call made from them only
+(hooks, session fixtures) is attributed to their innermost frame. Only the outermost
+blocking call is counted when they are nested (an expect inside pexpect.run).
+The report aggregates the calls per file:line over the whole campaign: it
+points at the fixed waits worth converting to event-driven waits.
+
+Environment variables:
+    LETP_BLOCKING_PROFILE: json report file. Unset disables the profiler.
+    LETP_BLOCKING_PROFILE_TOP: number of call sites displayed (default 15)
+"""
+import collections
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pexpect
+import pexpect.spawnbase
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+SLEEP = "sleep"
+EXPECT = "expect"
+SUBPROCESS = "subprocess"
+
+TEST_SET_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Wrappers of the blocking functions, never reported as call sites
+WRAPPER_FILES = (
+    os.path.abspath(__file__),
+    os.path.join(COMMON_DIR, "tracing.py"),
+)
+
+SiteStats = collections.namedtuple(
+    "SiteStats", ["site", "kind", "calls", "total", "max", "timeouts", "timeout_total"]
+)
+
+_profiler = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def _is_helper(file_name):
+    """Tell whether a file is a helper of the tests (common, conftest)."""
+    return (
+        file_name.startswith(COMMON_DIR + os.sep)
+        or os.path.basename(file_name) == "conftest.py"
+    )
+
+
+def get_call_site(root=TEST_SET_ROOT):
+    """Get the innermost frame of a test module in the current stack.
+
+    :param root: root directory of the test set
+
+    :returns: "relative/path.py:line" of the test module, else of the
+              innermost helper of the test set, or "<external>" if none
+    """
+    helper = None
+    frame = sys._getframe(1)  # pylint: disable=protected-access
+    while frame is not None:
+        file_name = frame.f_code.co_filename
+        if file_name.startswith(root + os.sep) and file_name not in WRAPPER_FILES:
+            site = "%s:%d" % (os.path.relpath(file_name, root), frame.f_lineno)
+            if not _is_helper(file_name):
+                return site
+            helper = helper or site
+        frame = frame.f_back
+    return helper or "<external>"
+
+
+def register(config):
+    """Register the profiler plugin if LETP_BLOCKING_PROFILE is set.
+
+    :param config: pytest config
+    """
+    global _profiler
+    report_file = os.environ.get("LETP_BLOCKING_PROFILE")
+    if report_file and _profiler is None:
+        _profiler = BlockingProfiler(
+            report_file, int(os.environ.get("LETP_BLOCKING_PROFILE_TOP", "15"))
+        )
+        _profiler.install()
+        config.pluginmanager.register(_profiler, "letp_blocking_profiler")
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class BlockingProfiler:
+    """Pytest plugin aggregating the blocked time per call site."""
+
+    def __init__(self, report_file, top=15, root=TEST_SET_ROOT):
+        self.report_file = report_file
+        self.top = top
+        self.root = root
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # [calls, total, max, timeouts, timeout_total] by (site, kind)
+        self.stats = collections.defaultdict(lambda: [0, 0.0, 0.0, 0, 0.0])
+        self.originals = []
+
+    def _record(self, site, kind, duration, timeout=None, timed_out=False):
+        """Add a blocking call to the statistics."""
+        with self.lock:
+            stats = self.stats[(site, kind)]
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            if timed_out:
+                stats[3] += 1
+            if timeout:
+                stats[4] += timeout
+
+    def wrap(self, func, kind, get_timeout=None):
+        """Wrap a blocking function to record its calls.
+
+        :param func: function to wrap
+        :param kind: SLEEP, EXPECT or SUBPROCESS
+        :param get_timeout: function getting the timeout of a call from its
+                            arguments, or None
+
+        :returns: wrapped function
+        """
+
+        @functools.wraps(func)
+        def _profiled(*args, **kwargs):
+            # Only the outermost blocking call is measured
+            if getattr(self.local, "active", False):
+                return func(*args, **kwargs)
+            self.local.active = True
+            site = get_call_site(self.root)
+            timed_out = False
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            except pexpect.TIMEOUT:
+                timed_out = True
+                raise
+            finally:
+                self.local.active = False
+                timeout = get_timeout(args, kwargs) if get_timeout else None
+                self._record(site, kind, time.time() - start, timeout, timed_out)
+
+        return _profiled
+
+    def _patch(self, owner, name, kind, get_timeout=None):
+        """Replace an attribute by its profiled version."""
+        func = getattr(owner, name)
+        self.originals.append((owner, name, func))
+        setattr(owner, name, self.wrap(func, kind, get_timeout))
+
+    def install(self):
+        """Profile the blocking functions."""
+
+        def _expect_timeout(args, kwargs):
+            # expect(self, pattern, timeout=-1): -1 is the spawn default
+            timeout = kwargs.get("timeout", args[2] if len(args) > 2 else -1)
+            if timeout == -1 and args:
+                timeout = getattr(args[0], "timeout", None)
+            return timeout if isinstance(timeout, (int, float)) else None
+
+        self._patch(time, "sleep", SLEEP, lambda args, kwargs: args[0] if args else 0)
+        self._patch(pexpect.spawnbase.SpawnBase, "expect", EXPECT, _expect_timeout)
+        self._patch(subprocess, "run", SUBPROCESS)
+        self._patch(subprocess, "call", SUBPROCESS)
+        self._patch(subprocess.Popen, "wait", SUBPROCESS)
+        self._patch(subprocess.Popen, "communicate", SUBPROCESS)
+        self._patch(os, "system", SUBPROCESS)
+
+    def uninstall(self):
+        """Restore the original functions."""
+        for owner, name, func in reversed(self.originals):
+            setattr(owner, name, func)
+        self.originals = []
+
+    def get_report(self):
+        """Get the statistics per call site.
+
+        :returns: list of SiteStats, longest total blocked time first
+        """
+        with self.lock:
+            report = [
+                SiteStats(site, kind, *stats)
+                for (site, kind), stats in self.stats.items()
+            ]
+        return sorted(report, key=lambda s: s.total, reverse=True)
+
+    def write_report(self):
+        """Write the statistics to the json report file."""
+        directory = os.path.dirname(self.report_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.report_file, "w") as f:
+            json.dump([s._asdict() for s in self.get_report()], f, indent=4)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """Display the call sites where the campaign was blocked the longest."""
+        self.write_report()
+        terminalreporter.section("Blocked time per call site")
+        for stats in self.get_report()[: self.top]:
+            line = "%8.1fs  %-10s %-60s %d call(s), max %.1fs" % (
+                stats.total,
+                stats.kind,
+                stats.site,
+                stats.calls,
+                stats.max,
+            )
+            if stats.timeouts:
+                line += ", %d timeout(s)" % stats.timeouts
+            terminalreporter.write_line(line)
+        terminalreporter.write_line("Report written to %s" % self.report_file)
+
+    def pytest_unconfigure(self):
+        """Restore the original functions."""
+        self.uninstall()
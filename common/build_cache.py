@@ -0,0 +1,440 @@
+"""Content-addressed cache of mksys/mkapp outputs.
+
+The key of a build is a hash of:
+    - the definition file and every host file it transitively references
+    - the LEGATO_ROOT revision
+    - the target toolchain (*_SYSROOT, *_KERNELROOT...)
+    - the target name and the build options
+
+On a hit, the stored .update package is copied where the build would have
+produced it and the build is skipped.
+
+The default system of LEGATO_ROOT is keyed on the LEGATO_ROOT revision and
+the target only, and is built at most once per session.
+
+Environment variables:
+    LETP_BUILD_CACHE: set to 0 to disable the cache
+    LETP_BUILD_CACHE_DIR: cache location (default ~/.cache/letp/builds)
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pytest_letp.lib import swilog
+
+from common import definition_files
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "letp", "builds")
+
+# Toolchain variables identifying the build environment of a target
+TOOLCHAIN_VARIABLES = ("SYSROOT", "KERNELROOT", "TOOLCHAIN_DIR", "TOOLCHAIN_PREFIX")
+
+# Files identifying a kernel tree content
+KERNEL_IDENTITY_FILES = (".config", "include/config/kernel.release", "Module.symvers")
+
+# Options which only change where the output is written
+OUTPUT_OPTION_PATTERN = re.compile(r"(?<!\S)(?:--output-dir[= ]|-o\s+)(\S+)")
+OBJECT_OPTION_PATTERN = re.compile(r"(?<!\S)(?:--object-dir[= ]|-w\s+)(\S+)")
+
+_default_cache = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def _run_git(legato_root, *args):
+    """Run a git command in LEGATO_ROOT and return its output or None."""
+    try:
+        return subprocess.check_output(
+            ["git", "-C", legato_root] + list(args),
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_untracked_files(legato_root):
+    """List the untracked files of a git checkout (ignored files excluded).
+
+    :param legato_root: legato directory
+
+    :returns: list of file paths
+    """
+    status = _run_git(
+        legato_root, "status", "--porcelain", "-z", "--untracked-files=all"
+    )
+    paths = [
+        os.path.join(legato_root, entry[3:])
+        for entry in (status or "").split("\0")
+        if entry.startswith("?? ")
+    ]
+    return [path for path in paths if os.path.isfile(path)]
+
+
+def get_output_dir(option):
+    """Get the output directory given in mk options (-o or --output-dir).
+
+    :param option: options passed to mksys/mkapp, or None
+
+    :returns: directory, or None if the options do not set it
+    """
+    match = OUTPUT_OPTION_PATTERN.search(option or "")
+    return match.group(1) if match else None
+
+
+def get_legato_revision(legato_root=None):
+    """Get an identifier of the LEGATO_ROOT revision.
+
+    Local modifications of a git checkout, untracked files included, are
+    part of the identifier. Outside of git, the content of the version file
+    is used.
+
+    :param legato_root: legato directory (default LEGATO_ROOT)
+
+    :returns: revision identifier, or None if it can't be determined
+    """
+    legato_root = legato_root or os.environ.get("LEGATO_ROOT")
+    if not legato_root or not os.path.isdir(legato_root):
+        return None
+
+    head = _run_git(legato_root, "rev-parse", "HEAD")
+    if head:
+        revision = head.strip()
+        diff = _run_git(legato_root, "diff", "HEAD") or ""
+        untracked = get_untracked_files(legato_root)
+        if diff or untracked:
+            digest = hashlib.sha256(diff.encode())
+            if untracked:
+                digest.update(
+                    definition_files.hash_files(untracked, legato_root).encode()
+                )
+            revision += "-dirty-" + digest.hexdigest()[:16]
+        return revision
+
+    version_file = os.path.join(legato_root, "version")
+    if os.path.isfile(version_file):
+        return "version-" + definition_files.hash_file(version_file)
+    return None
+
+
+def get_toolchain_identity(target_name):
+    """Get an identifier of the toolchain of a target.
+
+    :param target_name: name of the target (e.g. wp76xx)
+
+    :returns: list of strings describing the toolchain
+    """
+    identity = []
+    for suffix in TOOLCHAIN_VARIABLES:
+        variable = "%s_%s" % (target_name.upper(), suffix)
+        value = os.environ.get(variable)
+        if value is None:
+            continue
+        identity.append("%s=%s" % (variable, value))
+        if os.path.exists(value):
+            identity.append("mtime=%d" % os.stat(value).st_mtime_ns)
+        if suffix == "KERNELROOT":
+            for name in KERNEL_IDENTITY_FILES:
+                path = os.path.join(value, name)
+                if os.path.isfile(path):
+                    identity.append("%s=%s" % (name, definition_files.hash_file(path)))
+    return identity
+
+
+def get_definition_file(name, path, extension):
+    """Get the definition file built by legato.make_sys/legato.make.
+
+    :param name: system or application name
+    :param path: definition file or directory containing it
+    :param extension: .sdef or .adef
+
+    :returns: path of the definition file
+    """
+    if os.path.isfile(path):
+        return path
+    return os.path.join(path, name + extension)
+
+
+def get_update_file_name(def_file, target_name):
+    """Get the name of the package built from a definition file.
+
+    :param def_file: path of the .sdef or .adef file
+    :param target_name: name of the target
+
+    :returns: file name of the .update package
+    """
+    stem = os.path.splitext(os.path.basename(def_file))[0]
+    return "%s.%s.update" % (stem, target_name)
+
+
+def get_default_cache():
+    """Get the build cache shared by the whole session.
+
+    :returns: BuildCache instance configured from the environment
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = BuildCache(
+            os.environ.get("LETP_BUILD_CACHE_DIR", DEFAULT_CACHE_DIR),
+            os.environ.get("LETP_BUILD_CACHE", "1") != "0",
+        )
+    return _default_cache
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class BuildCache:
+    """Store of .update packages indexed by the hash of their inputs."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        # Default system package built during the session, by target name
+        self.default_systems = {}
+        # Background builds in progress (see common.look_ahead), by def file
+        self.pending = {}
+
+    def get_key(self, def_file, target_name, option=None, extra=None):
+        """Compute the cache key of a build.
+
+        :param def_file: path of the .sdef or .adef file
+        :param target_name: name of the target
+        :param option: options passed to mksys/mkapp
+        :param extra: any other string the output depends on
+
+        :returns: hexadecimal key, or None if the build can't be cached
+        """
+        legato_root = os.environ.get("LEGATO_ROOT")
+        revision = get_legato_revision(legato_root)
+        if revision is None:
+            swilog.debug("LEGATO_ROOT revision unknown: build is not cached")
+            return None
+
+        inputs = definition_files.collect_inputs(def_file, [legato_root])
+        base_dir = os.path.dirname(os.path.abspath(def_file))
+        parts = [
+            "def=%s" % os.path.basename(def_file),
+            "inputs=%s" % definition_files.hash_files(inputs, base_dir),
+            "legato=%s" % revision,
+            "target=%s" % target_name,
+            "option=%s"
+            % " ".join(
+                OBJECT_OPTION_PATTERN.sub(
+                    "", OUTPUT_OPTION_PATTERN.sub("", option or "")
+                ).split()
+            ),
+            "extra=%s" % (extra or ""),
+        ] + get_toolchain_identity(target_name)
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def get_default_system_key(self, target_name):
+        """Compute the cache key of the default system of LEGATO_ROOT.
+
+        The LEGATO_ROOT revision already covers every file of the default
+        system: its includes are not walked.
+
+        :param target_name: name of the target
+
+        :returns: hexadecimal key, or None if the build can't be cached
+        """
+        revision = get_legato_revision()
+        if revision is None:
+            swilog.debug("LEGATO_ROOT revision unknown: build is not cached")
+            return None
+        parts = [
+            "def=default.sdef",
+            "legato=%s" % revision,
+            "target=%s" % target_name,
+        ] + get_toolchain_identity(target_name)
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def contains(self, key, file_name):
+        """Check whether a package is in the cache.
+
+        :param key: cache key
+        :param file_name: name of the .update package
+
+        :returns: True if the package is stored
+        """
+        if not self.enabled or key is None:
+            return False
+        return os.path.isfile(os.path.join(self._entry_dir(key), file_name))
+
+    def lookup(self, key, file_name, dest_dir):
+        """Copy a cached package into dest_dir.
+
+        :param key: cache key
+        :param file_name: name of the .update package
+        :param dest_dir: destination directory
+
+        :returns: path of the copied package, or None on a miss
+        """
+        if not self.enabled or key is None:
+            return None
+        cached = os.path.join(self._entry_dir(key), file_name)
+        if not os.path.isfile(cached):
+            return None
+        dest = os.path.join(dest_dir, file_name)
+        shutil.copyfile(cached, dest)
+        return dest
+
+    def store(self, key, artifact, metadata=None):
+        """Store a package in the cache.
+
+        :param key: cache key
+        :param artifact: path of the .update package
+        :param metadata: dictionary saved next to the package for reference
+        """
+        if not self.enabled or key is None or not os.path.isfile(artifact):
+            return
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+
+        # Populate a temporary directory first: concurrent campaigns never see
+        # a partially written entry.
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry_dir))
+        try:
+            shutil.copyfile(artifact, os.path.join(tmp_dir, os.path.basename(artifact)))
+            metadata = dict(metadata or {}, created=time.time())
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump(metadata, f, indent=4)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def build(self, def_file, target_name, build_func, dest_dir, option=None, key=None):
+        """Get a package from the cache or build it.
+
+        :param def_file: path of the .sdef or .adef file
+        :param target_name: name of the target
+        :param build_func: function without argument doing the actual build
+        :param dest_dir: directory where build_func writes the package
+        :param option: options passed to mksys/mkapp
+        :param key: cache key (default computed from the build inputs)
+
+        :returns: path of the .update package
+        """
+        file_name = get_update_file_name(def_file, target_name)
+        future = self.pending.get(os.path.abspath(def_file))
+        if future is not None:
+            swilog.info("Waiting for the look-ahead build of %s..." % file_name)
+            future.result()
+        if key is None and self.enabled:
+            key = self.get_key(def_file, target_name, option)
+        cached = self.lookup(key, file_name, dest_dir)
+        if cached:
+            self.hits += 1
+            swilog.info("Build cache hit for %s (%s)" % (file_name, key[:12]))
+            return cached
+
+        self.misses += 1
+        build_func()
+        artifact = os.path.join(dest_dir, file_name)
+        self.store(key, artifact, {"def_file": def_file, "target": target_name})
+        return artifact
+
+    def make_sys(
+        self, legato, target_name, sys_name, sys_path, option=None, quiet=False
+    ):
+        """Cached equivalent of legato.make_sys.
+
+        :param legato: fixture to call useful functions regarding legato
+        :param target_name: name of the target
+        :param sys_name: name of the system
+        :param sys_path: .sdef file or directory containing <sys_name>.sdef
+        :param option: options passed to mksys
+        :param quiet: do not display the build output
+
+        :returns: path of the .update package
+        """
+        def_file = get_definition_file(sys_name, sys_path, ".sdef")
+        dest_dir = get_output_dir(option) or os.getcwd()
+
+        def _make():
+            if option:
+                legato.make_sys(sys_name, sys_path=sys_path, option=option, quiet=quiet)
+            else:
+                legato.make_sys(sys_name, sys_path=sys_path, quiet=quiet)
+
+        return self.build(def_file, target_name, _make, dest_dir, option)
+
+    def make_default_sys(self, legato, target_name, dest_dir, quiet=True):
+        """Get the default system package of LEGATO_ROOT.
+
+        The package built earlier in the session is reused, then the one
+        stored for the same LEGATO_ROOT revision and target. It is built
+        otherwise.
+
+        :param legato: fixture to call useful functions regarding legato
+        :param target_name: name of the target
+        :param dest_dir: directory where the package is wanted
+        :param quiet: do not display the build output
+
+        :returns: path of the .update package
+        """
+        legato_root = os.environ.get("LEGATO_ROOT")
+        def_file = get_definition_file("default", legato_root, ".sdef")
+        file_name = get_update_file_name(def_file, target_name)
+        dest = os.path.join(dest_dir, file_name)
+
+        built = self.default_systems.get(target_name)
+        if built and os.path.isfile(built):
+            self.hits += 1
+            swilog.info("Default system already built in this session")
+            if os.path.abspath(built) != os.path.abspath(dest):
+                shutil.copyfile(built, dest)
+            return dest
+
+        def _make():
+            legato.make_sys(
+                "default",
+                sys_path=legato_root,
+                option="--output-dir=%s" % dest_dir,
+                quiet=quiet,
+            )
+
+        key = self.get_default_system_key(target_name) if self.enabled else None
+        self.default_systems[target_name] = self.build(
+            def_file, target_name, _make, dest_dir, key=key
+        )
+        return self.default_systems[target_name]
+
+    def make_app(self, legato, target_name, app_name, app_path, option=None):
+        """Cached equivalent of legato.make.
+
+        :param legato: fixture to call useful functions regarding legato
+        :param target_name: name of the target
+        :param app_name: name of the application
+        :param app_path: directory containing <app_name>.adef
+        :param option: options passed to mkapp
+
+        :returns: path of the .update package
+        """
+        def_file = get_definition_file(app_name, app_path, ".adef")
+
+        def _make():
+            if option:
+                legato.make(app_name, app_path, option=option)
+            else:
+                legato.make(app_name, app_path)
+
+        dest_dir = get_output_dir(option) or os.getcwd()
+        return self.build(def_file, target_name, _make, dest_dir, option)
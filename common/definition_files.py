@@ -0,0 +1,271 @@
+"""Legato definition file helpers.
+
+Walk .sdef/.adef/.cdef/.mdef files and collect every host file they
+transitively reference (included definition files, sources, bundled files,
+component directories, prebuilt modules...).
+"""
+import hashlib
+import os
+import re
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+DEF_FILE_EXTENSIONS = (".sdef", ".adef", ".cdef", ".mdef")
+
+# Block and line comments of the definition file syntax
+COMMENT_PATTERN = re.compile(r"/\*.*?\*/|//[^\n]*", re.S)
+
+# Anything which is not a separator of the definition file syntax
+TOKEN_PATTERN = re.compile(r"[^\s{}()\[\]=\"',;]+")
+
+# $VAR or ${VAR}
+ENV_VAR_PATTERN = re.compile(r"\$\{?(\w+)\}?")
+
+# Directories which are never interesting to hash
+IGNORED_DIRS = (".git", "_build", "__pycache__")
+
+# Content of a section, e.g. "kernelModules: { ... }"
+SECTION_PATTERN = r"\b%s\s*:?\s*\{([^{}]*)\}"
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def expand_variables(token, cur_dir):
+    """Expand $CURDIR and environment variables in a definition file token.
+
+    :param token: raw token read in the definition file
+    :param cur_dir: directory of the definition file containing the token
+
+    :returns: the expanded token, or None if a variable is not defined
+    """
+
+    def _replace(match):
+        name = match.group(1)
+        if name == "CURDIR":
+            return cur_dir
+        value = os.environ.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    try:
+        return ENV_VAR_PATTERN.sub(_replace, token)
+    except KeyError:
+        return None
+
+
+def read_tokens(def_file):
+    """Get the tokens of a definition file, comments excluded.
+
+    :param def_file: path of the definition file
+
+    :returns: list of tokens in order of appearance
+    """
+    with open(def_file, errors="replace") as f:
+        content = COMMENT_PATTERN.sub(" ", f.read())
+    return TOKEN_PATTERN.findall(content)
+
+
+def resolve_token(token, cur_dir, search_dirs):
+    """Resolve a definition file token to an existing host path.
+
+    Absolute paths are only accepted when they come from a variable
+    expansion: raw absolute paths are target paths (e.g. bundles).
+
+    :param token: raw token read in the definition file
+    :param cur_dir: directory of the definition file containing the token
+    :param search_dirs: additional directories to look into
+
+    :returns: absolute path of the referenced file or directory, or None
+    """
+    expanded = expand_variables(token, cur_dir)
+    if not expanded:
+        return None
+    if os.path.isabs(expanded):
+        if not token.startswith("$"):
+            return None
+        candidates = [expanded]
+    else:
+        candidates = [os.path.join(d, expanded) for d in (cur_dir,) + search_dirs]
+    for candidate in candidates:
+        for path in [candidate] + [candidate + ext for ext in DEF_FILE_EXTENSIONS]:
+            if os.path.exists(path):
+                return os.path.abspath(path)
+    return None
+
+
+def _is_under(path, root):
+    """Check whether path is inside the root directory."""
+    if not root:
+        return False
+    root = os.path.abspath(root)
+    return os.path.commonpath([os.path.abspath(path), root]) == root
+
+
+def _walk_files(dir_path):
+    """List every file of a directory, recursively and in a stable order."""
+    files = []
+    for root, dirnames, filenames in os.walk(dir_path):
+        dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_DIRS)
+        files.extend(os.path.join(root, f) for f in sorted(filenames))
+    return files
+
+
+def collect_inputs(def_file, excluded_roots=None):
+    """Collect every host file a definition file transitively depends on.
+
+    :param def_file: path of the top level definition file
+    :param excluded_roots: directories not to descend into (e.g. LEGATO_ROOT
+                           which is identified by its revision instead)
+
+    :returns: sorted list of absolute file paths
+    """
+    excluded_roots = [r for r in (excluded_roots or []) if r]
+    inputs = set()
+    visited = set()
+    pending = [os.path.abspath(def_file)]
+
+    while pending:
+        current = pending.pop()
+        if current in visited:
+            continue
+        visited.add(current)
+        if any(_is_under(current, root) for root in excluded_roots):
+            continue
+        if os.path.isdir(current):
+            for path in _walk_files(current):
+                inputs.add(path)
+                if os.path.basename(path) == "Component.cdef":
+                    pending.append(path)
+            continue
+
+        inputs.add(current)
+        if not current.endswith(DEF_FILE_EXTENSIONS):
+            continue
+        cur_dir = os.path.dirname(current)
+        tokens = read_tokens(current)
+
+        # Search directories (moduleSearch, appSearch...) are plain directory
+        # tokens of the same file: resolve them first.
+        search_dirs = tuple(
+            path
+            for path in (resolve_token(t, cur_dir, ()) for t in tokens)
+            if path and os.path.isdir(path)
+        )
+        for token in tokens:
+            path = resolve_token(token, cur_dir, search_dirs)
+            if path and path != current and not os.path.samefile(path, cur_dir):
+                pending.append(path)
+
+    return sorted(inputs)
+
+
+def read_section(def_file, section):
+    """Get the tokens of every occurrence of a flat section.
+
+    :param def_file: path of the definition file
+    :param section: name of the section (e.g. kernelModules, preBuilt)
+
+    :returns: list of tokens of the section, options (e.g. [optional]) excluded
+    """
+    with open(def_file, errors="replace") as f:
+        content = COMMENT_PATTERN.sub(" ", f.read())
+    content = re.sub(r"\[\w+\]", " ", content)
+    tokens = []
+    for match in re.finditer(SECTION_PATTERN % section, content):
+        tokens += TOKEN_PATTERN.findall(match.group(1))
+    return tokens
+
+
+def get_kernel_module_names(mdef_file):
+    """Get the names of the kernel modules provided by a .mdef file.
+
+    :param mdef_file: path of the .mdef file
+
+    :returns: list of module names (name of the prebuilt .ko, otherwise
+              name of the .mdef file)
+    """
+    prebuilt = read_section(mdef_file, "preBuilt")
+    if prebuilt:
+        return [os.path.splitext(os.path.basename(t))[0] for t in prebuilt]
+    return [os.path.splitext(os.path.basename(mdef_file))[0]]
+
+
+def get_kernel_module_graph(def_file):
+    """Get the dependency graph of the kernel modules of a definition file.
+
+    :param def_file: .sdef or .mdef file listing kernel modules
+
+    :returns: dictionary of the names of the required modules indexed by
+              module name
+    """
+    graph = {}
+    pending = [(os.path.abspath(def_file), ())]
+    visited = set()
+    while pending:
+        current, search_dirs = pending.pop()
+        if current in visited:
+            continue
+        visited.add(current)
+        cur_dir = os.path.dirname(current)
+        search_dirs += tuple(
+            path
+            for path in (
+                resolve_token(t, cur_dir, ())
+                for t in read_section(current, "moduleSearch")
+            )
+            if path and os.path.isdir(path)
+        )
+        required = []
+        for token in read_section(current, "kernelModules"):
+            path = resolve_token(token, cur_dir, search_dirs)
+            if path and path.endswith(".mdef"):
+                required.append(path)
+                pending.append((path, search_dirs))
+        if current.endswith(".mdef"):
+            required_names = [n for r in required for n in get_kernel_module_names(r)]
+            for name in get_kernel_module_names(current):
+                graph[name] = required_names
+    return graph
+
+
+def hash_files(paths, base_dir):
+    """Compute a digest of the content and location of a list of files.
+
+    Files under base_dir are identified by their relative path, the others
+    (temporary directories...) only by their name, so that the digest is
+    stable from one campaign to another.
+
+    :param paths: list of file paths
+    :param base_dir: reference directory for the relative paths
+
+    :returns: hexadecimal sha256 digest
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        if _is_under(path, base_dir):
+            name = os.path.relpath(path, base_dir)
+        else:
+            name = os.path.join("<external>", os.path.basename(path))
+        digest.update(name.encode())
+        digest.update(b"\0")
+        digest.update(hash_file(path).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hash_file(path):
+    """Compute the sha256 digest of a file content.
+
+    :param path: path of the file
+
+    :returns: hexadecimal sha256 digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
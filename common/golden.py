@@ -0,0 +1,105 @@
+"""Skip of redundant golden Legato restores.
+
+A fingerprint of the target state (current system index and hash, probation
+state, framework status, installed apps with their hashes and states, loaded
+test kernel modules) is recorded right after a golden restore. A later restore is skipped when the fingerprint still
+matches: the tests which only ran a process or read logs don't pay for a
+full system reinstall.
+
+Environment variables:
+    LETP_GOLDEN_SKIP: set to 0 to always restore
+"""
+import hashlib
+import os
+
+import pexpect
+from pytest_letp.lib import swilog
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+CURRENT_SYSTEM = "/legato/systems/current"
+
+# Kernel modules installed by the tests
+TEST_MODULE_PREFIXES = ("L_MDEF_", "L_Tools_Kmod_")
+
+FINGERPRINT_CMD = "; ".join(
+    [
+        "cat %s/index" % CURRENT_SYSTEM,
+        "cat %s/info.properties" % CURRENT_SYSTEM,
+        # Probation state: "good", "bad", "tried <n>", absent if untried
+        "cat %s/status 2>/dev/null" % CURRENT_SYSTEM,
+        "legato status 2>&1",
+        "ls -l %s/apps | awk '{print $9, $11}'" % CURRENT_SYSTEM,
+        "app status 2>&1",
+        "grep -e %s /proc/modules | cut -d ' ' -f 1"
+        % " -e ".join("^%s" % p for p in TEST_MODULE_PREFIXES),
+    ]
+)
+
+_golden_fingerprint = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_target_fingerprint(target):
+    """Get a fingerprint of the installed system.
+
+    :param target: fixture to communicate with the target
+
+    :returns: hexadecimal digest, or None if the state can't be read
+    """
+    try:
+        exit_status, rsp = target.run(FINGERPRINT_CMD, withexitstatus=True, timeout=30)
+    except (pexpect.TIMEOUT, pexpect.EOF):
+        return None
+    # The exit status is the one of grep: 1 when no test module is loaded
+    if exit_status not in (0, 1):
+        return None
+    lines = [line.strip() for line in rsp.replace("\r", "").splitlines()]
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def record_golden_fingerprint(target):
+    """Record the fingerprint of the golden system currently installed.
+
+    :param target: fixture to communicate with the target
+    """
+    global _golden_fingerprint
+    _golden_fingerprint = get_target_fingerprint(target)
+
+
+def forget_golden_fingerprint():
+    """Force the next restore (e.g. the target has been reflashed)."""
+    global _golden_fingerprint
+    _golden_fingerprint = None
+
+
+def is_golden(target):
+    """Check whether the target is still in the recorded golden state.
+
+    :param target: fixture to communicate with the target
+
+    :returns: True if the fingerprint matches the recorded one
+    """
+    if _golden_fingerprint is None or os.environ.get("LETP_GOLDEN_SKIP") == "0":
+        return False
+    return get_target_fingerprint(target) == _golden_fingerprint
+
+
+def restore_golden_legato(target, legato):
+    """Restore the golden Legato system unless it is still installed.
+
+    :param target: fixture to communicate with the target
+    :param legato: fixture to call useful functions regarding legato
+
+    :returns: True if the system has been restored, False if skipped
+    """
+    if is_golden(target):
+        swilog.info("Target still in golden state: restore skipped")
+        return False
+    legato.restore_golden_legato()
+    record_golden_fingerprint(target)
+    return True
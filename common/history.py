@@ -0,0 +1,476 @@
+"""History of the test durations and duration regressions.
+
+Every campaign records, in a local SQLite database, the outcome and the
+duration of the setup, call and teardown of each test, tagged with the
+target model, the LEGATO_ROOT revision and the host. When the campaign is
+traced (see common.tracing), the time spent by each test in the build,
+install, wait, verify and teardown phases is recorded as well. The report flags the
+tests of a campaign whose duration is abnormally long compared with their
+history on the same target model: a robust z-score (median and median
+absolute deviation) above a threshold, and a minimum relative increase so
+that very stable tests are not flagged for a few milliseconds.
+
+Usage:
+    python -m common.history report [--campaign ID] [--threshold 3.5]
+    python -m common.history campaigns
+    python -m common.history test <test id>
+
+Environment variables:
+    LETP_HISTORY: set to 0 not to record the campaigns
+    LETP_HISTORY_DB: database file (default ~/.cache/letp/history.sqlite)
+"""
+import argparse
+import collections
+import os
+import socket
+import sqlite3
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from common.tracing import BUILD, INSTALL, TEARDOWN, VERIFY, WAIT, get_tracer
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+DEFAULT_DB = os.path.join(os.path.expanduser("~"), ".cache", "letp", "history.sqlite")
+
+TEST_SET_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    host TEXT,
+    target_model TEXT,
+    legato_revision TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+    test TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_test ON results(test, phase);
+CREATE TABLE IF NOT EXISTS phase_times (
+    campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+    test TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phase_times_test ON phase_times(test, phase);
+"""
+
+# Phases compared by the report: the pytest steps and their sum
+PHASES = ("setup", "call", "teardown", "total")
+
+# Phases of the traced calls (see common.tracing), kept apart from the steps
+TRACED_PHASES = (BUILD, INSTALL, WAIT, VERIFY, TEARDOWN)
+
+# Scale of the median absolute deviation to estimate a standard deviation
+MAD_SCALE = 1.4826
+
+Regression = collections.namedtuple(
+    "Regression", ["test", "phase", "duration", "median", "score", "runs"]
+)
+
+_recorder = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_target_model(config_file=None):
+    """Get the target model declared in the LeTP configuration.
+
+    :param config_file: target configuration (default config/target.xml)
+
+    :returns: model name (e.g. wp76xx), or None if unknown
+    """
+    config_file = config_file or os.path.join(TEST_SET_ROOT, "config", "target.xml")
+    try:
+        return ET.parse(config_file).findtext("module/name")
+    except (OSError, ET.ParseError):
+        return None
+
+
+def robust_score(value, history):
+    """Compute the robust z-score of a value compared with its history.
+
+    :param value: new value
+    :param history: list of previous values
+
+    :returns: tuple (score, median); score is 0 when the history is flat
+    """
+    median = statistics.median(history)
+    mad = statistics.median(abs(v - median) for v in history) * MAD_SCALE
+    if mad == 0:
+        return (float("inf") if value > median else 0.0), median
+    return (value - median) / mad, median
+
+
+def find_regressions(
+    database, campaign_id=None, threshold=3.5, min_increase=0.1, min_runs=5
+):
+    """Find the tests of a campaign which became slower than usual.
+
+    :param database: HistoryDatabase
+    :param campaign_id: campaign to check (default the latest one)
+    :param threshold: minimum robust z-score
+    :param min_increase: minimum relative increase compared with the median
+    :param min_runs: minimum number of previous passed runs to compare with
+
+    :returns: list of Regression, highest score first
+    """
+    campaign = database.get_campaign(campaign_id)
+    if campaign is None:
+        return []
+    regressions = []
+    for test, phase, duration in database.get_durations(campaign["id"]):
+        history = database.get_history(
+            test, phase, campaign["target_model"], before=campaign["id"]
+        )
+        if len(history) < min_runs:
+            continue
+        score, median = robust_score(duration, history)
+        if score >= threshold and duration >= median * (1 + min_increase):
+            regressions.append(
+                Regression(test, phase, duration, median, score, len(history))
+            )
+    return sorted(regressions, key=lambda r: r.score, reverse=True)
+
+
+def _format_regression(regression):
+    """Format a regression for display."""
+    return "%-8s %.1fs instead of %.1fs (score %.1f, %d runs)  %s" % (
+        regression.phase,
+        regression.duration,
+        regression.median,
+        regression.score,
+        regression.runs,
+        regression.test,
+    )
+
+
+def register(config):
+    """Register the history recorder unless LETP_HISTORY is 0.
+
+    :param config: pytest config
+    """
+    global _recorder
+    if os.environ.get("LETP_HISTORY") != "0" and _recorder is None:
+        _recorder = HistoryRecorder(os.environ.get("LETP_HISTORY_DB", DEFAULT_DB))
+        config.pluginmanager.register(_recorder, "letp_history")
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class HistoryDatabase:
+    """SQLite database of the campaign results."""
+
+    def __init__(self, db_file=DEFAULT_DB):
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_file, timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def add_campaign(self, host, target_model, legato_revision):
+        """Create a campaign.
+
+        :returns: id of the campaign
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO campaigns (started, host, target_model, legato_revision)"
+                " VALUES (?, ?, ?, ?)",
+                (time.time(), host, target_model, legato_revision),
+            )
+        return cursor.lastrowid
+
+    def set_target_model(self, campaign_id, target_model):
+        """Set the target model of a campaign."""
+        with self.connection:
+            self.connection.execute(
+                "UPDATE campaigns SET target_model = ? WHERE id = ?",
+                (target_model, campaign_id),
+            )
+
+    def add_result(self, campaign_id, test, phase, outcome, duration):
+        """Record the duration of a test phase."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?)",
+                (campaign_id, test, phase, outcome, duration),
+            )
+
+    def add_phase_time(self, campaign_id, test, phase, duration):
+        """Record the time spent by a test in a traced phase."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO phase_times VALUES (?, ?, ?, ?)",
+                (campaign_id, test, phase, duration),
+            )
+
+    def get_campaign(self, campaign_id=None):
+        """Get a campaign, by default the latest one.
+
+        :returns: sqlite3.Row, or None
+        """
+        if campaign_id is None:
+            query = "SELECT * FROM campaigns ORDER BY id DESC LIMIT 1"
+            return self.connection.execute(query).fetchone()
+        query = "SELECT * FROM campaigns WHERE id = ?"
+        return self.connection.execute(query, (campaign_id,)).fetchone()
+
+    def get_campaigns(self):
+        """Get all the campaigns with their number of tests.
+
+        :returns: list of sqlite3.Row
+        """
+        return self.connection.execute(
+            "SELECT campaigns.*, COUNT(DISTINCT results.test) AS tests"
+            " FROM campaigns LEFT JOIN results ON results.campaign_id = campaigns.id"
+            " GROUP BY campaigns.id ORDER BY campaigns.id"
+        ).fetchall()
+
+    def get_durations(self, campaign_id, passed_only=True):
+        """Get the phase durations of the tests of a campaign.
+
+        :param campaign_id: id of the campaign
+        :param passed_only: ignore the tests which did not pass
+
+        :returns: list of (test, phase, duration), phase "total" included
+        """
+        rows = self.connection.execute(
+            "SELECT test, phase, outcome, duration FROM results"
+            " WHERE campaign_id = ?",
+            (campaign_id,),
+        ).fetchall()
+        failed = {r["test"] for r in rows if r["outcome"] != "passed"}
+        totals = collections.OrderedDict()
+        durations = []
+        for row in rows:
+            if passed_only and row["test"] in failed:
+                continue
+            durations.append((row["test"], row["phase"], row["duration"]))
+            totals[row["test"]] = totals.get(row["test"], 0.0) + row["duration"]
+        return durations + [(test, "total", d) for test, d in totals.items()]
+
+    def get_history(self, test, phase, target_model=None, before=None):
+        """Get the previous durations of a test phase.
+
+        Only the runs where all the phases of the test passed are used.
+
+        :param test: test id
+        :param phase: setup, call, teardown or total
+        :param target_model: only the campaigns on this model (None: all)
+        :param before: only the campaigns before this id
+
+        :returns: list of durations, oldest first
+        """
+        conditions = ["r.test = ?"]
+        params = [test]
+        if target_model is not None:
+            conditions.append("c.target_model = ?")
+            params.append(target_model)
+        if before is not None:
+            conditions.append("c.id < ?")
+            params.append(before)
+        having = "HAVING SUM(r.outcome != 'passed') = 0"
+        selected = "SUM(r.duration)"
+        if phase != "total":
+            selected = "SUM(CASE WHEN r.phase = ? THEN r.duration END)"
+            params.insert(0, phase)
+        rows = self.connection.execute(
+            "SELECT %s AS duration FROM results r"
+            " JOIN campaigns c ON c.id = r.campaign_id WHERE %s"
+            " GROUP BY c.id %s ORDER BY c.id"
+            % (selected, " AND ".join(conditions), having),
+            params,
+        ).fetchall()
+        return [row["duration"] for row in rows if row["duration"] is not None]
+
+    def get_phase_history(self, test, phase, target_model=None):
+        """Get the previous times of a test in a traced phase.
+
+        Only the runs where all the steps of the test passed are used.
+
+        :param test: test id
+        :param phase: build, install, wait, verify or teardown
+        :param target_model: only the campaigns on this model (None: all)
+
+        :returns: list of durations, oldest first
+        """
+        condition, params = "", [test, phase]
+        if target_model is not None:
+            condition, params = "AND c.target_model = ?", params + [target_model]
+        rows = self.connection.execute(
+            "SELECT p.duration AS duration FROM phase_times p"
+            " JOIN campaigns c ON c.id = p.campaign_id"
+            " WHERE p.test = ? AND p.phase = ? %s AND NOT EXISTS ("
+            "SELECT 1 FROM results r WHERE r.campaign_id = p.campaign_id"
+            " AND r.test = p.test AND r.outcome != 'passed')"
+            " ORDER BY c.id" % condition,
+            params,
+        ).fetchall()
+        return [row["duration"] for row in rows]
+
+    def get_test_summary(self, target_model=None, last_runs=20):
+        """Summarize the recent runs of every recorded test.
+
+        :param target_model: only the campaigns on this model (None: all)
+        :param last_runs: number of most recent runs considered per test
+
+        :returns: dictionary of (runs, median total duration of the passed
+                  runs or None, failed runs) by test id
+        """
+        condition, params = "", []
+        if target_model is not None:
+            condition, params = "WHERE c.target_model = ?", [target_model]
+        rows = self.connection.execute(
+            "SELECT r.test AS test, SUM(r.duration) AS duration,"
+            " SUM(r.outcome = 'failed') AS failures FROM results r"
+            " JOIN campaigns c ON c.id = r.campaign_id %s"
+            " GROUP BY c.id, r.test ORDER BY c.id DESC" % condition,
+            params,
+        ).fetchall()
+        runs = collections.defaultdict(list)
+        for row in rows:
+            if len(runs[row["test"]]) < last_runs:
+                runs[row["test"]].append((row["duration"], row["failures"] > 0))
+        summary = {}
+        for test, test_runs in runs.items():
+            passed = [d for d, failed in test_runs if not failed]
+            summary[test] = (
+                len(test_runs),
+                statistics.median(passed) if passed else None,
+                sum(1 for _, failed in test_runs if failed),
+            )
+        return summary
+
+
+class HistoryRecorder:
+    """Pytest plugin recording the campaign results."""
+
+    def __init__(self, db_file=DEFAULT_DB):
+        self.db_file = db_file
+        self.database = None
+        self.campaign_id = None
+        self.model_from_fixture = False
+
+    def pytest_sessionstart(self):
+        """Create the campaign."""
+        # Late import: the build cache depends on pytest_letp
+        from common.build_cache import get_legato_revision
+
+        self.database = HistoryDatabase(self.db_file)
+        self.campaign_id = self.database.add_campaign(
+            socket.gethostname(), get_target_model(), get_legato_revision()
+        )
+
+    def pytest_runtest_call(self, item):
+        """Take the target model from the LeTP configuration of the session."""
+        read_config = getattr(item, "funcargs", {}).get("read_config")
+        if read_config is not None and not self.model_from_fixture:
+            model = read_config.findtext("module/name")
+            if model:
+                self.database.set_target_model(self.campaign_id, model)
+                self.model_from_fixture = True
+
+    def pytest_runtest_logreport(self, report):
+        """Record the duration of a test phase, and the traced phases."""
+        if self.database is None:
+            return
+        self.database.add_result(
+            self.campaign_id,
+            report.nodeid,
+            report.when,
+            report.outcome,
+            report.duration,
+        )
+        tracer = get_tracer()
+        if report.when == "teardown" and tracer is not None:
+            for phase, duration in sorted(
+                tracer.get_test_phases(report.nodeid).items()
+            ):
+                self.database.add_phase_time(
+                    self.campaign_id, report.nodeid, phase, duration
+                )
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """Display the tests of the campaign slower than usual."""
+        regressions = find_regressions(self.database, self.campaign_id)
+        if not regressions:
+            return
+        terminalreporter.section("Duration regressions")
+        for regression in regressions:
+            terminalreporter.write_line(_format_regression(regression))
+
+
+def main(argv=None):
+    """Query the history database.
+
+    :param argv: command line arguments
+
+    :returns: exit code, 1 when regressions are found
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--db", default=os.environ.get("LETP_HISTORY_DB", DEFAULT_DB), help="database"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report = subparsers.add_parser("report", help="duration regressions")
+    report.add_argument("--campaign", type=int, help="campaign id (default latest)")
+    report.add_argument("--threshold", type=float, default=3.5, help="z-score")
+    report.add_argument(
+        "--min-increase", type=float, default=0.1, help="relative increase"
+    )
+    report.add_argument("--min-runs", type=int, default=5, help="history size")
+    subparsers.add_parser("campaigns", help="recorded campaigns")
+    test = subparsers.add_parser("test", help="history of a test")
+    test.add_argument("test", help="test id")
+    args = parser.parse_args(argv)
+
+    database = HistoryDatabase(args.db)
+    if args.command == "campaigns":
+        for row in database.get_campaigns():
+            print(
+                "%4d  %s  %-10s %-12s %4d test(s)  %s"
+                % (
+                    row["id"],
+                    time.strftime("%Y-%m-%d %H:%M", time.localtime(row["started"])),
+                    row["target_model"],
+                    row["host"],
+                    row["tests"],
+                    row["legato_revision"],
+                )
+            )
+        return 0
+    if args.command == "test":
+        for phase in PHASES:
+            history = database.get_history(args.test, phase)
+            print("%-8s %s" % (phase, " ".join("%.1f" % d for d in history)))
+        traced = [(p, database.get_phase_history(args.test, p)) for p in TRACED_PHASES]
+        if any(history for _, history in traced):
+            print("traced phases:")
+        for phase, history in traced:
+            if history:
+                print("  %-8s %s" % (phase, " ".join("%.1f" % d for d in history)))
+        return 0
+
+    regressions = find_regressions(
+        database, args.campaign, args.threshold, args.min_increase, args.min_runs
+    )
+    for regression in regressions:
+        print(_format_regression(regression))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
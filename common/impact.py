@@ -0,0 +1,573 @@
+"""Change-impact selection of the tests of a campaign.
+
+Every test of a campaign is indexed with the files of the test set it
+consumes:
+    - the paths of its test module: module constants (TEST_RESOURCES,
+      APP_PATH, APP_PATH_<test>...) and path expressions used by the test
+      function, by the module functions it calls and by the module fixtures
+      it requests or which are autouse
+    - the resource names it mentions (e.g. "SecStoreAppIndependenceTest")
+      found in a resource directory of its module
+    - the system it installs (see common.scheduler)
+and every definition file among them is expanded to the files it
+transitively includes (see common.definition_files).
+
+A changed file selects:
+    - the tests consuming it, nothing if only tests outside the campaign
+      consume it
+    - else, if it is in a resource directory of test modules, all their tests
+    - a test module: the tests whose function changed, all of them if a line
+      outside the test functions changed
+    - a conftest.py or another python file: the tests below its directory
+    - a file of common/ or config/, or the root conftest.py: all the tests
+Other files (documentation, runtest json...) select nothing.
+
+Usage:
+    python -m common.impact [--base origin/master] [--campaign <campaign.json>]
+                            [-o <selected.json>] [--explain] [files...]
+"""
+import argparse
+import ast
+import collections
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+
+from common.definition_files import DEF_FILE_EXTENSIONS, collect_inputs
+from common.scheduler import analyze_campaign, analyze_module, expand_campaign
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+TEST_SET_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CAMPAIGN = os.path.join("runtest", "full_campaign.json")
+
+# Files and directories of the test set used by all the tests
+GLOBAL_PATHS = ("common", "config", "conftest.py")
+
+# Resource names worth looking up in the resource directories
+NAME_PATTERN = re.compile(r"^\w[\w.-]*(/[\w.-]+)*$")
+
+# New side of a hunk of a unified diff: "@@ -a,b +c,d @@"
+HUNK_PATTERN = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+PATH_FUNCTIONS = {
+    "join": os.path.join,
+    "abspath": os.path.abspath,
+    "dirname": os.path.dirname,
+    "realpath": os.path.realpath,
+    "normpath": os.path.normpath,
+}
+
+# Value of the arguments which cannot be a path (e.g. None)
+NO_PATH = object()
+
+ModuleIndex = collections.namedtuple(
+    "ModuleIndex", ["path", "resource_dirs", "functions", "dependencies"]
+)
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def _is_under(path, root):
+    """Check whether path is root or inside it."""
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def evaluate(node, env, wildcard=None):
+    """Evaluate a string expression of a test module statically.
+
+    Supported: string literals, names of env, f-strings, + and % on strings,
+    os.path.join/abspath/dirname/realpath/normpath and __file__.
+
+    :param node: ast node
+    :param env: values of the known names
+    :param wildcard: value of the parts which cannot be evaluated, None to
+                     give up on them
+
+    :returns: string value, or None if it cannot be evaluated
+    """
+    value = None
+    if isinstance(node, ast.Constant):
+        value = node.value if isinstance(node.value, str) else None
+    elif isinstance(node, ast.Name) and isinstance(env.get(node.id), str):
+        value = env[node.id]
+    elif isinstance(node, ast.JoinedStr):
+        parts = []
+        for part in node.values:
+            if isinstance(part, ast.FormattedValue):
+                part = part.value
+            parts.append(evaluate(part, env, wildcard))
+        value = None if None in parts else "".join(parts)
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left = evaluate(node.left, env, wildcard)
+        right = evaluate(node.right, env, wildcard)
+        value = left + right if left is not None and right is not None else None
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod):
+        template = evaluate(node.left, env, wildcard)
+        items = node.right.elts if isinstance(node.right, ast.Tuple) else [node.right]
+        values = [evaluate(item, env, wildcard) for item in items]
+        if template is not None and None not in values:
+            try:
+                value = template % tuple(values)
+            except (TypeError, ValueError):
+                value = None
+    elif _is_os_path_call(node) and not node.keywords:
+        args = [evaluate(arg, env, wildcard) for arg in node.args]
+        if args and None not in args and node.func.attr in PATH_FUNCTIONS:
+            value = PATH_FUNCTIONS[node.func.attr](*args)
+    return wildcard if value is None else value
+
+
+def _is_os_path_call(node):
+    """Check whether a node is a call of an os.path function."""
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Attribute)
+        and node.func.value.attr == "path"
+        and getattr(node.func.value.value, "id", None) == "os"
+    )
+
+
+def _get_constants(tree, path):
+    """Evaluate the string constants of a module, in order."""
+    env = {"__file__": os.path.abspath(path)}
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            value = evaluate(node.value, env)
+            for target in node.targets:
+                if isinstance(target, ast.Name) and value is not None:
+                    env[target.id] = value
+    return env
+
+
+def _find_paths(value, resource_dirs):
+    """Get the existing paths designated by an evaluated string."""
+    if os.path.isabs(value):
+        candidates = [value]
+    elif NAME_PATTERN.match(value):
+        candidates = [os.path.join(d, value) for d in resource_dirs]
+    else:
+        return set()
+    paths = set()
+    for candidate in candidates:
+        if glob.has_magic(candidate):
+            paths.update(glob.glob(candidate))
+        elif os.path.exists(candidate):
+            paths.add(candidate)
+    return {os.path.abspath(p) for p in paths}
+
+
+def _uses_no_path(node, env):
+    """Check whether an expression uses an argument which is not a path."""
+    return any(
+        isinstance(n, ast.Name) and env.get(n.id) is NO_PATH for n in ast.walk(node)
+    )
+
+
+def _bind_arguments(call, functions, env):
+    """Get the values of the arguments of a call of a module function.
+
+    :returns: dictionary of the string values (NO_PATH for the arguments
+              which cannot be a path, e.g. a None default) by argument name
+    """
+    callee = functions[call.func.id].args
+    names = [a.arg for a in callee.args]
+    arguments = dict(zip(names[len(names) - len(callee.defaults) :], callee.defaults))
+    arguments.update(zip(names, call.args))
+    arguments.update((k.arg, k.value) for k in call.keywords if k.arg)
+    values = {}
+    for name, argument in arguments.items():
+        if isinstance(argument, ast.Constant) and not isinstance(argument.value, str):
+            values[name] = NO_PATH
+        else:
+            value = evaluate(argument, env)
+            if value is not None:
+                values[name] = value
+    return values
+
+
+def _get_used_paths(node, env, resource_dirs, functions):
+    """Get the paths used by a function and the module functions it calls.
+
+    :param node: ast node of the function
+    :param env: values of the known names (module constants, arguments)
+    :param resource_dirs: directories where the resource names are looked up
+    :param functions: ast nodes of the module functions by name
+
+    :returns: tuple (set of existing paths, list of (function name, values of
+              its arguments) called)
+    """
+    env = dict(env)
+    # Local variables, e.g. app_path = os.path.join(TEST_RESOURCES, ...). The
+    # first assignment wins: later ones are mostly display strings.
+    for child in ast.walk(node):
+        if isinstance(child, ast.Assign):
+            value = evaluate(child.value, env)
+            for target in child.targets:
+                if isinstance(target, ast.Name) and value is not None:
+                    env.setdefault(target.id, value)
+    paths = set()
+    calls = []
+    pending = list(ast.iter_child_nodes(node))
+    while pending:
+        current = pending.pop()
+        if isinstance(current, ast.Call) and getattr(current.func, "id", None) in (
+            functions
+        ):
+            calls.append((current.func.id, _bind_arguments(current, functions, env)))
+        if isinstance(current, ast.expr) and not _uses_no_path(current, env):
+            # Unknown parts of a path (e.g. a loop variable) match any name
+            value = evaluate(current, env, "*")
+            if value != "*" and (os.path.isabs(value) or "*" not in value):
+                # A bare resource directory is a base for other paths (e.g.
+                # exported to the definition files), not a consumed file
+                if value not in resource_dirs:
+                    paths |= _find_paths(value, resource_dirs)
+                if os.path.isabs(value):
+                    continue
+        pending.extend(ast.iter_child_nodes(current))
+    return paths, calls
+
+
+def _is_fixture(node, autouse=False):
+    """Check whether a function is a fixture (an autouse one if autouse)."""
+    for decorator in node.decorator_list:
+        call = decorator if isinstance(decorator, ast.Call) else None
+        func = call.func if call else decorator
+        if (getattr(func, "attr", None) or getattr(func, "id", None)) != "fixture":
+            continue
+        if not autouse or any(
+            k.arg == "autouse" and getattr(k.value, "value", False)
+            for k in (call.keywords if call else [])
+        ):
+            return True
+    return False
+
+
+def _get_used_fixtures(node):
+    """Get the fixtures of a @pytest.mark.usefixtures decorator."""
+    fixtures = []
+    for decorator in node.decorator_list:
+        if (
+            isinstance(decorator, ast.Call)
+            and getattr(decorator.func, "attr", None) == "usefixtures"
+        ):
+            fixtures += [evaluate(arg, {}) for arg in decorator.args]
+    return [f for f in fixtures if f]
+
+
+def index_module(path, test_set, excluded_roots=None):
+    """Index the files consumed by the test functions of a module.
+
+    :param path: path of the test module
+    :param test_set: root of the test set
+    :param excluded_roots: directories whose files are not indexed
+
+    :returns: ModuleIndex whose dependencies are sets of absolute paths by
+              function name
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    module_dir = os.path.dirname(os.path.abspath(path))
+    env = _get_constants(tree, path)
+    resource_dirs = sorted(
+        {
+            os.path.abspath(v)
+            for v in env.values()
+            if os.path.isdir(v)
+            and _is_under(os.path.abspath(v), module_dir)
+            and os.path.abspath(v) != module_dir
+        }
+    )
+    functions = {
+        node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)
+    }
+    autouse = [name for name, node in functions.items() if _is_fixture(node, True)]
+    systems = analyze_module(path)
+
+    def _get_function_paths(name):
+        # The function, the module functions it calls with the values of
+        # their arguments, and the module fixtures it requests
+        paths = set()
+        visited = set()
+        pending = [(name, {})] + [(fixture, {}) for fixture in autouse]
+        while pending:
+            current, arguments = pending.pop()
+            key = (current, tuple(sorted(arguments.items())))
+            if key in visited or current not in functions:
+                continue
+            visited.add(key)
+            node = functions[current]
+            found, calls = _get_used_paths(
+                node, dict(env, **arguments), resource_dirs, functions
+            )
+            paths |= found
+            pending += calls
+            pending += [(a.arg, {}) for a in node.args.args]
+            pending += [(f, {}) for f in _get_used_fixtures(node)]
+        return paths
+
+    # Constants only used by the conftest fixtures through request.module
+    # (e.g. APP_PATH), consumed by all the tests of the module
+    referenced = {
+        n.id
+        for node in tree.body
+        if not isinstance(node, ast.Assign) or node.value is not None
+        for n in ast.walk(node.value if isinstance(node, ast.Assign) else node)
+        if isinstance(n, ast.Name)
+    }
+    module_paths = {
+        os.path.abspath(value)
+        for name, value in env.items()
+        if name not in referenced
+        and name != "__file__"
+        and name.replace("APP_PATH_", "", 1) not in functions
+        and os.path.exists(value)
+    }
+
+    # Test functions: neither fixtures nor helpers called by other functions
+    called = {
+        n.id
+        for node in functions.values()
+        for n in ast.walk(node)
+        if isinstance(n, ast.Name)
+    }
+    tests = [
+        name
+        for name, node in functions.items()
+        if name not in called and not _is_fixture(node)
+    ]
+
+    dependencies = {}
+    for name in tests:
+        paths = _get_function_paths(name) | module_paths
+        # Fixtures using getattr(request.module, "APP_PATH_%s" % test name)
+        if "APP_PATH_%s" % name in env:
+            paths.add(os.path.abspath(env["APP_PATH_%s" % name]))
+        system, _ = systems.get(name, (None, False))
+        if system:
+            paths.add(system)
+        files = set()
+        for dependency in paths:
+            if not _is_under(dependency, test_set) or dependency == module_dir:
+                continue
+            if os.path.isdir(dependency) or dependency.endswith(DEF_FILE_EXTENSIONS):
+                files.update(collect_inputs(dependency, excluded_roots))
+            else:
+                files.add(dependency)
+        dependencies[name] = {f for f in files if _is_under(f, test_set)}
+    line_ranges = {
+        name: (
+            min([node.lineno] + [d.lineno for d in node.decorator_list]),
+            node.end_lineno,
+        )
+        for name, node in functions.items()
+    }
+    return ModuleIndex(os.path.abspath(path), resource_dirs, line_ranges, dependencies)
+
+
+def build_index(entries, test_set):
+    """Index the files consumed by the tests of a campaign.
+
+    :param entries: list of TestEntry
+    :param test_set: root of the test set
+
+    :returns: dictionary of ModuleIndex by module path, the modules of the
+              same directories included
+    """
+    excluded_roots = [os.environ.get("LEGATO_ROOT")]
+    paths = set()
+    for entry in entries:
+        if os.path.isfile(entry.path):
+            # The other modules of the directory tell which resources are
+            # used by tests outside the campaign
+            directory = os.path.dirname(entry.path)
+            paths.update(glob.glob(os.path.join(directory, "test_*.py")))
+            paths.add(entry.path)
+    return {path: index_module(path, test_set, excluded_roots) for path in paths}
+
+
+def get_changed_files(base, test_set):
+    """List the files changed since a git revision, working tree included.
+
+    :param base: git revision
+    :param test_set: root of the test set
+
+    :returns: dictionary of the changed new-side line numbers (empty: unknown)
+              by absolute path
+    """
+    command = ["git", "-C", test_set, "diff", "--no-color", "--relative"]
+    names = subprocess.run(
+        command + ["--name-only", base],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    changes = {os.path.join(test_set, name): set() for name in names.splitlines()}
+    # Changed lines of the text files (none for deleted and binary files)
+    output = subprocess.run(
+        command + ["-U0", base],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    current = None
+    for line in output.splitlines():
+        if line.startswith("diff --git "):
+            current = None
+        elif line.startswith("+++ "):
+            current = line[6:] if line.startswith("+++ b/") else None
+            current = current and os.path.join(test_set, current)
+        match = HUNK_PATTERN.match(line)
+        if match and current in changes:
+            start, count = int(match.group(1)), int(match.group(2) or 1)
+            # A deletion touches the lines around it
+            changes[current].update(range(start, start + max(count, 2)))
+    return changes
+
+
+def select(entries, modules, changes, test_set):
+    """Select the tests affected by changed files.
+
+    :param entries: list of TestEntry in campaign order
+    :param modules: index of the modules (see build_index)
+    :param changes: changed line numbers, empty or None when unknown, by
+                    absolute path
+    :param test_set: root of the test set
+
+    :returns: tuple (list of the selected TestEntry, dictionary of the reasons
+              of the selection by entry name, list of the unused changed files)
+    """
+    reasons = collections.defaultdict(list)
+    unused = []
+    global_paths = [os.path.join(test_set, p) for p in GLOBAL_PATHS]
+
+    def _select(file_path, predicate):
+        selected = False
+        for entry in entries:
+            if predicate(entry):
+                reasons[entry.name].append(os.path.relpath(file_path, test_set))
+                selected = True
+        return selected
+
+    def _function(entry):
+        return (entry.function or "").split("[")[0]
+
+    for file_path, lines in sorted(changes.items()):
+        if any(_is_under(file_path, p) for p in global_paths):
+            _select(file_path, lambda e: True)
+            continue
+        if file_path in modules:
+            ranges = modules[file_path].functions
+            touched = {
+                name
+                for name, (first, last) in ranges.items()
+                if lines and any(first <= line <= last for line in lines)
+            }
+            outside = not lines or any(
+                not any(first <= line <= last for first, last in ranges.values())
+                for line in lines
+            )
+            tests = {_function(e) for e in entries if e.path == file_path}
+            helpers = touched - tests
+            _select(
+                file_path,
+                lambda e: e.path == file_path
+                and (outside or helpers or not e.function or _function(e) in touched),
+            )
+            continue
+        if file_path.endswith(".py"):
+            directory = os.path.dirname(file_path)
+            if not _select(file_path, lambda e: _is_under(e.path, directory)):
+                unused.append(file_path)
+            continue
+
+        def _consumes(entry):
+            index = modules.get(entry.path)
+            if index is None:
+                return False
+            if entry.function:
+                return file_path in index.dependencies.get(_function(entry), ())
+            return any(file_path in d for d in index.dependencies.values())
+
+        if _select(file_path, _consumes) or any(
+            file_path in files
+            for index in modules.values()
+            for files in index.dependencies.values()
+        ):
+            continue
+        owners = [
+            path
+            for path, index in modules.items()
+            if any(_is_under(file_path, d) for d in index.resource_dirs)
+        ]
+        if not _select(file_path, lambda e: e.path in owners):
+            unused.append(file_path)
+    selected = [e for e in entries if e.name in reasons]
+    return selected, reasons, unused
+
+
+def main(argv=None):
+    """Select the tests of a campaign affected by a change.
+
+    :param argv: command line arguments
+
+    :returns: exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "files", nargs="*", help="changed files (default: git diff of --base)"
+    )
+    parser.add_argument("--base", default="HEAD", help="git revision (default HEAD)")
+    parser.add_argument(
+        "--campaign",
+        help="runtest json file (default %s of the test set)" % DEFAULT_CAMPAIGN,
+    )
+    parser.add_argument("-o", "--output", help="selected json file (default stdout)")
+    parser.add_argument(
+        "--explain", action="store_true", help="list the changed files per test"
+    )
+    parser.add_argument(
+        "--test-set",
+        default=os.environ.get("LETP_TEST_SET", TEST_SET_ROOT),
+        help="root of the test set (default LETP_TEST_SET)",
+    )
+    args = parser.parse_args(argv)
+
+    test_set = os.path.abspath(args.test_set)
+    campaign = args.campaign or os.path.join(test_set, DEFAULT_CAMPAIGN)
+    entries = analyze_campaign(expand_campaign(campaign, test_set), test_set)
+    if args.files:
+        changes = {os.path.abspath(f): None for f in args.files}
+    else:
+        changes = get_changed_files(args.base, test_set)
+    modules = build_index(entries, test_set)
+    selected, reasons, unused = select(entries, modules, changes, test_set)
+    sys.stderr.write(
+        "%d/%d test(s) selected by %d changed file(s)\n"
+        % (len(selected), len(entries), len(changes))
+    )
+    if args.explain:
+        for entry in selected:
+            sys.stderr.write("%s: %s\n" % (entry.name, ", ".join(reasons[entry.name])))
+        for file_path in unused:
+            sys.stderr.write("Not used: %s\n" % os.path.relpath(file_path, test_set))
+    content = json.dumps([{"name": e.name} for e in selected], indent=4) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(content)
+    else:
+        sys.stdout.write(content)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
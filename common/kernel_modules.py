@@ -0,0 +1,108 @@
+"""Kernel modules loaded on the target.
+
+The whole /proc/modules table is fetched in a single command (a query of
+the target agent when available) and parsed into KernelModule entries, so
+that checking a set of modules costs one round-trip instead of one per
+module.
+"""
+import collections
+
+from common.polling import wait_until
+from common.target_agent import query_target
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+KernelModule = collections.namedtuple(
+    "KernelModule", ["name", "size", "refcount", "deps", "state"]
+)
+
+PROC_MODULES_CMD = "cat /proc/modules"
+LIVE_STATE = "Live"
+
+# Modules are loaded/unloaded by the supervisor within a few seconds
+MODULE_TIMEOUT = 20
+POLL_INTERVAL = 0.5
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def parse_proc_modules(content):
+    """Parse the content of /proc/modules.
+
+    Each line is "name size refcount deps state address", deps being a
+    comma separated list ending with a comma, or "-" when empty.
+
+    :param content: content of /proc/modules
+    :returns: dictionary of KernelModule indexed by module name
+    """
+    modules = {}
+    for line in content.replace("\r", "").splitlines():
+        fields = line.split()
+        if len(fields) < 5 or not fields[1].isdigit():
+            continue
+        deps = tuple(d for d in fields[3].split(",") if d and d != "-")
+        refcount = int(fields[2]) if fields[2].isdigit() else -1
+        modules[fields[0]] = KernelModule(
+            fields[0], int(fields[1]), refcount, deps, fields[4]
+        )
+    return modules
+
+
+def get_loaded_modules(target, timeout=30):
+    """Get a snapshot of the kernel modules loaded on the target.
+
+    :param target: fixture to communicate with the target
+    :param timeout: timeout of the command
+    :returns: dictionary of KernelModule indexed by module name
+    """
+    results = query_target(target, "modules", timeout=timeout)
+    if results is not None and results[0].status == 0:
+        return parse_proc_modules(results[0].output)
+    _, rsp = target.run(PROC_MODULES_CMD, withexitstatus=True, timeout=timeout)
+    return parse_proc_modules(rsp)
+
+
+def get_unexpected_modules(modules, loaded=(), unloaded=()):
+    """List the modules which are not in the expected state.
+
+    :param modules: dictionary returned by get_loaded_modules
+    :param loaded: names of the modules expected to be loaded and live
+    :param unloaded: names of the modules expected to be absent
+    :returns: names of the modules not in the expected state, in the order of
+              loaded then unloaded
+    """
+    unexpected = [
+        name
+        for name in loaded
+        if name not in modules or modules[name].state != LIVE_STATE
+    ]
+    unexpected += [name for name in unloaded if name in modules]
+    return unexpected
+
+
+def wait_for_modules(
+    target, loaded=(), unloaded=(), timeout=MODULE_TIMEOUT, interval=POLL_INTERVAL
+):
+    """Wait until a set of modules is loaded and another one is unloaded.
+
+    :param target: fixture to communicate with the target
+    :param loaded: names of the modules expected to be loaded and live
+    :param unloaded: names of the modules expected to be absent
+    :param timeout: deadline in seconds
+    :param interval: first delay between two snapshots
+    :returns: names of the modules still not in the expected state at the
+              deadline, empty list on success
+    """
+    unexpected = []
+
+    def _is_expected():
+        unexpected[:] = get_unexpected_modules(
+            get_loaded_modules(target), loaded, unloaded
+        )
+        return not unexpected
+
+    wait_until(_is_expected, timeout, interval=interval, max_interval=2)
+    return unexpected
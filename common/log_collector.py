@@ -0,0 +1,530 @@
+"""Host-side collector of the target syslog.
+
+A single "logread -f" stream is started once per session and every line is
+kept in a host-side ring buffer, indexed by reception time, process and
+component. Searches and waits are then answered locally instead of
+transferring the whole target log each time, and lines already rotated out
+of the target ring buffer can still be found.
+
+The stream is restarted after a target reboot; the lines replayed by the
+new "logread -f" which were already received are dropped. The collector
+gives up when the stream cannot be restarted for RECONNECT_TIMEOUT seconds.
+
+A sync logs a marker line on the target and waits for it. If the stream does
+not deliver it, the missing lines are read with a one-shot logread and the
+stream is restarted; a marker missing from the target log too is an error.
+
+Environment variables:
+    LETP_LOG_COLLECTOR_SIZE: maximum number of lines kept (default 100000)
+"""
+import bisect
+import collections
+import os
+import re
+import subprocess
+import threading
+import time
+import uuid
+
+from pytest_letp.lib import swilog
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+LogEntry = collections.namedtuple(
+    "LogEntry",
+    [
+        "seq",
+        "host_time",
+        "timestamp",
+        "level",
+        "process",
+        "pid",
+        "component",
+        "message",
+        "raw",
+    ],
+)
+
+DEFAULT_BUFFER_SIZE = 100000
+LOGREAD_CMD = "/sbin/logread"
+LOGREAD_FOLLOW_CMD = "%s -f" % LOGREAD_CMD
+SSH_OPTIONS = [
+    "-o",
+    "StrictHostKeyChecking=no",
+    "-o",
+    "UserKnownHostsFile=/dev/null",
+    "-o",
+    "LogLevel=ERROR",
+    "-o",
+    "ServerAliveInterval=5",
+    "-o",
+    "ServerAliveCountMax=3",
+]
+
+# Delay before restarting the stream (e.g. target rebooting)
+RECONNECT_DELAY = 2
+# Time (s) without any line after which the stream is not restarted anymore
+RECONNECT_TIMEOUT = 600
+# Number of latest lines compared with the lines replayed by a new logread
+REPLAY_WINDOW = 10000
+
+# Marker lines written in the target log to delimit what a test observes
+MARKER_TAG = "LeTP"
+MARKER_PREFIX = "%s: mark-" % MARKER_TAG
+MARKER_CMD = "/usr/bin/logger -t %s mark-%%s" % MARKER_TAG
+MARKER_TIMEOUT = 10
+
+# "Jan  1 00:00:10 host user.info Legato:  INFO | proc[123]/comp T=main | f.c ..."
+SYSLOG_PATTERN = re.compile(
+    r"^(?P<timestamp>\w{3}\s+\d+\s+[\d:]{8})\s+\S+\s+(?P<rest>.*)$"
+)
+LEGATO_PATTERN = re.compile(
+    r"(?P<level>[A-Z\*]+)\s*\|\s*(?P<process>[^\[\s|]+)\[(?P<pid>\d+)\]"
+    r"(?:/(?P<component>[^\s|]+))?[^|]*\|\s*(?P<message>.*)$"
+)
+
+_default_collector = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def parse_log_line(line, seq=0, host_time=None):
+    """Parse a syslog line.
+
+    Lines not emitted by the Legato logging API (kernel, busybox...) only
+    have a timestamp and a message.
+
+    :param line: raw syslog line
+    :param seq: sequence number of the line in the collector
+    :param host_time: host time of reception (default now)
+
+    :returns: LogEntry
+    """
+    line = line.rstrip("\r\n")
+    host_time = time.time() if host_time is None else host_time
+    timestamp = ""
+    rest = line
+    match = SYSLOG_PATTERN.match(line)
+    if match:
+        timestamp, rest = match.group("timestamp"), match.group("rest")
+
+    match = LEGATO_PATTERN.search(rest)
+    if not match:
+        return LogEntry(seq, host_time, timestamp, "", "", 0, "", rest, line)
+    return LogEntry(
+        seq,
+        host_time,
+        timestamp,
+        match.group("level"),
+        match.group("process"),
+        int(match.group("pid")),
+        match.group("component") or "",
+        match.group("message"),
+        line,
+    )
+
+
+def get_log_collector(target):
+    """Get the log collector of the session, started on first use.
+
+    :param target: fixture to communicate with the target
+
+    :returns: LogCollector instance
+    """
+    global _default_collector
+    if _default_collector is None:
+        _default_collector = LogCollector.from_target(
+            target,
+            int(os.environ.get("LETP_LOG_COLLECTOR_SIZE", DEFAULT_BUFFER_SIZE)),
+        )
+        _default_collector.start()
+    return _default_collector
+
+
+def mark_log(target):
+    """Mark the current end of the target log.
+
+    The mark replaces legato.clear_target_log: only the lines logged after
+    it are searched, without restarting syslogd.
+
+    :param target: fixture to communicate with the target
+
+    :returns: LogMark instance
+    """
+    collector = get_log_collector(target)
+    mark = LogMark(target, collector, collector.get_position())
+    mark.position = mark.sync()
+    return mark
+
+
+def stop_log_collector():
+    """Stop the log collector of the session, if any."""
+    global _default_collector
+    if _default_collector is not None:
+        _default_collector.stop()
+        _default_collector = None
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class LogCollector:
+    """Ring buffer of the target syslog fed by a background logread -f."""
+
+    def __init__(self, stream_cmd, max_entries=DEFAULT_BUFFER_SIZE, target=None):
+        """Create a collector.
+
+        :param stream_cmd: host command printing the target log and following it
+        :param max_entries: maximum number of lines kept
+        :param target: fixture to communicate with the target, used to log the
+                       markers of sync (None: no sync)
+        """
+        self.stream_cmd = stream_cmd
+        self.max_entries = max_entries
+        self.target = target
+        self._entries = []
+        self._host_times = []
+        self._by_process = collections.defaultdict(list)
+        self._by_component = collections.defaultdict(list)
+        self._first_seq = 0
+        self._next_seq = 0
+        self._replayed = None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._proc = None
+        self._thread = None
+
+    @classmethod
+    def from_target(cls, target, max_entries=DEFAULT_BUFFER_SIZE):
+        """Create a collector following the log of a target over ssh.
+
+        :param target: fixture to communicate with the target
+        :param max_entries: maximum number of lines kept
+
+        :returns: LogCollector instance
+        """
+        port = str(getattr(target, "ssh_port", None) or 22)
+        stream_cmd = (
+            ["ssh", "-p", port]
+            + SSH_OPTIONS
+            + ["root@%s" % target.target_ip, LOGREAD_FOLLOW_CMD]
+        )
+        return cls(stream_cmd, max_entries, target)
+
+    # ------------------------------------------------------------------------------
+    # Stream management
+    # ------------------------------------------------------------------------------
+    def start(self):
+        """Start following the target log in background."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._follow, name="letp-log-collector", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop following the target log."""
+        self._stopped.set()
+        proc = self._proc
+        if proc and proc.poll() is None:
+            proc.terminate()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._condition:
+            self._condition.notify_all()
+
+    def _follow(self):
+        """Read the stream and restart it until the collector is stopped."""
+        last_line = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                self._proc = subprocess.Popen(
+                    self.stream_cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    universal_newlines=True,
+                    errors="replace",
+                )
+            except OSError as e:
+                swilog.warning("Unable to start the log collector: %s" % e)
+                return
+            for line in self._proc.stdout:
+                self.feed(line)
+                last_line = time.monotonic()
+            self._proc.wait()
+            if time.monotonic() - last_line > RECONNECT_TIMEOUT:
+                swilog.warning(
+                    "No log received for %d s: log collector stopped"
+                    % RECONNECT_TIMEOUT
+                )
+                return
+            if self._stopped.wait(RECONNECT_DELAY):
+                break
+            # The new logread -f replays the target buffer first
+            self._expect_replay()
+            swilog.debug("Log collector stream closed: reconnecting")
+
+    def _expect_replay(self):
+        """Drop the next lines until one was not received yet."""
+        with self._condition:
+            self._replayed = {e.raw for e in self._entries[-REPLAY_WINDOW:]}
+
+    def feed(self, line):
+        """Add a raw log line to the buffer.
+
+        :param line: raw syslog line
+        """
+        line = line.rstrip("\r\n")
+        if not line:
+            return
+        with self._condition:
+            if self._replayed is not None:
+                if line in self._replayed:
+                    self._replayed.discard(line)
+                    return
+                self._replayed = None
+            entry = parse_log_line(line, self._next_seq)
+            self._next_seq += 1
+            self._entries.append(entry)
+            self._host_times.append(entry.host_time)
+            if entry.process:
+                self._by_process[entry.process].append(entry)
+            if entry.component:
+                self._by_component[entry.component].append(entry)
+            if len(self._entries) > self.max_entries:
+                self._trim()
+            self._condition.notify_all()
+
+    def _trim(self):
+        """Drop the oldest half of the buffer."""
+        drop = len(self._entries) - self.max_entries // 2
+        del self._entries[:drop]
+        del self._host_times[:drop]
+        self._first_seq = self._entries[0].seq
+        for index in (self._by_process, self._by_component):
+            for key in list(index):
+                kept = [e for e in index[key] if e.seq >= self._first_seq]
+                if kept:
+                    index[key] = kept
+                else:
+                    del index[key]
+
+    # ------------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------------
+    def get_position(self):
+        """Get the sequence number of the next line to be received.
+
+        :returns: position usable as the since parameter of the queries
+        """
+        with self._condition:
+            return self._next_seq
+
+    def sync(self):
+        """Make sure every line logged so far has been received.
+
+        A unique marker line is logged on the target and waited for: syslog
+        keeps the order of the lines, and the new logread -f prints the
+        target buffer before following it, so the previous lines (the
+        initial replay included) are received too. If the stream does not
+        deliver the marker in time, the target log is read once (see
+        read_once).
+
+        :returns: position of the line following the marker
+
+        :raises AssertionError: if the marker is not in the target log
+        """
+        if self.target is None:
+            return self.get_position()
+        position = self.get_position()
+        token = uuid.uuid4().hex
+        self.target.run(MARKER_CMD % token)
+        found = self.wait_for(re.escape(token), MARKER_TIMEOUT, since=position)
+        if not found:
+            swilog.warning("Log marker not received: reading the target log")
+            self.read_once()
+            found = self.wait_for(re.escape(token), 0, since=position)
+        assert found, "Log marker %s not found in the target log" % token
+        return found[0].seq + 1
+
+    def read_once(self):
+        """Add the lines missed by the stream from a one-shot logread.
+
+        The stream is then restarted: its replay of the target buffer is
+        dropped like after a reboot.
+        """
+        rsp = self.target.run(LOGREAD_CMD)
+        proc = self._proc
+        if proc and proc.poll() is None:
+            proc.terminate()
+        with self._condition:
+            self._expect_replay()
+            for line in rsp.splitlines():
+                self.feed(line)
+        if not (self._thread and self._thread.is_alive()):
+            self.start()
+
+    def _candidates(self, since, since_time, process, component):
+        """Select the entries to scan using the indexes."""
+        if process is not None:
+            entries = self._by_process.get(process, [])
+        elif component is not None:
+            entries = self._by_component.get(component, [])
+        else:
+            start = 0
+            if since_time is not None:
+                start = bisect.bisect_left(self._host_times, since_time)
+            if since is not None:
+                start = max(start, since - self._first_seq)
+            return self._entries[max(start, 0) :]
+
+        seqs = [e.seq for e in entries]
+        start = bisect.bisect_left(seqs, since) if since is not None else 0
+        return [
+            e
+            for e in entries[start:]
+            if (since_time is None or e.host_time >= since_time)
+            and (component is None or e.component == component)
+        ]
+
+    def search(
+        self,
+        pattern,
+        since=None,
+        since_time=None,
+        process=None,
+        component=None,
+        sync=True,
+    ):
+        """Get the received lines matching a pattern.
+
+        :param pattern: regular expression (str or compiled) searched in the lines
+        :param since: only lines from this position (see get_position)
+        :param since_time: only lines received after this host time
+        :param process: only lines logged by this process
+        :param component: only lines logged by this component
+        :param sync: first wait for the lines still in transit (see sync)
+
+        :returns: list of matching LogEntry, oldest first
+        """
+        regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+        if sync:
+            self.sync()
+        with self._condition:
+            entries = self._candidates(since, since_time, process, component)
+        return [e for e in entries if regex.search(e.raw)]
+
+    def wait_for(
+        self, pattern, timeout=30, since=None, process=None, component=None, count=1
+    ):
+        """Wait until lines matching a pattern have been received.
+
+        :param pattern: regular expression (str or compiled) searched in the lines
+        :param timeout: deadline in seconds
+        :param since: only lines from this position (default: already received
+                      lines are considered too)
+        :param process: only lines logged by this process
+        :param component: only lines logged by this component
+        :param count: number of matching lines expected
+
+        :returns: list of matching LogEntry, shorter than count on timeout
+        """
+        regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+        deadline = time.monotonic() + timeout
+        found = []
+        scan_from = since
+        with self._condition:
+            while True:
+                entries = self._candidates(scan_from, None, process, component)
+                found += [e for e in entries if regex.search(e.raw)]
+                scan_from = self._next_seq
+                remaining = deadline - time.monotonic()
+                if len(found) >= count or remaining <= 0 or self._stopped.is_set():
+                    return found
+                self._condition.wait(remaining)
+
+
+class LogMark:
+    """Position in the target log, queries only consider the lines after it."""
+
+    def __init__(self, target, collector, position):
+        """Create a mark.
+
+        :param target: fixture to communicate with the target
+        :param collector: LogCollector receiving the target log
+        :param position: position of the first line after the mark
+        """
+        self.target = target
+        self.collector = collector
+        self.position = position
+
+    def sync(self):
+        """Make sure every line logged so far has been received.
+
+        :returns: position of the line following the marker (see
+                  LogCollector.sync)
+        """
+        return self.collector.sync()
+
+    def search(self, pattern, process=None, component=None, sync=True):
+        """Get the lines logged after the mark matching a pattern.
+
+        :param pattern: regular expression searched in the lines
+        :param process: only lines logged by this process
+        :param component: only lines logged by this component
+        :param sync: first wait for the lines still in transit
+
+        :returns: list of matching LogEntry, oldest first
+        """
+        return self.collector.search(
+            pattern,
+            since=self.position,
+            process=process,
+            component=component,
+            sync=sync,
+        )
+
+    def find(self, *texts):
+        """Check whether a text has been logged after the mark.
+
+        :param texts: texts to look for
+
+        :returns: True if any of the texts has been logged
+        """
+        self.sync()
+        return any(self.search(re.escape(text), sync=False) for text in texts)
+
+    def count(self, text):
+        """Count the lines containing a text logged after the mark.
+
+        :param text: text to look for
+
+        :returns: number of lines
+        """
+        return len(self.search(re.escape(text)))
+
+    def get_text(self):
+        """Get the log lines logged after the mark.
+
+        :returns: lines separated by new lines
+        """
+        lines = [e.raw for e in self.search("") if MARKER_PREFIX not in e.raw]
+        return "\n".join(lines)
+
+    def wait_for_msg(self, text, timeout=30):
+        """Wait until a text is logged after the mark.
+
+        :param text: text to look for
+        :param timeout: deadline in seconds
+
+        :returns: True if the text has been logged before the deadline
+        """
+        return bool(
+            self.collector.wait_for(re.escape(text), timeout, since=self.position)
+        )
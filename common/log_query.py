@@ -0,0 +1,124 @@
+"""Filtering of the target log on the target.
+
+Instead of transferring the whole target log to grep it on the host, a set
+of patterns is compiled into a single awk command run on the target: only
+the matching lines, or only the number of matches, cross the link.
+
+    patterns = [
+        LogPattern("limit", "FileSize limit is:"),
+        LogPattern("passed", "File size limit test PASSED.", count=True),
+        LogPattern("pid", r"Current PID: \\[[0-9]+\\]", regex=True),
+    ]
+    result = query_log(target, patterns)
+    result["limit"]   # list of the matching lines
+    result["passed"]  # number of matching lines
+
+A pattern is a literal string, or a POSIX extended regular expression (the
+awk dialect: no \\d or \\w) when regex is True. The patterns are given to
+awk through its environment, so that they need no escaping.
+"""
+import collections
+import shlex
+
+from common.target_agent import query_target
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+LogPattern = collections.namedtuple("LogPattern", ["name", "pattern", "regex", "count"])
+LogPattern.__new__.__defaults__ = (False, False)
+
+LOGREAD_CMD = "/sbin/logread"
+
+# Environment variable of awk holding the pattern of index i
+PATTERN_VARIABLE = "LETP_LOG_P%d"
+
+DEFAULT_TIMEOUT = 30
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def build_filter_command(patterns, source=LOGREAD_CMD):
+    """Compile patterns into a single filtering command.
+
+    Every matching line is printed as "<pattern index>:<line>" (count
+    patterns excepted), then the number of matches of every pattern as
+    "#<pattern index>=<count>".
+
+    :param patterns: list of LogPattern
+    :param source: command printing the log on the target
+
+    :returns: shell command
+    """
+    variables = []
+    actions = []
+    for index, pattern in enumerate(patterns):
+        variable = PATTERN_VARIABLE % index
+        variables.append("%s=%s" % (variable, shlex.quote(pattern.pattern)))
+        if pattern.regex:
+            test = '$0 ~ ENVIRON["%s"]' % variable
+        else:
+            test = 'index($0, ENVIRON["%s"])' % variable
+        action = "n[%d]++" % index
+        if not pattern.count:
+            action += '; print "%d:" $0' % index
+        actions.append("if (%s) { %s }" % (test, action))
+    program = '{ %s } END { for (i = 0; i < %d; i++) print "#" i "=" n[i] + 0 }' % (
+        "; ".join(actions),
+        len(patterns),
+    )
+    return "%s | %s awk %s" % (source, " ".join(variables), shlex.quote(program))
+
+
+def parse_filter_output(patterns, output):
+    """Parse the output of the filtering command.
+
+    :param patterns: list of LogPattern given to build_filter_command
+    :param output: output of the command
+
+    :returns: dictionary indexed by pattern name: list of the matching lines,
+              or number of matches for the count patterns. None if the
+              command did not complete.
+    """
+    lines = collections.defaultdict(list)
+    counts = {}
+    for line in output.replace("\r", "").splitlines():
+        head, separator, value = line.partition(":")
+        if separator and head.isdigit():
+            lines[int(head)].append(value)
+            continue
+        head, separator, value = line.partition("=")
+        if separator and head[1:].isdigit() and head.startswith("#"):
+            counts[int(head[1:])] = int(value) if value.isdigit() else 0
+    if len(counts) != len(patterns):
+        return None
+    return {
+        pattern.name: counts[index] if pattern.count else lines[index]
+        for index, pattern in enumerate(patterns)
+    }
+
+
+def query_log(target, patterns, source=LOGREAD_CMD, timeout=DEFAULT_TIMEOUT):
+    """Search the target log for a set of patterns in one command.
+
+    The command goes through the target agent when available, else
+    target.run.
+
+    :param target: fixture to communicate with the target
+    :param patterns: list of LogPattern
+    :param source: command printing the log on the target
+    :param timeout: timeout of the command in seconds
+
+    :returns: dictionary indexed by pattern name (see parse_filter_output)
+    """
+    command = build_filter_command(patterns, source)
+    results = query_target(target, "run %s" % command, timeout=timeout)
+    if results is not None:
+        output = results[0].output
+    else:
+        _, output = target.run(command, withexitstatus=True, timeout=timeout)
+    result = parse_filter_output(patterns, output)
+    assert result is not None, "Unable to filter the target log: %s" % output
+    return result
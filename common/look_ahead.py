@@ -0,0 +1,145 @@
+"""Look-ahead builds of the systems of the next tests.
+
+While a test runs on the target, the systems required by the next tests
+(see common.scheduler) are built by background workers and stored in the
+build cache. When such a test starts, its build is a cache hit, or waits for
+the background build in progress instead of starting another one: the next
+test only has to install.
+
+The background builds run legato.make_sys like the tests, with the output
+and object directories in a temporary directory: these options do not change
+the cache key, so the package is the one the test would build.
+
+Environment variables:
+    LETP_LOOK_AHEAD: number of next tests whose system is built in advance.
+                     Unset or 0 disables the look-ahead builds.
+    LETP_LOOK_AHEAD_WORKERS: number of concurrent background builds
+                             (default 1)
+"""
+import concurrent.futures
+import os
+import shutil
+import tempfile
+
+from pytest_letp.lib import swilog
+
+from common.build_cache import get_default_cache, get_update_file_name
+from common.scheduler import get_item_system
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+_look_ahead = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def _get_int_variable(name, default):
+    """Get a non-negative integer from the environment."""
+    try:
+        return max(int(os.environ.get(name, default)), 0)
+    except ValueError:
+        return default
+
+
+def get_look_ahead():
+    """Get the look-ahead builder of the session.
+
+    :returns: LookAheadBuilder configured from the environment
+    """
+    global _look_ahead
+    if _look_ahead is None:
+        _look_ahead = LookAheadBuilder(
+            _get_int_variable("LETP_LOOK_AHEAD", 0),
+            _get_int_variable("LETP_LOOK_AHEAD_WORKERS", 1) or 1,
+        )
+    return _look_ahead
+
+
+def stop_look_ahead():
+    """Cancel the queued builds and wait for the running ones."""
+    if _look_ahead is not None:
+        _look_ahead.stop()
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class LookAheadBuilder:
+    """Background builds of the systems of the next tests."""
+
+    def __init__(self, depth, workers=1, cache=None):
+        self.depth = depth
+        self.cache = cache or get_default_cache()
+        self.items = []
+        self.executor = None
+        if depth:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="letp_look_ahead"
+            )
+        self.builds = 0
+
+    def set_items(self, items):
+        """Set the tests of the session, in execution order.
+
+        :param items: list of pytest items
+        """
+        self.items = list(items)
+
+    def _build(self, legato, def_file, target_name):
+        """Build a system in the background and store it in the cache.
+
+        A failure is only logged: the test builds the system itself.
+        """
+        work_dir = tempfile.mkdtemp(prefix="letp_look_ahead_")
+        try:
+            option = "--output-dir=%s --object-dir=%s" % (
+                work_dir,
+                os.path.join(work_dir, "obj"),
+            )
+            key = self.cache.get_key(def_file, target_name, option)
+            file_name = get_update_file_name(def_file, target_name)
+            if key is None or self.cache.contains(key, file_name):
+                return
+            sys_name = os.path.splitext(os.path.basename(def_file))[0]
+            legato.make_sys(sys_name, sys_path=def_file, option=option, quiet=True)
+            self.cache.store(
+                key,
+                os.path.join(work_dir, file_name),
+                {"def_file": def_file, "target": target_name},
+            )
+            self.builds += 1
+        except Exception as e:  # pylint: disable=broad-except
+            swilog.debug("Look-ahead build of %s failed: %s" % (def_file, e))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def prefetch(self, item, legato, target_name):
+        """Start the builds of the systems of the tests following item.
+
+        :param item: pytest item of the running test
+        :param legato: fixture to call useful functions regarding legato
+        :param target_name: name of the target
+        """
+        if not self.executor or not self.cache.enabled or item not in self.items:
+            return
+        index = self.items.index(item)
+        for next_item in self.items[index + 1 : index + 1 + self.depth]:
+            def_file, _ = get_item_system(next_item)
+            if def_file is None or def_file in self.cache.pending:
+                continue
+            future = self.executor.submit(self._build, legato, def_file, target_name)
+            self.cache.pending[def_file] = future
+            future.add_done_callback(
+                lambda _, d=def_file: self.cache.pending.pop(d, None)
+            )
+
+    def stop(self):
+        """Cancel the queued builds and wait for the running ones."""
+        if self.executor:
+            for future in list(self.cache.pending.values()):
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -0,0 +1,271 @@
+"""Verification of a tree of files on the target against a manifest.
+
+An expected manifest lists the paths of a tree (relative to its root on the
+target) with their type and, optionally, their size, mode and md5 checksum.
+The actual tree is fetched with a single target command (find + stat, and
+md5sum when checksums are expected) instead of one remote test per path,
+and compared to the manifest:
+
+    expected = [ManifestEntry("text.txt", FILE), ManifestEntry("dir", DIRECTORY)]
+    diff = verify_manifest(target, "/legato/systems/current/modules/files/m", expected)
+    assert not diff.missing and not diff.mismatched, diff
+
+Only the sub-trees of the top-level entries of the manifest are listed: the
+extra entries are the ones found in these sub-trees and not in the manifest.
+An expected manifest can also be read from a local tree (the bundled files
+of a definition file) with read_local_manifest.
+"""
+import collections
+import hashlib
+import os
+import posixpath
+import shlex
+import stat
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+FILE = "file"
+DIRECTORY = "directory"
+LINK = "link"
+OTHER = "other"
+
+ManifestEntry = collections.namedtuple(
+    "ManifestEntry", ["path", "type", "size", "mode", "md5"]
+)
+ManifestEntry.__new__.__defaults__ = (FILE, None, None, None)
+
+# missing and extra: lists of ManifestEntry; mismatched: list of
+# (path, field, expected value, actual value)
+ManifestDiff = collections.namedtuple(
+    "ManifestDiff", ["missing", "extra", "mismatched"]
+)
+
+# Separator of the stat fields; the path comes last and may contain it
+FIELD_SEPARATOR = "|"
+STAT_FORMAT = FIELD_SEPARATOR.join(["%F", "%s", "%a", "%n"])
+CHECKSUM_MARKER = "#md5"
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def _get_type(description):
+    """Convert the file type given by stat %F."""
+    if description.startswith("regular"):
+        return FILE
+    if description == "directory":
+        return DIRECTORY
+    if description == "symbolic link":
+        return LINK
+    return OTHER
+
+
+def _normalize(path):
+    """Normalize a path of the tree, relative to its root ("" for the root)."""
+    path = posixpath.normpath(path.strip("/") or ".")
+    return "" if path == "." else path
+
+
+def get_top_paths(expected):
+    """Get the top-level paths of a manifest, where the listing starts.
+
+    :param expected: list of ManifestEntry
+
+    :returns: sorted list of paths
+    """
+    return sorted({_normalize(entry.path).split("/")[0] or "." for entry in expected})
+
+
+def get_listing_command(root, top_paths, checksums=False):
+    """Get the target command listing a tree.
+
+    :param root: root of the tree on the target
+    :param top_paths: paths relative to root where the listing starts
+    :param checksums: True to add the md5 checksums of the files
+
+    :returns: shell command
+    """
+    paths = " ".join(shlex.quote(p) for p in top_paths) or "."
+    command = "cd %s && find %s -exec stat -c '%s' {} + 2>/dev/null" % (
+        shlex.quote(root),
+        paths,
+        STAT_FORMAT,
+    )
+    if checksums:
+        command += "; echo '%s'; find %s -type f -exec md5sum {} + 2>/dev/null" % (
+            CHECKSUM_MARKER,
+            paths,
+        )
+    return command
+
+
+def parse_listing(output):
+    """Parse the output of the listing command.
+
+    :param output: output of the command given by get_listing_command
+
+    :returns: dict of ManifestEntry by path
+    """
+    entries = {}
+    checksums = {}
+    in_checksums = False
+    for line in output.splitlines():
+        line = line.rstrip("\r")
+        if line == CHECKSUM_MARKER:
+            in_checksums = True
+            continue
+        if in_checksums:
+            fields = line.split(None, 1)
+            if len(fields) == 2:
+                checksums[_normalize(fields[1])] = fields[0]
+            continue
+        fields = line.split(FIELD_SEPARATOR, 3)
+        if len(fields) != 4 or not fields[1].isdigit():
+            continue
+        description, size, mode, path = fields
+        path = _normalize(path)
+        if path:
+            entries[path] = ManifestEntry(
+                path, _get_type(description), int(size), int(mode, 8)
+            )
+    for path, md5 in checksums.items():
+        if path in entries:
+            entries[path] = entries[path]._replace(md5=md5)
+    return entries
+
+
+def get_manifest(target, root, top_paths=(".",), checksums=False, timeout=60):
+    """Fetch the actual tree on the target with a single command.
+
+    :param target: fixture to communicate with the target
+    :param root: root of the tree on the target
+    :param top_paths: paths relative to root where the listing starts
+    :param checksums: True to add the md5 checksums of the files
+    :param timeout: timeout of the command in seconds
+
+    :returns: dict of ManifestEntry by path relative to root
+    """
+    _, output = target.run(
+        get_listing_command(root, top_paths, checksums),
+        withexitstatus=True,
+        timeout=timeout,
+    )
+    return parse_listing(output)
+
+
+def _md5(path):
+    """Get the md5 checksum of a local file."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_local_manifest(local_path, target_path, checksums=True):
+    """Read the expected manifest of a local file or tree.
+
+    The modes are not read: they are set by the definition files.
+
+    :param local_path: local file or directory
+    :param target_path: its path relative to the root on the target
+    :param checksums: True to add the md5 checksums of the files
+
+    :returns: list of ManifestEntry
+    """
+
+    def _entry(path, relative_path):
+        info = os.lstat(path)
+        if stat.S_ISLNK(info.st_mode):
+            return ManifestEntry(relative_path, LINK)
+        if stat.S_ISDIR(info.st_mode):
+            return ManifestEntry(relative_path, DIRECTORY)
+        return ManifestEntry(
+            relative_path,
+            FILE,
+            info.st_size,
+            md5=_md5(path) if checksums else None,
+        )
+
+    target_path = _normalize(target_path)
+    manifest = [_entry(local_path, target_path)] if target_path else []
+    if os.path.isdir(local_path) and not os.path.islink(local_path):
+        for directory, dirs, files in os.walk(local_path):
+            for name in sorted(dirs + files):
+                path = os.path.join(directory, name)
+                relative_path = os.path.relpath(path, local_path).replace(os.sep, "/")
+                manifest.append(
+                    _entry(path, posixpath.join(target_path, relative_path))
+                )
+    return manifest
+
+
+def diff_manifest(expected, actual):
+    """Compare an expected manifest to an actual tree.
+
+    The size, mode and checksum are only compared when they are expected;
+    the size of the directories is never compared.
+
+    :param expected: list of ManifestEntry
+    :param actual: dict of ManifestEntry by path
+
+    :returns: ManifestDiff
+    """
+    missing = []
+    mismatched = []
+    expected_paths = set()
+    for entry in expected:
+        path = _normalize(entry.path)
+        expected_paths.add(path)
+        found = actual.get(path)
+        if found is None:
+            missing.append(entry)
+            continue
+        for field in ManifestEntry._fields[1:]:
+            value = getattr(entry, field)
+            if value is None or (field == "size" and entry.type != FILE):
+                continue
+            if value != getattr(found, field):
+                mismatched.append((path, field, value, getattr(found, field)))
+    extra = [actual[path] for path in sorted(actual) if path not in expected_paths]
+    return ManifestDiff(missing, extra, mismatched)
+
+
+def verify_manifest(target, root, expected, timeout=60):
+    """Verify a tree on the target against an expected manifest.
+
+    :param target: fixture to communicate with the target
+    :param root: root of the tree on the target
+    :param expected: list of ManifestEntry, paths relative to root
+    :param timeout: timeout of the listing command in seconds
+
+    :returns: ManifestDiff
+    """
+    actual = get_manifest(
+        target,
+        root,
+        get_top_paths(expected),
+        checksums=any(entry.md5 for entry in expected),
+        timeout=timeout,
+    )
+    return diff_manifest(expected, actual)
+
+
+def format_diff(diff):
+    """Describe the differences with a manifest, one per line.
+
+    :param diff: ManifestDiff
+
+    :returns: list of strings, empty when the tree matches
+    """
+    lines = ["Missing %s %s" % (e.type, e.path) for e in diff.missing]
+    for path, field, expected, actual in diff.mismatched:
+        if field == "mode":
+            expected, actual = "%o" % expected, "%o" % actual
+        lines.append(
+            "Mismatched %s of %s: expected %s, got %s" % (field, path, expected, actual)
+        )
+    lines += ["Extra %s %s" % (e.type, e.path) for e in diff.extra]
+    return lines
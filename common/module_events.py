@@ -0,0 +1,90 @@
+"""Kernel module load/unload events of the target log.
+
+The supervisor logs "New kernel module 'x.ko'" and "Removed kernel module
+'x.ko'" when it loads and unloads a module. The events are parsed once into
+an ordered list and the order is verified in a single pass, against an
+expected sequence and/or the dependency graph of the .mdef files: a wrong
+order is reported immediately instead of after an expect timeout.
+"""
+import collections
+import re
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+ModuleEvent = collections.namedtuple(
+    "ModuleEvent", ["seq", "timestamp", "action", "module"]
+)
+
+LOAD = "load"
+UNLOAD = "unload"
+ACTIONS = {"New": LOAD, "Removed": UNLOAD}
+EVENT_PATTERN = re.compile(r"(New|Removed) kernel module '([^']+)\.ko'")
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def parse_module_events(entries):
+    """Extract the module events from log entries.
+
+    :param entries: list of LogEntry in reception order
+
+    :returns: list of ModuleEvent in the same order
+    """
+    events = []
+    for entry in entries:
+        match = EVENT_PATTERN.search(entry.raw)
+        if match:
+            events.append(
+                ModuleEvent(
+                    entry.seq, entry.timestamp, ACTIONS[match.group(1)], match.group(2)
+                )
+            )
+    return events
+
+
+def get_module_events(log_mark):
+    """Get the module events logged after a mark.
+
+    :param log_mark: LogMark taken before the events
+
+    :returns: list of ModuleEvent in order of appearance
+    """
+    return parse_module_events(log_mark.search(EVENT_PATTERN))
+
+
+def verify_module_order(events, action, modules, ordered=True, graph=None):
+    """Verify the order of the load or unload events of modules.
+
+    Only the first event of each module is considered.
+
+    :param events: list of ModuleEvent in order of appearance
+    :param action: LOAD or UNLOAD
+    :param modules: modules expected to have an event, in the expected order
+    :param ordered: check that the events follow the order of modules
+    :param graph: dependency graph (required modules by module name): a module
+                  is loaded after and unloaded before the modules it requires
+
+    :returns: tuple (result, observed, errors) with observed the modules in
+              order of appearance and errors the list of violations
+    """
+    position = {}
+    for event in events:
+        if event.action == action and event.module not in position:
+            position[event.module] = len(position)
+    observed = sorted((m for m in position if m in modules), key=position.get)
+
+    errors = ["no %s event for %s" % (action, m) for m in modules if m not in position]
+    if ordered and not errors and observed != list(modules):
+        errors.append("expected order %s" % ", ".join(modules))
+    for module, required in (graph or {}).items():
+        for dependency in required:
+            if module not in position or dependency not in position:
+                continue
+            if action == LOAD and position[dependency] > position[module]:
+                errors.append("%s loaded before %s" % (module, dependency))
+            if action == UNLOAD and position[dependency] < position[module]:
+                errors.append("%s unloaded before %s" % (dependency, module))
+    return not errors, observed, errors
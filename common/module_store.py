@@ -0,0 +1,172 @@
+"""Persistent store of prebuilt kernel modules.
+
+The .ko files built from a system definition are stored under a key made
+of:
+    - the module sources (the .sdef, its .mdef files and their sources)
+    - the kernel tree of the target (*_KERNELROOT and its configuration)
+    - the compiler of the target toolchain
+
+On a hit, the stored .ko files are used directly: the system is neither
+built nor walked to find the modules.
+
+Environment variables:
+    LETP_MODULE_STORE: set to 0 to always build the modules
+    LETP_MODULE_STORE_DIR: store location (default ~/.cache/letp/modules)
+"""
+import fnmatch
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+from pytest_letp.lib import swilog
+
+from common import definition_files
+from common.build_cache import get_toolchain_identity
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "letp", "modules")
+
+_default_store = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_compiler_identity(target_name):
+    """Get the version of the C compiler of a target toolchain.
+
+    :param target_name: name of the target (e.g. wp76xx)
+
+    :returns: first line of "gcc --version", or an empty string if unknown
+    """
+    prefix = os.environ.get("%s_TOOLCHAIN_PREFIX" % target_name.upper(), "")
+    toolchain_dir = os.environ.get("%s_TOOLCHAIN_DIR" % target_name.upper(), "")
+    compiler = os.path.join(toolchain_dir, prefix + "gcc")
+    try:
+        output = subprocess.check_output(
+            [compiler, "--version"],
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return output.splitlines()[0] if output else ""
+
+
+def get_default_store():
+    """Get the module store shared by the whole session.
+
+    :returns: ModuleStore instance configured from the environment
+    """
+    global _default_store
+    if _default_store is None:
+        _default_store = ModuleStore(
+            os.environ.get("LETP_MODULE_STORE_DIR", DEFAULT_STORE_DIR),
+            os.environ.get("LETP_MODULE_STORE", "1") != "0",
+        )
+    return _default_store
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class ModuleStore:
+    """Store of .ko files indexed by the hash of their inputs."""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, enabled=True):
+        self.store_dir = store_dir
+        self.enabled = enabled
+
+    def get_key(self, sdef_file, target_name):
+        """Compute the key of the modules of a system definition.
+
+        :param sdef_file: .sdef file listing the kernel modules
+        :param target_name: name of the target
+
+        :returns: hexadecimal key
+        """
+        legato_root = os.environ.get("LEGATO_ROOT")
+        inputs = definition_files.collect_inputs(sdef_file, [legato_root])
+        base_dir = os.path.dirname(os.path.abspath(sdef_file))
+        parts = [
+            "sources=%s" % definition_files.hash_files(inputs, base_dir),
+            "target=%s" % target_name,
+            "compiler=%s" % get_compiler_identity(target_name),
+        ] + get_toolchain_identity(target_name)
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.store_dir, key[:2], key)
+
+    def lookup(self, key):
+        """Get the stored modules of a key.
+
+        :param key: store key
+
+        :returns: dictionary of .ko paths by file name, None on a miss
+        """
+        entry_dir = self._entry_dir(key)
+        if not self.enabled or not os.path.isdir(entry_dir):
+            return None
+        return {
+            name: os.path.join(entry_dir, name)
+            for name in sorted(os.listdir(entry_dir))
+            if name.endswith(".ko")
+        }
+
+    def store(self, key, ko_files):
+        """Store modules under a key.
+
+        :param key: store key
+        :param ko_files: list of .ko paths
+        """
+        entry_dir = self._entry_dir(key)
+        if not self.enabled or not ko_files or os.path.isdir(entry_dir):
+            return
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+
+        # Populate a temporary directory first: concurrent campaigns never see
+        # a partially written entry.
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry_dir))
+        try:
+            for path in ko_files:
+                shutil.copyfile(path, os.path.join(tmp_dir, os.path.basename(path)))
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def get_modules(self, legato, target_name, sdef_file, build_dir):
+        """Get the modules of a system definition, building them on a miss.
+
+        :param legato: fixture to call useful functions regarding legato
+        :param target_name: name of the target
+        :param sdef_file: .sdef file listing the kernel modules
+        :param build_dir: directory where the system is built on a miss
+
+        :returns: dictionary of .ko paths by file name
+        """
+        key = self.get_key(sdef_file, target_name)
+        modules = self.lookup(key)
+        if modules:
+            swilog.info("Prebuilt modules found in store (%s)" % key[:12])
+            return modules
+
+        # The build tree is created in the working directory
+        sys_name = os.path.splitext(os.path.basename(sdef_file))[0]
+        old_path = os.getcwd()
+        os.chdir(build_dir)
+        try:
+            legato.make_sys(sys_name, sdef_file, quiet=True)
+        finally:
+            os.chdir(old_path)
+        modules = {}
+        for root, _, filenames in os.walk(build_dir):
+            for filename in fnmatch.filter(filenames, "*.ko"):
+                modules[filename] = os.path.join(root, filename)
+        self.store(key, list(modules.values()))
+        return self.lookup(key) or modules
@@ -0,0 +1,146 @@
+"""Parallel execution of host-only builds.
+
+Tests which only check that mkapp/mksys succeed or fail never touch the
+target: their builds can run concurrently, each one in its own working
+directory, and the tests then only check the collected results.
+
+The builds run the command of legato.make/legato.make_sys (see
+get_build_command) with the environment of the test session (LEGATO_ROOT and
+the toolchain variables of the target). A test relying on the results checks
+one of them against the serial path first (see check_serial_result).
+
+Environment variables:
+    LETP_PARALLEL_BUILDS: number of build processes ("auto" for one per
+                          host core). Unset or 0 keeps the serial builds.
+"""
+import collections
+import concurrent.futures
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+BuildJob = collections.namedtuple("BuildJob", ["tool", "def_file", "target_name"])
+BuildResult = collections.namedtuple(
+    "BuildResult", ["returncode", "output", "duration"]
+)
+
+BUILD_TOOLS = {".adef": "mkapp", ".sdef": "mksys"}
+
+# A single build never takes longer than this
+BUILD_TIMEOUT = 1200
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_worker_count(value=None):
+    """Get the number of parallel build processes requested.
+
+    :param value: requested value (default LETP_PARALLEL_BUILDS)
+
+    :returns: number of processes, 0 when parallel builds are disabled
+    """
+    value = os.environ.get("LETP_PARALLEL_BUILDS", "0") if value is None else value
+    if str(value).lower() == "auto":
+        return os.cpu_count() or 1
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        return 0
+
+
+def make_job(def_file, target_name):
+    """Create the build job of a definition file.
+
+    :param def_file: path of the .adef or .sdef file
+    :param target_name: name of the target
+
+    :returns: BuildJob
+    """
+    tool = BUILD_TOOLS[os.path.splitext(def_file)[1]]
+    return BuildJob(tool, def_file, target_name)
+
+
+def get_build_command(job):
+    """Get the command building a job, as run by legato.make/legato.make_sys.
+
+    :param job: BuildJob to run
+
+    :returns: command as a list of arguments
+    """
+    return [job.tool, "-t", job.target_name, job.def_file]
+
+
+def check_serial_result(result, serial_build):
+    """Check that the serial path gives the same result as a parallel build.
+
+    :param result: BuildResult of the parallel build
+    :param serial_build: function building the same job through the serial
+                         path, taking should_fail and asserting on a mismatch
+
+    :raises AssertionError: if the serial build does not match the result
+    """
+    try:
+        serial_build(should_fail=result.returncode != 0)
+    except AssertionError as e:
+        raise AssertionError(
+            "Parallel and serial builds differ (returned %d):\n%s\n%s"
+            % (result.returncode, result.output, e)
+        )
+
+
+def run_build(job, work_dir=None):
+    """Run a build in an isolated working directory.
+
+    :param job: BuildJob to run
+    :param work_dir: working directory kept after the build (default a
+                     temporary directory removed after the build)
+
+    :returns: BuildResult
+    """
+    keep_dir = work_dir is not None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="letp_%s_" % job.tool)
+    cmd = get_build_command(job)
+    start = time.time()
+    try:
+        proc = subprocess.run(
+            cmd,
+            cwd=work_dir,
+            env=dict(os.environ),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            timeout=BUILD_TIMEOUT,
+            check=False,
+        )
+        returncode, output = proc.returncode, proc.stdout
+    except (OSError, subprocess.TimeoutExpired) as e:
+        returncode, output = -1, str(e)
+    finally:
+        if not keep_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return BuildResult(
+        returncode, "%s\n%s" % (" ".join(cmd), output), time.time() - start
+    )
+
+
+def run_builds(jobs, workers):
+    """Run build jobs concurrently in a process pool.
+
+    :param jobs: list of BuildJob
+    :param workers: maximum number of concurrent builds
+
+    :returns: dictionary of BuildResult indexed by definition file
+    """
+    results = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_build, job): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future].def_file] = future.result()
+    return results
@@ -0,0 +1,351 @@
+"""Duration-aware ordering and time-budgeted selection of a campaign.
+
+The durations and failures recorded by common.history give, for every test
+of a runtest json, an estimated duration (median of its recent passed runs,
+the median of all the known tests when it was never run) and a value:
+    value = 1 + failure weight * recent failure rate
+so that a test which failed recently is worth more than a stable one.
+
+With a budget (e.g. --budget 20m), the subset of the campaign fitting in the
+budget is selected greedily: first the most valuable test of each coverage
+tag (the test area, e.g. legato/services/secureStorage) so that every area
+is exercised, then the remaining tests by value per second. The selected
+tests are ordered:
+    - campaign: in campaign order
+    - scheduled: grouped by required system (see common.scheduler)
+    - longest: longest first, so that the long tests do not end a shard late
+With --shards N, the tests are assigned longest first to the least loaded of
+N runtest json files.
+
+Usage:
+    python -m common.planner <campaign.json> [--budget 20m] [--order longest]
+                             [--shards N] [-o <planned.json>]
+"""
+import argparse
+import collections
+import json
+import os
+import re
+import statistics
+import sys
+
+from common.history import DEFAULT_DB, HistoryDatabase, get_target_model
+from common.scheduler import analyze_campaign, expand_campaign, schedule
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+PlannedTest = collections.namedtuple(
+    "PlannedTest", ["entry", "duration", "value", "tag", "known"]
+)
+
+ORDERS = ("campaign", "scheduled", "longest")
+
+# Sub-directories of a test area holding its test modules
+AREA_SUBDIRECTORIES = ("host", "target")
+
+DEFAULT_FAILURE_WEIGHT = 4.0
+
+# Duration of the unknown tests when the history is empty, in seconds
+FALLBACK_DURATION = 60.0
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def parse_duration(text):
+    """Parse a duration such as 90, 90s, 20m, 1h30m.
+
+    :param text: duration, in seconds when it has no unit
+
+    :returns: duration in seconds
+
+    :raises argparse.ArgumentTypeError: invalid duration
+    """
+    text = text.strip()
+    if re.match(r"^\d+(\.\d+)?$", text):
+        return float(text)
+    parts = re.findall(r"(\d+(?:\.\d+)?)([hms])", text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        raise argparse.ArgumentTypeError("invalid duration: %s" % text)
+    units = {"h": 3600, "m": 60, "s": 1}
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def get_tag(entry, test_set):
+    """Get the coverage tag of a test: its test area.
+
+    :param entry: TestEntry
+    :param test_set: root of the test set
+
+    :returns: directory of the test module relative to the test set, without
+              its host/target sub-directory
+    """
+    directory = os.path.dirname(os.path.relpath(entry.path, test_set))
+    if os.path.basename(directory) in AREA_SUBDIRECTORIES:
+        directory = os.path.dirname(directory)
+    return directory
+
+
+def _get_test_id(entry, test_set):
+    """Get the pytest id of a runtest entry (path relative to the test set)."""
+    test_id = os.path.relpath(entry.path, test_set)
+    return "%s::%s" % (test_id, entry.function) if entry.function else test_id
+
+
+def _summarize_entry(test_id, summary):
+    """Aggregate the history of the recorded tests matching a runtest entry.
+
+    A module or a parametrized function matches several recorded tests:
+    their durations are added up.
+
+    :returns: tuple (runs, duration or None, failures), None if not recorded
+    """
+    matches = [
+        stats
+        for recorded, stats in summary.items()
+        if recorded == test_id
+        or recorded.startswith(test_id + "[")
+        or recorded.startswith(test_id + "::")
+        or recorded.endswith("/" + test_id)
+    ]
+    if not matches:
+        return None
+    durations = [duration for _, duration, _ in matches if duration is not None]
+    return (
+        max(runs for runs, _, _ in matches),
+        sum(durations) if durations else None,
+        max(failures for _, _, failures in matches),
+    )
+
+
+def estimate(
+    entries,
+    test_set,
+    summary,
+    default_duration=None,
+    failure_weight=DEFAULT_FAILURE_WEIGHT,
+):
+    """Estimate the duration and the value of the tests of a campaign.
+
+    :param entries: list of TestEntry in campaign order
+    :param test_set: root of the test set
+    :param summary: history summary (see HistoryDatabase.get_test_summary)
+    :param default_duration: duration of the tests never run; None for the
+                             median of the known tests
+    :param failure_weight: value added by a 100% recent failure rate
+
+    :returns: list of PlannedTest in campaign order
+    """
+    known = {}
+    for entry in entries:
+        stats = _summarize_entry(_get_test_id(entry, test_set), summary)
+        if stats is not None:
+            known[entry.name] = stats
+    if default_duration is None:
+        durations = [d for _, d, _ in known.values() if d is not None]
+        default_duration = statistics.median(durations) if durations else None
+    if default_duration is None:
+        default_duration = FALLBACK_DURATION
+    planned = []
+    for entry in entries:
+        runs, duration, failures = known.get(entry.name, (0, None, 0))
+        value = 1.0 + failure_weight * failures / runs if runs else 1.0
+        planned.append(
+            PlannedTest(
+                entry,
+                duration if duration is not None else default_duration,
+                value,
+                get_tag(entry, test_set),
+                duration is not None,
+            )
+        )
+    return planned
+
+
+def estimate_campaign(entries, test_set, db_file=None, target_model=None, **kwargs):
+    """Estimate the tests of a campaign from the history database.
+
+    :param entries: list of TestEntry in campaign order
+    :param test_set: root of the test set
+    :param db_file: history database (default LETP_HISTORY_DB)
+    :param target_model: history of this model only (default from
+                         config/target.xml)
+    :param kwargs: other arguments of estimate
+
+    :returns: list of PlannedTest in campaign order
+    """
+    db_file = db_file or os.environ.get("LETP_HISTORY_DB", DEFAULT_DB)
+    summary = {}
+    if os.path.isfile(db_file):
+        summary = HistoryDatabase(db_file).get_test_summary(
+            target_model or get_target_model()
+        )
+    return estimate(entries, test_set, summary, **kwargs)
+
+
+def select(planned, budget):
+    """Select the most valuable tests fitting in a budget.
+
+    The most valuable test of each coverage tag is taken first (the
+    shortest one on a tie), then the others by value per second.
+
+    :param planned: list of PlannedTest in campaign order
+    :param budget: wall-clock budget in seconds, None to select all the tests
+
+    :returns: list of the selected PlannedTest, in campaign order
+    """
+    if budget is None:
+        return list(planned)
+    best_per_tag = {}
+    for test in planned:
+        best = best_per_tag.get(test.tag)
+        if best is None or (test.value, -test.duration) > (best.value, -best.duration):
+            best_per_tag[test.tag] = test
+    candidates = sorted(
+        best_per_tag.values(), key=lambda t: (t.value, -t.duration), reverse=True
+    )
+    candidates += sorted(
+        (t for t in planned if best_per_tag[t.tag] is not t),
+        key=lambda t: t.value / max(t.duration, 1.0),
+        reverse=True,
+    )
+    selected = set()
+    remaining = budget
+    for test in candidates:
+        if test.duration <= remaining:
+            selected.add(test.entry.name)
+            remaining -= test.duration
+    return [t for t in planned if t.entry.name in selected]
+
+
+def order(planned, how="campaign"):
+    """Order the selected tests.
+
+    :param planned: list of PlannedTest in campaign order
+    :param how: one of ORDERS
+
+    :returns: list of PlannedTest in execution order
+    """
+    assert how in ORDERS, "Unknown order: %s" % how
+    if how == "scheduled":
+        by_name = {t.entry.name: t for t in planned}
+        return [by_name[e.name] for e in schedule([t.entry for t in planned])]
+    if how == "longest":
+        return sorted(planned, key=lambda t: t.duration, reverse=True)
+    return list(planned)
+
+
+def split_shards(planned, count):
+    """Assign the tests longest first to the least loaded shard.
+
+    :param planned: list of PlannedTest
+    :param count: number of shards
+
+    :returns: list of (estimated duration, list of PlannedTest) per shard
+    """
+    shards = [[0.0, []] for _ in range(count)]
+    for test in sorted(planned, key=lambda t: t.duration, reverse=True):
+        shard = min(shards, key=lambda s: s[0])
+        shard[0] += test.duration
+        shard[1].append(test)
+    return [tuple(shard) for shard in shards]
+
+
+def _write_campaign(planned, output):
+    """Write a runtest json file, or to stdout if output is None."""
+    content = json.dumps([{"name": t.entry.name} for t in planned], indent=4) + "\n"
+    if output:
+        with open(output, "w") as f:
+            f.write(content)
+    else:
+        sys.stdout.write(content)
+
+
+def main(argv=None):
+    """Plan a runtest json file from the duration history.
+
+    :param argv: command line arguments
+
+    :returns: exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("campaign", help="runtest json file")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="planned json file (default stdout); with --shards, the shard "
+        "files are <output>_<n>.json",
+    )
+    parser.add_argument("--budget", type=parse_duration, help="e.g. 1200, 20m, 1h30m")
+    parser.add_argument("--order", choices=ORDERS, default="campaign")
+    parser.add_argument("--shards", type=int, default=0, help="number of shards")
+    parser.add_argument(
+        "--db",
+        default=os.environ.get("LETP_HISTORY_DB", DEFAULT_DB),
+        help="history database (default LETP_HISTORY_DB)",
+    )
+    parser.add_argument(
+        "--target-model",
+        default=get_target_model(),
+        help="history of this target model only (default from config/target.xml)",
+    )
+    parser.add_argument(
+        "--default-duration",
+        type=parse_duration,
+        help="duration of the tests never run (default median of the others)",
+    )
+    parser.add_argument(
+        "--failure-weight",
+        type=float,
+        default=DEFAULT_FAILURE_WEIGHT,
+        help="value of a test failing at every run, 1 being the value of a "
+        "stable test (default %.0f + 1)" % DEFAULT_FAILURE_WEIGHT,
+    )
+    parser.add_argument(
+        "--test-set",
+        default=os.environ.get("LETP_TEST_SET", os.getcwd()),
+        help="root of the test set (default LETP_TEST_SET)",
+    )
+    args = parser.parse_args(argv)
+
+    entries = analyze_campaign(
+        expand_campaign(args.campaign, args.test_set), args.test_set
+    )
+    planned = estimate_campaign(
+        entries,
+        args.test_set,
+        args.db,
+        args.target_model,
+        default_duration=args.default_duration,
+        failure_weight=args.failure_weight,
+    )
+    selected = order(select(planned, args.budget), args.order)
+    sys.stderr.write(
+        "%d/%d test(s) selected (%d with history), %.0fs estimated, %d/%d tag(s)\n"
+        % (
+            len(selected),
+            len(planned),
+            sum(1 for t in selected if t.known),
+            sum(t.duration for t in selected),
+            len({t.tag for t in selected}),
+            len({t.tag for t in planned}),
+        )
+    )
+    if args.shards <= 0:
+        _write_campaign(selected, args.output)
+        return 0
+    assert args.output, "--shards requires --output"
+    base = os.path.splitext(args.output)[0]
+    for index, (duration, tests) in enumerate(split_shards(selected, args.shards)):
+        shard_file = "%s_%d.json" % (base, index)
+        _write_campaign(tests, shard_file)
+        sys.stderr.write(
+            "%s: %d test(s), %.0fs estimated\n" % (shard_file, len(tests), duration)
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
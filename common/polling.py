@@ -0,0 +1,46 @@
+"""Deadline based polling with backoff.
+
+Replace fixed sleeps by waits which return as soon as a condition is met.
+"""
+import time
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+DEFAULT_INTERVAL = 0.5
+DEFAULT_MAX_INTERVAL = 5
+DEFAULT_BACKOFF = 1.5
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def wait_until(
+    predicate,
+    timeout,
+    interval=DEFAULT_INTERVAL,
+    max_interval=DEFAULT_MAX_INTERVAL,
+    backoff=DEFAULT_BACKOFF,
+):
+    """Call predicate until it returns a true value or the deadline expires.
+
+    The delay between two calls starts at interval and is multiplied by
+    backoff after each unsuccessful call, up to max_interval.
+
+    :param predicate: function without argument
+    :param timeout: deadline in seconds
+    :param interval: first delay between two calls
+    :param max_interval: maximum delay between two calls
+    :param backoff: growth factor of the delay
+
+    :returns: the last value returned by predicate
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        remaining = deadline - time.monotonic()
+        if result or remaining <= 0:
+            return result
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
@@ -0,0 +1,203 @@
+"""Readiness of a freshly installed system.
+
+Instead of sleeping a fixed time after an install, poll concrete signals
+with a deadline and a backoff. All signals are fetched in a single command
+(a batch of queries of the target agent when available):
+    - the Legato framework is running
+    - the expected apps are running
+    - the expected kernel modules are loaded
+    - extra commands (e.g. cm info) succeed
+    - a log pattern (e.g. the supervisor "system started" message) has been
+      logged since a marker written before the install
+
+    mark = mark_system_log(target)
+    legato.install_sys(...)
+    wait_for_system_ready(target, log_pattern=SYSTEM_STARTED_LOG, log_since=mark)
+"""
+import time
+import uuid
+
+import pexpect
+from pytest_letp.lib import swilog
+
+from common.kernel_modules import PROC_MODULES_CMD, parse_proc_modules
+from common.log_collector import MARKER_CMD
+from common.polling import wait_until
+from common.target_agent import query_target
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+READY_TIMEOUT = 120
+SECTION_MARKER = "----LETP-SECTION----"
+FRAMEWORK_RUNNING = "framework is running"
+
+# Logged by the supervisor once the framework has started (matched ignoring case)
+SYSTEM_STARTED_LOG = "system started"
+
+# Modem services are up when cm info displays the device
+CM_INFO_READY_CMD = "/legato/systems/current/bin/cm info | grep -q Device:"
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def _build_log_count_command(log_pattern, log_since):
+    """Build the command counting the log lines matching a pattern.
+
+    Only the lines following the last line containing log_since are
+    counted. When the marker is not in the log any more, the older lines
+    are not either: every matching line is counted.
+    """
+    if not log_since:
+        return "/sbin/logread | grep -c -i -e '%s'" % log_pattern
+    return (
+        "/sbin/logread | grep -i -e '%s' -e '%s' | "
+        "awk 'index($0, \"%s\") { n = 0; next } { n++ } END { print n + 0 }'"
+        % (log_pattern, log_since, log_since)
+    )
+
+
+def _build_state_command(commands, log_pattern, log_since):
+    """Build the command printing every section of the system state."""
+    sections = ["legato status 2>&1", "app status 2>&1", PROC_MODULES_CMD]
+    sections += ['%s >/dev/null 2>&1; echo "rc=$?"' % cmd for cmd in commands]
+    if log_pattern:
+        sections.append(_build_log_count_command(log_pattern, log_since))
+    return ("; echo %s; " % SECTION_MARKER).join(sections)
+
+
+def _query_state_sections(target, commands, log_pattern, log_since, timeout):
+    """Get the sections of the system state from the target agent.
+
+    :returns: list of sections as printed by the state command, None if the
+              agent is not available
+    """
+    queries = ["legato", "apps", "modules"] + ["run %s" % cmd for cmd in commands]
+    if log_pattern:
+        queries.append("run %s" % _build_log_count_command(log_pattern, log_since))
+    results = query_target(target, *queries, timeout=timeout)
+    if results is None:
+        return None
+    sections = [r.output.strip() for r in results]
+    for index in range(3, 3 + len(commands)):
+        sections[index] = "rc=%s" % results[index].status
+    return sections
+
+
+def mark_system_log(target):
+    """Write a marker in the target log, before an install.
+
+    :param target: fixture to communicate with the target
+
+    :returns: text of the marker, to give as log_since
+    """
+    token = uuid.uuid4().hex
+    target.run(MARKER_CMD % token)
+    return token
+
+
+def get_system_state(target, commands=(), log_pattern=None, timeout=30, log_since=None):
+    """Get the state of the Legato system in one round-trip.
+
+    :param target: fixture to communicate with the target
+    :param commands: extra commands whose exit status is collected
+    :param log_pattern: pattern whose occurrences are counted in the log
+                        (basic regular expression, ignoring case)
+    :param timeout: timeout of the command
+    :param log_since: only count the occurrences logged after this marker
+                      (see mark_system_log)
+
+    :returns: dictionary with the keys framework (bool), apps (set of running
+              apps), modules (set of loaded modules), commands (exit status
+              by command) and log_count (occurrences of log_pattern)
+    """
+    sections = _query_state_sections(target, commands, log_pattern, log_since, timeout)
+    if sections is None:
+        _, rsp = target.run(
+            _build_state_command(commands, log_pattern, log_since),
+            withexitstatus=True,
+            timeout=timeout,
+        )
+        sections = [s.strip() for s in rsp.replace("\r", "").split(SECTION_MARKER)]
+    sections += [""] * (3 + len(commands) + 1 - len(sections))
+
+    state = {
+        "framework": FRAMEWORK_RUNNING in sections[0],
+        "apps": set(),
+        "modules": set(parse_proc_modules(sections[2])),
+        "commands": {},
+        "log_count": 0,
+    }
+    for line in sections[1].splitlines():
+        if line.startswith("[running]"):
+            state["apps"].add(line.split("]", 1)[1].strip())
+    for cmd, section in zip(commands, sections[3:]):
+        state["commands"][cmd] = section.endswith("rc=0")
+    if log_pattern:
+        count = sections[3 + len(commands)].splitlines()
+        state["log_count"] = int(count[-1]) if count and count[-1].isdigit() else 0
+    return state
+
+
+def get_missing_signals(state, apps=(), modules=(), commands=(), log_pattern=None):
+    """List the readiness signals which are not present yet.
+
+    :param state: dictionary returned by get_system_state
+    :param apps: apps expected to be running
+    :param modules: kernel modules expected to be loaded
+    :param commands: commands expected to succeed
+    :param log_pattern: pattern expected in the log
+
+    :returns: list of descriptions of the missing signals
+    """
+    missing = []
+    if not state["framework"]:
+        missing.append("framework not running")
+    missing += ["app %s not running" % a for a in apps if a not in state["apps"]]
+    missing += [
+        "module %s not loaded" % m for m in modules if m not in state["modules"]
+    ]
+    missing += ["'%s' failed" % c for c in commands if not state["commands"].get(c)]
+    if log_pattern and not state["log_count"]:
+        missing.append("'%s' not logged" % log_pattern)
+    return missing
+
+
+def wait_for_system_ready(
+    target,
+    apps=(),
+    modules=(),
+    commands=(),
+    log_pattern=None,
+    timeout=READY_TIMEOUT,
+    log_since=None,
+):
+    """Wait until the installed system is usable.
+
+    Fails when a signal is still missing at the deadline.
+
+    :param target: fixture to communicate with the target
+    :param apps: apps expected to be running
+    :param modules: kernel modules expected to be loaded
+    :param commands: commands expected to succeed (e.g. CM_INFO_READY_CMD)
+    :param log_pattern: pattern expected in the log (e.g. SYSTEM_STARTED_LOG)
+    :param timeout: deadline in seconds
+    :param log_since: marker written before the install (see mark_system_log)
+    """
+    missing = []
+
+    def _is_ready():
+        try:
+            state = get_system_state(target, commands, log_pattern, log_since=log_since)
+        except (pexpect.TIMEOUT, pexpect.EOF):
+            missing[:] = ["target not reachable"]
+            return False
+        missing[:] = get_missing_signals(state, apps, modules, commands, log_pattern)
+        return not missing
+
+    start = time.monotonic()
+    ready = wait_until(_is_ready, timeout)
+    assert ready, "System not ready after %d s: %s" % (timeout, ", ".join(missing))
+    swilog.info("System ready after %.1f s" % (time.monotonic() - start))
@@ -0,0 +1,327 @@
+"""Campaign scheduler grouping the tests by required system.
+
+Most target tests install their own system (<resources>/<test_name>.sdef)
+and restore the golden system afterwards. Ordering the campaign so that the
+tests requiring the same system run one after the other lets:
+    - consecutive golden restores be skipped (see common.golden)
+    - tests marked with @pytest.mark.system_chain reuse the system installed
+      by the previous test, without a golden restore in between
+
+The required system of a test is found statically: the test function
+assigns test_name and calls install_system (or an equivalent helper). At run
+time, the install helper calls mark_system_installed once the system is
+ready; a test only reuses the system of the previous one if that test
+installed it and passed.
+
+Usage:
+    python -m common.scheduler <campaign.json> [-o <scheduled.json>]
+"""
+import argparse
+import ast
+import collections
+import json
+import os
+import sys
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+TestEntry = collections.namedtuple(
+    "TestEntry", ["name", "path", "function", "system", "chainable"]
+)
+
+# Helpers installing <resources>/<test_name>.sdef
+INSTALL_FUNCTIONS = (
+    "install_system",
+    "make_install_sys_in_temporary_directory",
+    "make_install_sys",
+)
+
+CHAIN_MARKER = "system_chain"
+TEST_SET_VARIABLE = "$LETP_TEST_SET"
+
+_modules = {}
+_previous_item = None
+_current_item = None
+_next_item = None
+# Last item which installed its system and passed, None once a test failed
+_installed_item = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def resolve_name(name, test_set):
+    """Resolve a runtest entry to a host path.
+
+    :param name: entry name (e.g. $LETP_TEST_SET/x/test_y.py::L_Y_0001)
+    :param test_set: root of the test set
+
+    :returns: tuple (path, function name or None)
+    """
+    path, _, function = name.partition("::")
+    path = path.replace(TEST_SET_VARIABLE, test_set)
+    return os.path.expandvars(path), function or None
+
+
+def expand_campaign(json_file, test_set):
+    """List the test entries of a runtest json, nested campaigns included.
+
+    :param json_file: runtest json file
+    :param test_set: root of the test set
+
+    :returns: list of entry names in campaign order
+    """
+    with open(json_file) as f:
+        entries = json.load(f)
+    names = []
+    for entry in entries:
+        path, _ = resolve_name(entry["name"], test_set)
+        if path.endswith(".json"):
+            names += expand_campaign(path, test_set)
+        else:
+            names.append(entry["name"])
+    return names
+
+
+def _get_decorator_names(function):
+    """Get the names of the decorators of a function (e.g. system_chain)."""
+    names = []
+    for decorator in function.decorator_list:
+        node = decorator.func if isinstance(decorator, ast.Call) else decorator
+        if isinstance(node, ast.Attribute):
+            names.append(node.attr)
+        elif isinstance(node, ast.Name):
+            names.append(node.id)
+    return names
+
+
+def _get_test_system_name(function):
+    """Get the test_name installed by a test function, or None."""
+    test_name = None
+    installs = False
+    for node in ast.walk(function):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant):
+            targets = [t.id for t in node.targets if isinstance(t, ast.Name)]
+            if "test_name" in targets and isinstance(node.value.value, str):
+                test_name = node.value.value
+        elif isinstance(node, ast.Call):
+            func = node.func
+            name = (
+                func.attr
+                if isinstance(func, ast.Attribute)
+                else getattr(func, "id", "")
+            )
+            installs = installs or name in INSTALL_FUNCTIONS
+    return test_name if installs else None
+
+
+def analyze_module(path):
+    """Find the required system of every test function of a module.
+
+    :param path: path of the test module
+
+    :returns: dictionary of (sdef path or None, chainable) by function name
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    resources = os.path.join(os.path.dirname(os.path.abspath(path)), "resources")
+    result = {}
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        system = None
+        test_name = _get_test_system_name(node)
+        if test_name:
+            sdef = os.path.join(resources, "%s.sdef" % test_name)
+            system = sdef if os.path.isfile(sdef) else None
+        result[node.name] = (system, CHAIN_MARKER in _get_decorator_names(node))
+    return result
+
+
+def analyze_campaign(names, test_set):
+    """Get the test entries of a campaign with their required system.
+
+    :param names: entry names in campaign order
+    :param test_set: root of the test set
+
+    :returns: list of TestEntry
+    """
+    modules = {}
+    entries = []
+    for name in names:
+        path, function = resolve_name(name, test_set)
+        system, chainable = None, False
+        if function and path.endswith(".py") and os.path.isfile(path):
+            if path not in modules:
+                modules[path] = analyze_module(path)
+            system, chainable = modules[path].get(function.split("[")[0], (None, False))
+        entries.append(TestEntry(name, path, function, system, chainable))
+    return entries
+
+
+def schedule(entries):
+    """Order the tests to group those requiring the same system.
+
+    The tests of a module stay together, modules in order of first
+    appearance: their module-scoped fixtures and state are kept. Inside a
+    module, the tests requiring the golden system come first, then one
+    group per system in order of first appearance. The campaign order is
+    kept inside a group, except that chainable tests are placed at the end
+    of it so that they follow each other.
+
+    :param entries: list of TestEntry in campaign order
+
+    :returns: list of TestEntry in scheduled order
+    """
+    modules = collections.OrderedDict()
+    for entry in entries:
+        groups = modules.setdefault(entry.path, collections.OrderedDict([(None, [])]))
+        groups.setdefault(entry.system, []).append(entry)
+    scheduled = []
+    for groups in modules.values():
+        for group in groups.values():
+            scheduled += [e for e in group if not e.chainable]
+            scheduled += [e for e in group if e.chainable]
+    return scheduled
+
+
+def count_installs(entries):
+    """Count the system installs and golden restores of a test order.
+
+    :param entries: list of TestEntry in execution order
+
+    :returns: tuple (installs, restores)
+    """
+    installs = restores = 0
+    previous = None
+    for entry in entries:
+        chained = (
+            previous is not None
+            and previous.chainable
+            and entry.chainable
+            and previous.system == entry.system
+        )
+        if entry.system and not chained:
+            installs += 1
+            if previous is not None and previous.system:
+                restores += 1
+        elif not entry.system and previous is not None and previous.system:
+            restores += 1
+        previous = entry
+    return installs, restores
+
+
+def set_current_items(item, nextitem):
+    """Record the running pytest item and its neighbours (see conftest).
+
+    :param item: pytest item about to run
+    :param nextitem: pytest item which will run next, or None
+    """
+    global _previous_item, _current_item, _next_item
+    _previous_item, _current_item, _next_item = _current_item, item, nextitem
+
+
+def mark_system_installed():
+    """Record that the running test installed its system (see reuses_system)."""
+    global _installed_item
+    _installed_item = _current_item
+
+
+def record_report(report):
+    """Forget the installed system when a test fails or is skipped (see conftest).
+
+    :param report: pytest TestReport of a phase of the running test
+    """
+    global _installed_item
+    if report.failed or report.skipped:
+        _installed_item = None
+
+
+def get_item_system(item):
+    """Get the required system and chain marker of a pytest item.
+
+    :param item: pytest item
+
+    :returns: tuple (sdef path or None, chainable)
+    """
+    path = str(item.fspath)
+    if path not in _modules:
+        _modules[path] = analyze_module(path)
+    function = getattr(item, "originalname", None) or item.name.split("[")[0]
+    return _modules[path].get(function, (None, False))
+
+
+def _is_chained(item, nextitem):
+    """Check whether nextitem can run on the system installed by item."""
+    if item is None or nextitem is None:
+        return False
+    system, chainable = get_item_system(item)
+    next_system, next_chainable = get_item_system(nextitem)
+    return bool(system) and chainable and next_chainable and system == next_system
+
+
+def keeps_system():
+    """Check whether the running test must leave its system to the next one.
+
+    :returns: True if both tests are marked system_chain and require the
+              same system, and the running test installed it and has not
+              failed: the golden restore is skipped
+    """
+    return (
+        _installed_item is not None
+        and _installed_item is _current_item
+        and _is_chained(_current_item, _next_item)
+    )
+
+
+def reuses_system():
+    """Check whether the running test runs on the system of the previous one.
+
+    :returns: True if the previous test installed the system and passed,
+              and both tests are chained: the install is skipped
+    """
+    return (
+        _installed_item is not None
+        and _installed_item is _previous_item
+        and _is_chained(_previous_item, _current_item)
+    )
+
+
+def main(argv=None):
+    """Schedule a runtest json file.
+
+    :param argv: command line arguments
+
+    :returns: exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("campaign", help="runtest json file")
+    parser.add_argument("-o", "--output", help="scheduled json file (default stdout)")
+    parser.add_argument(
+        "--test-set",
+        default=os.environ.get("LETP_TEST_SET", os.getcwd()),
+        help="root of the test set (default LETP_TEST_SET)",
+    )
+    args = parser.parse_args(argv)
+
+    entries = analyze_campaign(
+        expand_campaign(args.campaign, args.test_set), args.test_set
+    )
+    scheduled = schedule(entries)
+    sys.stderr.write(
+        "Installs/restores: %d/%d in campaign order, %d/%d scheduled\n"
+        % (count_installs(entries) + count_installs(scheduled))
+    )
+    content = json.dumps([{"name": e.name} for e in scheduled], indent=4) + "\n"
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(content)
+    else:
+        sys.stdout.write(content)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
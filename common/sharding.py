@@ -0,0 +1,310 @@
+"""Sharding of a campaign across a pool of identical targets.
+
+The campaign is split into work units, one per group of consecutive tests
+requiring the same system (see common.scheduler), dealt round-robin to one
+queue per target. Each target runs its units in its own LeTP process, with
+its own target configuration, so its own target/legato fixtures and tmpdirs.
+A target whose queue is empty steals the last unit of the longest queue.
+With --longest-first, the units are dealt longest first according to the
+duration history (see common.planner).
+The junit reports of all the units are merged into one report.
+
+The pool is described by an xml file (see config/target_pool.xml) giving,
+for each target, the LeTP configuration overriding config/target.xml.
+
+Usage:
+    python -m common.sharding <pool.xml> <campaign.json> [-o <output dir>]
+                              [--longest-first]
+"""
+import argparse
+import collections
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from common.planner import estimate_campaign
+from common.scheduler import analyze_campaign, expand_campaign, schedule
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+PoolTarget = collections.namedtuple("PoolTarget", ["name", "configs"])
+WorkUnit = collections.namedtuple("WorkUnit", ["index", "names"])
+UnitResult = collections.namedtuple(
+    "UnitResult", ["unit", "target", "returncode", "report", "duration"]
+)
+
+DEFAULT_COMMAND = "letp run"
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def read_pool(pool_file):
+    """Read the targets of a pool description.
+
+    :param pool_file: xml file with one <target name="..."> per board, each
+                      with <config> elements passed to LeTP as --config
+
+    :returns: list of PoolTarget
+    """
+    root = ET.parse(pool_file).getroot()
+    targets = []
+    for index, element in enumerate(root.iter("target")):
+        name = element.get("name") or "target%d" % index
+        configs = [c.text.strip() for c in element.iter("config") if c.text]
+        targets.append(PoolTarget(name, configs))
+    assert targets, "No target in %s" % pool_file
+    return targets
+
+
+def split_campaign(entries):
+    """Split a scheduled campaign into work units.
+
+    The tests requiring the same system stay in the same unit, so that a
+    target installs each system once. The tests running on the golden system
+    are grouped by test module.
+
+    :param entries: list of TestEntry in scheduled order
+
+    :returns: list of WorkUnit
+    """
+    units = []
+    previous = None
+    for entry in entries:
+        key = entry.system or entry.path
+        if key != previous:
+            units.append(WorkUnit(len(units), []))
+        units[-1].names.append(entry.name)
+        previous = key
+    return units
+
+
+def sort_units(units, durations):
+    """Order work units longest first and renumber them.
+
+    Dealt in this order, the long units start first and the short ones fill
+    the gaps at the end of the campaign.
+
+    :param units: list of WorkUnit
+    :param durations: estimated duration of the tests by entry name
+
+    :returns: list of WorkUnit
+    """
+    ordered = sorted(
+        units, key=lambda u: sum(durations.get(n, 0) for n in u.names), reverse=True
+    )
+    return [WorkUnit(index, unit.names) for index, unit in enumerate(ordered)]
+
+
+class WorkQueues:
+    """One queue of work units per target, with work stealing."""
+
+    def __init__(self, units, count):
+        """Deal the units round-robin.
+
+        :param units: list of WorkUnit
+        :param count: number of targets
+        """
+        self.lock = threading.Lock()
+        self.queues = [collections.deque() for _ in range(count)]
+        for unit in units:
+            self.queues[unit.index % count].append(unit)
+        self.steals = 0
+
+    def get(self, index):
+        """Get the next unit of a target.
+
+        :param index: index of the target
+
+        :returns: WorkUnit, or None when all the queues are empty
+        """
+        with self.lock:
+            if self.queues[index]:
+                return self.queues[index].popleft()
+            victim = max(self.queues, key=len)
+            if not victim:
+                return None
+            self.steals += 1
+            return victim.pop()
+
+
+def run_unit(unit, target, output_dir, command=DEFAULT_COMMAND):
+    """Run a work unit on a target in its own LeTP process.
+
+    :param unit: WorkUnit
+    :param target: PoolTarget
+    :param output_dir: directory of the campaign files and reports
+    :param command: LeTP command line
+
+    :returns: UnitResult
+    """
+    unit_dir = os.path.join(output_dir, target.name, "unit_%04d" % unit.index)
+    os.makedirs(unit_dir, exist_ok=True)
+    json_file = os.path.join(unit_dir, "campaign.json")
+    with open(json_file, "w") as f:
+        json.dump([{"name": name} for name in unit.names], f, indent=4)
+    report = os.path.join(unit_dir, "report.xml")
+
+    args = shlex.split(command) + [json_file]
+    for config in target.configs:
+        args += ["--config", config]
+    args += ["--junitxml=%s" % report, "--basetemp=%s" % os.path.join(unit_dir, "tmp")]
+
+    start = time.time()
+    with open(os.path.join(unit_dir, "output.log"), "w") as log:
+        returncode = subprocess.call(args, stdout=log, stderr=subprocess.STDOUT)
+    return UnitResult(unit, target, returncode, report, time.time() - start)
+
+
+def run_sharded(targets, units, output_dir, command=DEFAULT_COMMAND):
+    """Run work units across a pool of targets.
+
+    :param targets: list of PoolTarget
+    :param units: list of WorkUnit
+    :param output_dir: directory of the campaign files and reports
+    :param command: LeTP command line
+
+    :returns: tuple (list of UnitResult in unit order, number of steals)
+    """
+    queues = WorkQueues(units, len(targets))
+    results = []
+
+    def _worker(index):
+        while True:
+            unit = queues.get(index)
+            if unit is None:
+                return
+            result = run_unit(unit, targets[index], output_dir, command)
+            print(
+                "[%s] unit %d: %d test(s), exit code %d in %.1fs"
+                % (
+                    result.target.name,
+                    unit.index,
+                    len(unit.names),
+                    result.returncode,
+                    result.duration,
+                )
+            )
+            with queues.lock:
+                results.append(result)
+
+    threads = [
+        threading.Thread(target=_worker, args=(i,), name=t.name)
+        for i, t in enumerate(targets)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(results, key=lambda r: r.unit.index), queues.steals
+
+
+def merge_reports(results, report_file):
+    """Merge the junit reports of the work units.
+
+    Each test case gets a "target" property naming the target it ran on. A
+    unit without report (LeTP crash) is reported as one error.
+
+    :param results: list of UnitResult
+    :param report_file: merged junit xml file
+
+    :returns: dictionary of counters (tests, failures, errors, skipped)
+    """
+    totals = collections.OrderedDict(
+        (key, 0) for key in ("tests", "failures", "errors", "skipped")
+    )
+    merged = ET.Element("testsuites")
+    for result in results:
+        if os.path.isfile(result.report):
+            root = ET.parse(result.report).getroot()
+            suites = [root] if root.tag == "testsuite" else list(root)
+        else:
+            suite = ET.Element("testsuite", name="unit_%04d" % result.unit.index)
+            suite.set("tests", "1")
+            suite.set("errors", "1")
+            case = ET.SubElement(suite, "testcase", name=result.unit.names[0])
+            ET.SubElement(case, "error", message="No report").text = (
+                "LeTP exited with code %d" % result.returncode
+            )
+            suites = [suite]
+        for suite in suites:
+            suite.set("hostname", result.target.name)
+            for case in suite.iter("testcase"):
+                properties = case.find("properties")
+                if properties is None:
+                    properties = ET.SubElement(case, "properties")
+                ET.SubElement(
+                    properties, "property", name="target", value=result.target.name
+                )
+            for key in totals:
+                totals[key] += int(suite.get(key, 0))
+            merged.append(suite)
+    for key, value in totals.items():
+        merged.set(key, str(value))
+    ET.ElementTree(merged).write(report_file, encoding="utf-8", xml_declaration=True)
+    return totals
+
+
+def main(argv=None):
+    """Run a campaign across a pool of targets.
+
+    :param argv: command line arguments
+
+    :returns: exit code, 0 when every test passed
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("pool", help="target pool xml file")
+    parser.add_argument("campaign", help="runtest json file")
+    parser.add_argument("-o", "--output", default="sharded", help="output directory")
+    parser.add_argument("--command", default=DEFAULT_COMMAND, help="LeTP command")
+    parser.add_argument(
+        "--longest-first",
+        action="store_true",
+        help="deal the units longest first, as estimated from the duration "
+        "history (see common.planner)",
+    )
+    parser.add_argument(
+        "--test-set",
+        default=os.environ.get("LETP_TEST_SET", os.getcwd()),
+        help="root of the test set (default LETP_TEST_SET)",
+    )
+    args = parser.parse_args(argv)
+
+    targets = read_pool(args.pool)
+    entries = analyze_campaign(
+        expand_campaign(args.campaign, args.test_set), args.test_set
+    )
+    units = split_campaign(schedule(entries))
+    if args.longest_first:
+        durations = {
+            t.entry.name: t.duration for t in estimate_campaign(entries, args.test_set)
+        }
+        units = sort_units(units, durations)
+    print(
+        "%d test(s) in %d unit(s) on %d target(s)"
+        % (len(entries), len(units), len(targets))
+    )
+    start = time.time()
+    results, steals = run_sharded(targets, units, args.output, args.command)
+    totals = merge_reports(results, os.path.join(args.output, "report.xml"))
+    print(
+        "%s in %.1fs, %d unit(s) stolen"
+        % (
+            ", ".join("%d %s" % (v, k) for k, v in totals.items()),
+            time.time() - start,
+            steals,
+        )
+    )
+    failed = totals["failures"] + totals["errors"]
+    return 1 if failed or any(r.returncode for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""Pool of multiplexed SSH connections to the targets.
+
+Every legato.ssh_to_target call used to spawn an ssh client doing a full
+handshake with the target. With the pool, one OpenSSH master connection
+(ControlMaster) is kept per target and the commands are sent as new
+channels of it: a command only costs the spawn of a multiplexing client.
+
+The master is:
+    - started on the first command to the target
+    - checked (ssh -O check) before a command when it was idle for a while
+    - closed before target.reboot/wait_for_reboot, and restarted on the next
+      command
+    - restarted on the next command when a command failed on a connection
+      error (exit 255). The failed command is not run again: it may have
+      run on the target, its exit code 255 is returned as is.
+If the master cannot be started, the commands fall back to the original
+ssh_to_target: the command has not been run then. target.run already goes through the persistent session of
+the target fixture and is kept as is.
+
+Environment variables:
+    LETP_SSH_POOL: set to 0 to disable the pool
+"""
+import functools
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import pytest
+
+from pytest_letp.lib import swilog
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+SSH_OPTIONS = (
+    "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -o LogLevel=ERROR"
+)
+
+# Exit code of the ssh client when the connection failed
+SSH_ERROR = 255
+
+# Idle time (s) after which the master is checked before a command
+HEALTH_CHECK_INTERVAL = 5.0
+
+# Keep-alive of the master: a dead link is detected after 3 x 2 s
+KEEPALIVE_OPTIONS = "-o ServerAliveInterval=2 -o ServerAliveCountMax=3"
+
+# Delay (s) before a new attempt to start a master which failed to start
+START_RETRY_DELAY = 30.0
+
+# Methods of the target fixture after which the connection must be restarted
+REBOOT_METHODS = ("reboot", "wait_for_reboot")
+
+_pool = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_ssh_pool():
+    """Get the connection pool of the session.
+
+    :returns: SshPool
+    """
+    global _pool
+    if _pool is None:
+        _pool = SshPool()
+    return _pool
+
+
+def get_ssh_port(read_config):
+    """Get the ssh port of the target from the LeTP configuration.
+
+    :param read_config: fixture to read the LeTP configuration, or None
+
+    :returns: port number
+    """
+    port = read_config.findtext("module/ssh/port") if read_config else None
+    return int(port) if port and port.strip().isdigit() else 22
+
+
+def get_target_connection(target, read_config=None):
+    """Get the pooled connection to the target of a target fixture.
+
+    :param target: target fixture
+    :param read_config: fixture to read the LeTP configuration, or None
+
+    :returns: SshConnection, or None when the pool is disabled or the target
+              has no ip address
+    """
+    host = getattr(target, "target_ip", None)
+    if os.environ.get("LETP_SSH_POOL") == "0" or not host:
+        return None
+    return get_ssh_pool().get(host, get_ssh_port(read_config))
+
+
+def register(config):
+    """Register the pool plugin unless LETP_SSH_POOL is 0.
+
+    :param config: pytest config
+    """
+    if os.environ.get("LETP_SSH_POOL") != "0":
+        config.pluginmanager.register(SshPoolPlugin(get_ssh_pool()), "letp_ssh_pool")
+
+
+def stop_ssh_pool():
+    """Close the master connections."""
+    if _pool is not None:
+        _pool.close_all()
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class SshConnection:
+    """Master connection to a target and its multiplexed commands."""
+
+    def __init__(self, host, port, control_dir, user="root"):
+        self.host = host
+        self.port = port
+        self.user = user
+        # Unix socket paths are limited to about 100 characters
+        self.control_path = os.path.join(control_dir, "%s_%d" % (host, port))
+        self.lock = threading.Lock()
+        self.started = False
+        self.last_used = 0.0
+        self.failed_at = None
+        self.restarts = 0
+        self.commands = 0
+
+    def get_command(self, *options):
+        """Get the ssh command line going through the master.
+
+        :param options: additional ssh options
+
+        :returns: command line string
+        """
+        return "ssh %s -o ControlPath=%s -p %d %s %s@%s" % (
+            SSH_OPTIONS,
+            self.control_path,
+            self.port,
+            " ".join(options),
+            self.user,
+            self.host,
+        )
+
+    def get_arguments(self, *options):
+        """Get the arguments of an ssh client going through the master.
+
+        :param options: additional ssh options
+
+        :returns: list of arguments, the remote command excluded
+        """
+        return shlex.split(self.get_command(*options))
+
+    def _control(self, operation):
+        """Send a control command (check, exit) to the master."""
+        return subprocess.run(
+            "%s 2>/dev/null" % self.get_command("-O %s" % operation),
+            shell=True,
+            stdout=subprocess.DEVNULL,
+            timeout=10,
+        ).returncode
+
+    def start(self, timeout=10):
+        """Start the master connection in the background.
+
+        :param timeout: connection timeout in seconds
+
+        :returns: True if the master is running
+        """
+        with self.lock:
+            if self.started and self._control("check") == 0:
+                return True
+            # Fall back to the plain ssh for a while instead of waiting for
+            # a connection timeout at every command
+            if self.failed_at and time.time() - self.failed_at < START_RETRY_DELAY:
+                return False
+            result = subprocess.run(
+                self.get_command(
+                    "-M -N -f -o ControlMaster=yes -o ControlPersist=yes",
+                    "-o ConnectTimeout=%d" % timeout,
+                    KEEPALIVE_OPTIONS,
+                ),
+                shell=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                timeout=timeout + 5,
+            )
+            self.started = result.returncode == 0
+            if self.started:
+                self.last_used = time.time()
+                self.failed_at = None
+            else:
+                self.failed_at = time.time()
+                swilog.debug(
+                    "SSH master to %s failed: %s" % (self.host, result.stderr.strip())
+                )
+            return self.started
+
+    def close(self):
+        """Close the master connection."""
+        with self.lock:
+            if os.path.exists(self.control_path):
+                self._control("exit")
+            self.started = False
+
+    def is_healthy(self):
+        """Check the master connection, if it was idle for a while.
+
+        :returns: True if the master can be used
+        """
+        if not self.started:
+            return False
+        if time.time() - self.last_used < HEALTH_CHECK_INTERVAL:
+            return True
+        return self._control("check") == 0
+
+    def ensure(self):
+        """Start the master, or restart it if it is not healthy.
+
+        :returns: True if the master can be used
+        """
+        if self.is_healthy():
+            return True
+        if self.commands:
+            self.restarts += 1
+        self.close()
+        return self.start()
+
+    def check_failure(self, returncode):
+        """Tell whether a command failed on a connection error.
+
+        :param returncode: exit code of the ssh client
+
+        :returns: True if the master is lost (it is then restarted on the
+                  next command)
+        """
+        # 255 through a living master is the exit code of the command
+        if returncode != SSH_ERROR or self._control("check") == 0:
+            return False
+        self.started = False
+        return True
+
+    def run(self, cmd, output=False, timeout=None):
+        """Run a command on the target through the master.
+
+        The command is given as to legato.ssh_to_target: it is put between
+        double quotes on the host command line.
+
+        :param cmd: command to run on the target
+        :param output: True to get the output instead of the exit code
+        :param timeout: timeout in seconds, None for no timeout
+
+        :returns: exit code, or output if output is True. None if the master
+                  could not be started: the command has not been run.
+        """
+        if not self.ensure():
+            return None
+        result = subprocess.run(
+            '%s "%s"' % (self.get_command("-o ControlMaster=no"), cmd),
+            shell=True,
+            stdout=subprocess.PIPE if output else None,
+            universal_newlines=True,
+            timeout=timeout,
+        )
+        self.last_used = time.time()
+        self.commands += 1
+        # The command may have run: a lost master is only restarted for the
+        # next command
+        self.check_failure(result.returncode)
+        return result.stdout if output else result.returncode
+
+
+class SshPool:
+    """One master connection per target."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = {}
+        self.control_dir = None
+
+    def get(self, host, port=22):
+        """Get the connection to a target.
+
+        :param host: ip address of the target
+        :param port: ssh port of the target
+
+        :returns: SshConnection, started on its first command
+        """
+        with self.lock:
+            if self.control_dir is None:
+                self.control_dir = tempfile.mkdtemp(prefix="letp_ssh_")
+            key = (host, port)
+            if key not in self.connections:
+                self.connections[key] = SshConnection(host, port, self.control_dir)
+            return self.connections[key]
+
+    def invalidate(self, host):
+        """Close the connections to a target about to reboot.
+
+        :param host: ip address of the target
+        """
+        for (connection_host, _), connection in list(self.connections.items()):
+            if connection_host == host:
+                connection.close()
+
+    def close_all(self):
+        """Close every connection and remove the control sockets."""
+        for connection in list(self.connections.values()):
+            connection.close()
+        if self.control_dir is not None:
+            shutil.rmtree(self.control_dir, ignore_errors=True)
+            self.control_dir = None
+
+
+class SshPoolPlugin:
+    """Pytest plugin routing the ssh commands of the fixtures to the pool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def pooled_ssh_to_target(self, func, target, read_config):
+        """Wrap legato.ssh_to_target to use the pool.
+
+        :param func: original ssh_to_target
+        :param target: target fixture
+        :param read_config: fixture to read the LeTP configuration, or None
+
+        :returns: wrapped function
+        """
+
+        @functools.wraps(func)
+        def _ssh_to_target(cmd, output=False, *args, **kwargs):
+            connection = get_target_connection(target, read_config)
+            if not args and not kwargs and connection is not None:
+                result = connection.run(cmd, output)
+                if result is not None:
+                    return result
+            return func(cmd, output, *args, **kwargs)
+
+        return _ssh_to_target
+
+    def closing_on_reboot(self, func, target):
+        """Wrap a reboot method of the target to close its connections.
+
+        :param func: original method
+        :param target: target fixture
+
+        :returns: wrapped function
+        """
+
+        @functools.wraps(func)
+        def _reboot(*args, **kwargs):
+            self.pool.invalidate(getattr(target, "target_ip", None))
+            return func(*args, **kwargs)
+
+        return _reboot
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        """Route the legato and target fixtures to the pool once created."""
+        outcome = yield
+        if outcome.excinfo is not None or fixturedef.argname not in (
+            "legato",
+            "target",
+        ):
+            return
+        fixture = outcome.get_result()
+        if fixturedef.argname == "target":
+            for method in REBOOT_METHODS:
+                func = getattr(fixture, method, None)
+                if callable(func):
+                    setattr(fixture, method, self.closing_on_reboot(func, fixture))
+            return
+        func = getattr(fixture, "ssh_to_target", None)
+        if callable(func):
+            target = request.getfixturevalue("target")
+            try:
+                read_config = request.getfixturevalue("read_config")
+            except pytest.FixtureLookupError:
+                read_config = None
+            fixture.ssh_to_target = self.pooled_ssh_to_target(func, target, read_config)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """Report the use of the pool."""
+        connections = list(self.pool.connections.values())
+        if connections:
+            terminalreporter.write_line(
+                "SSH pool: %d command(s) on %d connection(s), %d restart(s)"
+                % (
+                    sum(c.commands for c in connections),
+                    len(connections),
+                    sum(c.restarts for c in connections),
+                )
+            )
@@ -0,0 +1,297 @@
+"""Query agent running on the target.
+
+The state queries of the fixtures (loaded modules, app status, system
+index, config get, file stat, log since a cursor...) are answered by a small
+shell agent (common/target_agent.sh) started once per target in its own
+channel of the pooled ssh connection. A batch of queries is sent in one
+write and answered in one round-trip, each answer framed with its exit
+status, instead of a command line per query scraped from the target session:
+
+    index, modules = agent.query("index", "modules")
+    if modules.status == 0:
+        ...parse_proc_modules(modules.output)
+
+The script is sent as the remote command of the channel: nothing is left on
+the target, and the agent is started again after a reboot. The queries are
+listed in the script; "run <command>" gives the output and the exit status
+of any shell command.
+
+The agent is also run on the host against a stand-in tree of the target,
+LETP_AGENT_ROOT prefixing the paths it reads:
+
+    python -m common.target_agent --root <tree> index "stat /legato/systems"
+
+Environment variables:
+    LETP_AGENT: set to 0 to disable the agent (queries go through target.run)
+"""
+import argparse
+import collections
+import json
+import os
+import select
+import subprocess
+import sys
+import time
+
+from pytest_letp.lib import swilog
+
+from common.ssh_pool import get_ssh_pool, get_target_connection
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+AgentResult = collections.namedtuple("AgentResult", ["query", "status", "output"])
+
+AGENT_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "target_agent.sh"
+)
+
+DEFAULT_TIMEOUT = 30
+
+_agents = {}
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_target_agent(target, read_config=None):
+    """Get the agent of a target, started on first use.
+
+    :param target: fixture to communicate with the target
+    :param read_config: fixture to read the LeTP configuration, or None
+
+    :returns: TargetAgent, or None when the agent is disabled or cannot be
+              started
+    """
+    if os.environ.get("LETP_AGENT") == "0":
+        return None
+    connection = get_target_connection(target, read_config)
+    if connection is None:
+        return None
+    key = (connection.host, connection.port)
+    if key not in _agents:
+        _agents[key] = TargetAgent.from_connection(connection)
+    return _agents[key] if _agents[key].start() else None
+
+
+def query_target(target, *queries, timeout=DEFAULT_TIMEOUT):
+    """Send a batch of queries to the agent of a target.
+
+    :param target: fixture to communicate with the target
+    :param queries: queries, e.g. "modules", "stat /legato/systems/current"
+    :param timeout: timeout of the batch in seconds
+
+    :returns: list of AgentResult in the order of the queries, None when the
+              agent is not available (the caller falls back to target.run)
+    """
+    agent = get_target_agent(target)
+    return agent.query(*queries, timeout=timeout) if agent else None
+
+
+def stop_target_agents():
+    """Stop the agents of the session."""
+    for agent in _agents.values():
+        agent.stop()
+    _agents.clear()
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class AgentTimeout(Exception):
+    """The agent did not answer a batch in time."""
+
+
+class TargetAgent:
+    """Agent process and its request/response protocol."""
+
+    def __init__(self, arguments, env=None, connection=None):
+        """Create an agent.
+
+        :param arguments: command starting the agent
+        :param env: environment of the command, None to inherit it
+        :param connection: SshConnection the agent goes through, started
+                           before the agent
+        """
+        self.arguments = arguments
+        self.env = env
+        self.connection = connection
+        self.process = None
+        self.next_id = 0
+        self.queries = 0
+        self._buffer = b""
+
+    @classmethod
+    def from_connection(cls, connection):
+        """Create an agent running on a target.
+
+        :param connection: SshConnection to the target
+
+        :returns: TargetAgent
+        """
+        with open(AGENT_SCRIPT) as f:
+            script = f.read()
+        return cls(
+            connection.get_arguments("-o ControlMaster=no") + [script],
+            connection=connection,
+        )
+
+    @classmethod
+    def local(cls, root):
+        """Create an agent running on the host against a stand-in tree.
+
+        :param root: directory standing for the root of the target
+
+        :returns: TargetAgent
+        """
+        env = dict(os.environ, LETP_AGENT_ROOT=os.path.abspath(root))
+        return cls(["sh", AGENT_SCRIPT], env=env)
+
+    def is_running(self):
+        """Tell whether the agent process is running."""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start the agent, unless it is running.
+
+        :returns: True if the agent is running
+        """
+        if self.is_running():
+            return True
+        if self.connection is not None and not self.connection.ensure():
+            return False
+        self._buffer = b""
+        try:
+            self.process = subprocess.Popen(
+                self.arguments,
+                env=self.env,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            swilog.debug("Unable to start the target agent: %s" % e)
+            self.process = None
+            return False
+        return True
+
+    def stop(self):
+        """Stop the agent."""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.write(b"0 quit\n")
+                process.stdin.close()
+                process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+    def _read_line(self, deadline):
+        """Read a line of the agent before a deadline."""
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise AgentTimeout()
+            data = os.read(fd, 65536)
+            if not data:
+                raise EOFError("Agent stopped")
+            self._buffer += data
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line.decode(errors="replace").rstrip("\r")
+
+    def _exchange(self, queries, timeout):
+        """Send a batch of queries and read the answers."""
+        ids = list(range(self.next_id, self.next_id + len(queries)))
+        self.next_id += len(queries)
+        request = "".join("%d %s\n" % (i, q) for i, q in zip(ids, queries))
+        self.process.stdin.write(request.encode())
+        self.process.stdin.flush()
+        outputs = {i: [] for i in ids}
+        statuses = {}
+        deadline = time.time() + timeout
+        while len(statuses) < len(ids):
+            line = self._read_line(deadline)
+            head, separator, value = line.partition(":")
+            if not separator:
+                head, separator, value = line.partition("=")
+            if not separator or not head.isdigit() or int(head) not in outputs:
+                continue
+            if separator == ":":
+                outputs[int(head)].append(value)
+            else:
+                statuses[int(head)] = int(value) if value.isdigit() else None
+        self.queries += len(queries)
+        return [
+            AgentResult(q, statuses[i], "\n".join(outputs[i]))
+            for i, q in zip(ids, queries)
+        ]
+
+    def query(self, *queries, timeout=DEFAULT_TIMEOUT):
+        """Send a batch of queries.
+
+        The agent is started again once if it stopped (target reboot).
+
+        :param queries: queries, e.g. "modules", "stat /legato/systems/current"
+        :param timeout: timeout of the batch in seconds
+
+        :returns: list of AgentResult in the order of the queries, None if
+                  the agent did not answer
+        """
+        assert all("\n" not in q for q in queries), "Queries are single lines"
+        for _ in range(2):
+            if not self.start():
+                return None
+            try:
+                return self._exchange(queries, timeout)
+            except AgentTimeout:
+                swilog.debug("No answer of the target agent in %ds" % timeout)
+                self.stop()
+                return None
+            except (OSError, EOFError) as e:
+                swilog.debug("Target agent stopped: %s" % e)
+                self.stop()
+        return None
+
+
+def main(argv=None):
+    """Send queries to an agent and print the answers as json.
+
+    :param argv: command line arguments
+
+    :returns: exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("queries", nargs="+", help='e.g. modules "config get /a"')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--root", help="stand-in tree of the target on the host")
+    group.add_argument("--host", help="ip address of the target")
+    parser.add_argument("--port", type=int, default=22, help="ssh port of the target")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    if args.root:
+        agent = TargetAgent.local(args.root)
+    else:
+        agent = TargetAgent.from_connection(get_ssh_pool().get(args.host, args.port))
+    try:
+        results = agent.query(*args.queries, timeout=args.timeout)
+    finally:
+        agent.stop()
+        if args.host:
+            get_ssh_pool().close_all()
+    if results is None:
+        sys.stderr.write("No answer of the agent\n")
+        return 1
+    json.dump([r._asdict() for r in results], sys.stdout, indent=4)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
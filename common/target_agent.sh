@@ -0,0 +1,46 @@
+#!/bin/sh
+# LeTP query agent, see common/target_agent.py.
+#
+# Reads one query per line on stdin:
+#     <id> <query> [argument]
+# and answers every output line of the query as "<id>:<line>", followed by
+# "<id>=<exit status>" once it is done. A batch of queries is answered in
+# the order of the queries; "quit" (or the end of stdin) stops the agent.
+# "log <cursor>" gives the log lines after the cursor, then "#<new cursor>".
+#
+# LETP_AGENT_ROOT prefixes the paths read by the agent, so that it can be
+# run on the host against a stand-in tree of the target.
+
+ROOT="${LETP_AGENT_ROOT:-}"
+CURRENT_SYSTEM="$ROOT/legato/systems/current"
+PATH="$PATH:/legato/systems/current/bin:/sbin:/usr/sbin"
+OUTPUT="${TMPDIR:-/tmp}/letp_agent.$$"
+trap 'rm -f "$OUTPUT"' EXIT
+
+query()
+(
+    case "$1" in
+        ping)    echo pong ;;
+        modules) cat "$ROOT/proc/modules" ;;
+        taint)   cat "$ROOT/proc/sys/kernel/tainted" ;;
+        index)   cat "$CURRENT_SYSTEM/index" ;;
+        ls)      ls "$ROOT$2" ;;
+        stat)    cd "$ROOT/" && stat -c '%F|%s|%a|%n' "./$2" ;;
+        md5)     cd "$ROOT/" && md5sum "./$2" ;;
+        legato)  legato status ;;
+        apps)    app status ;;
+        config)  config get "$2" ;;
+        log)     logread | awk -v c="${2:-0}" 'NR > c { print } END { print "#" NR }' ;;
+        run)     sh -c "$2" ;;
+        *)       echo "Unknown query: $1"; exit 2 ;;
+    esac
+)
+
+while read -r id name argument; do
+    [ -n "$id" ] || continue
+    [ "$name" = quit ] && break
+    query "$name" "$argument" >"$OUTPUT" 2>&1 </dev/null
+    status=$?
+    sed "s/^/$id:/" "$OUTPUT"
+    echo "$id=$status"
+done
@@ -0,0 +1,118 @@
+"""Concurrent execution of independent target commands.
+
+A batch of commands which do not depend on each other (file checks, module
+queries...) is run concurrently, each command in its own channel of the
+pooled ssh connection of the target (see common.ssh_pool), by an asyncio
+event loop. The results come back in the order of the commands:
+
+    results = run_commands(target, ["[ -f /a ]", "[ -d /b ]"])
+    missing = [r.command for r in results if r.status != 0]
+
+The commands are target shell commands, as given to target.run. When the
+pool is disabled or the master connection cannot be started, they are run
+one after the other with target.run.
+"""
+import asyncio
+import collections
+import time
+
+from common.ssh_pool import SSH_ERROR, get_target_connection
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+CommandResult = collections.namedtuple("CommandResult", ["command", "status", "output"])
+
+# Concurrent channels per target, below the session limit of the ssh servers
+DEFAULT_CONCURRENCY = 8
+
+DEFAULT_TIMEOUT = 30
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+async def run_command_async(connection, command, semaphore, timeout=DEFAULT_TIMEOUT):
+    """Run a target command in a channel of a pooled connection.
+
+    :param connection: started SshConnection
+    :param command: target shell command
+    :param semaphore: asyncio semaphore limiting the concurrent channels
+    :param timeout: timeout in seconds
+
+    :returns: CommandResult, whose status is None on timeout
+    """
+    async with semaphore:
+        process = await asyncio.create_subprocess_exec(
+            *connection.get_arguments("-o ControlMaster=no"),
+            command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return CommandResult(command, None, "")
+        return CommandResult(
+            command, process.returncode, output.decode(errors="replace")
+        )
+
+
+async def run_batch_async(
+    connection, commands, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT
+):
+    """Run target commands concurrently over a pooled connection.
+
+    :param connection: started SshConnection
+    :param commands: list of target shell commands
+    :param concurrency: maximum number of concurrent channels
+    :param timeout: timeout of each command in seconds
+
+    :returns: list of CommandResult, in the order of the commands
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    return await asyncio.gather(
+        *(run_command_async(connection, c, semaphore, timeout) for c in commands)
+    )
+
+
+def run_commands(
+    target,
+    commands,
+    concurrency=DEFAULT_CONCURRENCY,
+    timeout=DEFAULT_TIMEOUT,
+    read_config=None,
+):
+    """Run independent target commands concurrently.
+
+    A command failing on a lost connection is not run again (it may have
+    run on the target): its status is the ssh exit code 255, and the master
+    connection is restarted for the next commands.
+
+    :param target: fixture to communicate with the target
+    :param commands: list of target shell commands
+    :param concurrency: maximum number of concurrent commands
+    :param timeout: timeout of each command in seconds
+    :param read_config: fixture to read the LeTP configuration, or None
+
+    :returns: list of CommandResult, in the order of the commands
+    """
+    commands = list(commands)
+    connection = get_target_connection(target, read_config)
+    if connection is None or not connection.ensure():
+        results = []
+        for command in commands:
+            status, output = target.run(command, withexitstatus=True, timeout=timeout)
+            results.append(CommandResult(command, status, output))
+        return results
+
+    results = asyncio.run(run_batch_async(connection, commands, concurrency, timeout))
+    connection.commands += len(commands)
+    if any(result.status == SSH_ERROR for result in results):
+        connection.check_failure(SSH_ERROR)
+    connection.last_used = time.time()
+    return results
@@ -0,0 +1,107 @@
+"""Residue left on the target by a test.
+
+A snapshot of the target state is taken in one command: current system
+index, kernel modules shipped with the current system, loaded kernel modules
+and kernel taint flags. Comparing it to the snapshot of the clean state tells
+which cleanup a test actually requires: a reinstall of the default system
+when the system changed, a reboot only when the kernel itself kept traces of
+the test (modules left loaded or unloaded, new taint).
+"""
+import collections
+
+from common.kernel_modules import PROC_MODULES_CMD, parse_proc_modules
+from common.target_agent import query_target
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+TargetState = collections.namedtuple(
+    "TargetState", ["index", "system_modules", "modules", "tainted"]
+)
+
+SECTION_MARKER = "----LETP-SECTION----"
+CURRENT_SYSTEM = "/legato/systems/current"
+
+STATE_CMD = ("; echo %s; " % SECTION_MARKER).join(
+    [
+        "cat %s/index" % CURRENT_SYSTEM,
+        "ls %s/modules 2>/dev/null" % CURRENT_SYSTEM,
+        PROC_MODULES_CMD,
+        "cat /proc/sys/kernel/tainted",
+    ]
+)
+
+# Same sections, as queries of the target agent
+STATE_QUERIES = ("index", "ls %s/modules" % CURRENT_SYSTEM, "modules", "taint")
+
+# Taint flags which require a reboot: forced load (F) or unload (R), machine
+# check (M), bad page (B), oops (D), warning (W), soft lockup (L). The "O"
+# and "E" flags set by loading any out-of-tree module are expected.
+TAINT_RESIDUE_MASK = 2 | 8 | 16 | 32 | 128 | 512 | 16384
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_target_state(target, timeout=30):
+    """Get a snapshot of the target state.
+
+    :param target: fixture to communicate with the target
+    :param timeout: timeout of the command
+
+    :returns: TargetState
+    """
+    results = query_target(target, *STATE_QUERIES, timeout=timeout)
+    if results is not None:
+        sections = [r.output.strip() if r.status == 0 else "" for r in results]
+    else:
+        _, rsp = target.run(STATE_CMD, withexitstatus=True, timeout=timeout)
+        sections = [s.strip() for s in rsp.replace("\r", "").split(SECTION_MARKER)]
+        sections += [""] * (4 - len(sections))
+    tainted = sections[3].splitlines()[-1:] or ["0"]
+    return TargetState(
+        sections[0],
+        frozenset(sections[1].split()),
+        frozenset(parse_proc_modules(sections[2])),
+        int(tainted[0]) if tainted[0].isdigit() else 0,
+    )
+
+
+def get_system_residue(baseline, state):
+    """List the differences which require to reinstall the default system.
+
+    :param baseline: TargetState of the clean target
+    :param state: current TargetState
+
+    :returns: list of human readable differences, empty if none
+    """
+    residue = []
+    if state.index != baseline.index:
+        residue.append("system index %s instead of %s" % (state.index, baseline.index))
+    if state.system_modules != baseline.system_modules:
+        residue.append(
+            "system modules: %s" % (", ".join(sorted(state.system_modules)) or "none")
+        )
+    return residue
+
+
+def get_kernel_residue(baseline, state):
+    """List the differences which require to reboot the target.
+
+    :param baseline: TargetState of the clean target
+    :param state: current TargetState
+
+    :returns: list of human readable differences, empty if none
+    """
+    residue = []
+    added = state.modules - baseline.modules
+    removed = baseline.modules - state.modules
+    if added:
+        residue.append("modules loaded: %s" % ", ".join(sorted(added)))
+    if removed:
+        residue.append("modules unloaded: %s" % ", ".join(sorted(removed)))
+    taint = state.tainted & ~baseline.tainted & TAINT_RESIDUE_MASK
+    if taint:
+        residue.append("kernel tainted: %d" % taint)
+    return residue
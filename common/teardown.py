@@ -0,0 +1,217 @@
+"""Deferred target-only teardown actions.
+
+The cleanup of a test on the target (app removal, golden restore...) is
+queued on a background worker instead of delaying the next test: the host
+side work of the next test (tmpdir, template rendering, builds) starts right
+away. A barrier waits for the queued actions before the next test first uses
+the target:
+    - before the setup of any fixture requesting target or legato
+    - before the test function, unless the test is marked deferred_barrier,
+      in which case it calls wait_for_teardown itself
+
+Actions run one at a time and in order. A failed action is logged as a
+warning, and fails the barrier once, naming the test which deferred it.
+
+The worker and the main thread share the pexpect session of the target:
+outside of the worker, the session methods of the target fixture wait for
+the queued actions first, so that a hook or a fixture using the target
+before the barrier never interleaves with a deferred action.
+
+Environment variables:
+    LETP_ASYNC_TEARDOWN: set to 0 to run the teardown actions immediately
+"""
+import collections
+import concurrent.futures
+import functools
+import os
+import threading
+
+import pytest
+
+from pytest_letp.lib import swilog
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+DeferredAction = collections.namedtuple("DeferredAction", ["description", "future"])
+
+# Fixtures giving access to the target
+TARGET_FIXTURES = frozenset(["target", "legato"])
+
+BARRIER_MARKER = "deferred_barrier"
+
+# Methods of the target fixture driving its pexpect session
+SESSION_METHODS = (
+    "run",
+    "send",
+    "sendline",
+    "sendcontrol",
+    "expect",
+    "expect_exact",
+    "reboot",
+    "wait_for_reboot",
+)
+
+_teardown_queue = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_teardown_queue():
+    """Get the teardown queue of the session.
+
+    :returns: TeardownQueue configured from the environment
+    """
+    global _teardown_queue
+    if _teardown_queue is None:
+        _teardown_queue = TeardownQueue(os.environ.get("LETP_ASYNC_TEARDOWN") != "0")
+    return _teardown_queue
+
+
+def defer_teardown(description, func, *args, **kwargs):
+    """Queue a target-only teardown action.
+
+    :param description: description of the action used in the reports
+    :param func: function doing the action
+    :param args: positional arguments of func
+    :param kwargs: keyword arguments of func
+    """
+    get_teardown_queue().defer(description, func, *args, **kwargs)
+
+
+def wait_for_teardown():
+    """Wait for the queued teardown actions before using the target."""
+    get_teardown_queue().wait()
+
+
+def register(config):
+    """Register the plugin serialising the target session with the actions.
+
+    :param config: pytest config
+    """
+    config.pluginmanager.register(TeardownPlugin(get_teardown_queue()), "letp_teardown")
+
+
+def stop_teardown_queue():
+    """Run the remaining teardown actions and stop the worker."""
+    if _teardown_queue is not None:
+        _teardown_queue.stop()
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class TeardownQueue:
+    """Background worker running teardown actions in order."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.actions = []
+        # Failures not reported yet by the barrier
+        self.failures = []
+        self.executor = None
+        self._worker = threading.local()
+
+    def in_worker(self):
+        """Tell whether the caller is a deferred action."""
+        return getattr(self._worker, "active", False)
+
+    def _run(self, func, args, kwargs):
+        """Run an action in the worker."""
+        self._worker.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._worker.active = False
+
+    def defer(self, description, func, *args, **kwargs):
+        """Queue an action, or run it immediately if disabled.
+
+        :param description: description of the action used in the reports
+        :param func: function doing the action
+        :param args: positional arguments of func
+        :param kwargs: keyword arguments of func
+        """
+        if not self.enabled:
+            func(*args, **kwargs)
+            return
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="letp_teardown"
+            )
+        # Name the test in the reports: the barrier runs in another one
+        test = os.environ.get("PYTEST_CURRENT_TEST", "").split(" ")[0]
+        description = "%s (%s)" % (description, test) if test else description
+        swilog.debug("Deferred teardown: %s" % description)
+        self.actions.append(
+            DeferredAction(
+                description, self.executor.submit(self._run, func, args, kwargs)
+            )
+        )
+
+    def drain(self):
+        """Wait for the queued actions and keep their failures for wait."""
+        actions, self.actions = self.actions, []
+        for action in actions:
+            try:
+                action.future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                failure = "Deferred teardown failed: %s: %r" % (action.description, e)
+                swilog.warning(failure)
+                self.failures.append(failure)
+
+    def wait(self):
+        """Wait for the queued actions (barrier).
+
+        :raises AssertionError: if an action failed since the last barrier
+        """
+        self.drain()
+        failures, self.failures = self.failures, []
+        assert not failures, "\n".join(failures)
+
+    def serialize(self, func):
+        """Wrap a target session method to wait for the queued actions.
+
+        :param func: method of the target fixture
+
+        :returns: wrapped method, called directly by the deferred actions
+        """
+
+        @functools.wraps(func)
+        def _serialized(*args, **kwargs):
+            if not self.in_worker():
+                self.drain()
+            return func(*args, **kwargs)
+
+        _serialized.serialized = True
+        return _serialized
+
+    def stop(self):
+        """Run the remaining actions and stop the worker."""
+        # No barrier follows: the failures have been logged as warnings
+        self.drain()
+        self.failures = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+class TeardownPlugin:
+    """Pytest plugin serialising the target session with the deferred actions."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef):
+        """Serialise the session methods of the target fixture once created."""
+        outcome = yield
+        if fixturedef.argname != "target" or outcome.excinfo is not None:
+            return
+        target = outcome.get_result()
+        for method in SESSION_METHODS:
+            func = getattr(target, method, None)
+            if callable(func) and not getattr(func, "serialized", False):
+                setattr(target, method, self.queue.serialize(func))
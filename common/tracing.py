@@ -0,0 +1,262 @@
+"""Timeline of the campaign in Chrome trace format.
+
+When enabled, the costly calls of the target and legato fixtures and
+time.sleep are timed and written, per test, as a Chrome trace (JSON array
+format, readable by chrome://tracing and https://ui.perfetto.dev). Each call
+is labelled with a phase:
+    - build: legato.make*, builds of the look-ahead workers
+    - install: legato.install*, legato.make_install*, golden restores
+    - wait: time.sleep, target.reboot, target.wait_for_reboot
+    - verify: target.run, legato.ssh_to_target... during the test
+    - teardown: any call during the test teardown or deferred teardowns
+The pytest setup/call/teardown steps of each test are recorded as well. The
+terminal summary lists the most expensive phases (self time, nested calls
+excluded); the time spent by each test in each phase is kept for the
+duration history (see common.history).
+
+Environment variables:
+    LETP_TRACE: directory where the traces are written. Unset disables it.
+    LETP_TRACE_TOP: number of entries of the summary (default 10)
+"""
+import collections
+import functools
+import json
+import os
+import re
+import threading
+import time
+
+import pytest
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+# ====================================================================================
+# Constants and Globals
+# ====================================================================================
+BUILD = "build"
+INSTALL = "install"
+WAIT = "wait"
+VERIFY = "verify"
+TEARDOWN = "teardown"
+
+# Traced methods of the fixtures, with their phase (None: depends on the step)
+TRACED_METHODS = {
+    "legato": {
+        "make": BUILD,
+        "make_sys": BUILD,
+        "make_install": INSTALL,
+        "make_install_sys": INSTALL,
+        "install": INSTALL,
+        "install_sys": INSTALL,
+        "restore_golden_legato": INSTALL,
+        "ssh_to_target": None,
+    },
+    "target": {
+        "run": None,
+        "reboot": WAIT,
+        "wait_for_reboot": WAIT,
+    },
+}
+
+# Phase of the calls made by the background workers, by thread name prefix
+THREAD_PHASES = {"letp_teardown": TEARDOWN, "letp_look_ahead": BUILD}
+
+_tracer = None
+
+
+# ====================================================================================
+# Functions
+# ====================================================================================
+def get_tracer():
+    """Get the tracer of the session.
+
+    :returns: Tracer, or None when tracing is disabled
+    """
+    return _tracer
+
+
+def register(config):
+    """Register the tracing plugin if LETP_TRACE is set.
+
+    :param config: pytest config
+    """
+    global _tracer
+    trace_dir = os.environ.get("LETP_TRACE")
+    if trace_dir and _tracer is None:
+        _tracer = Tracer(trace_dir, int(os.environ.get("LETP_TRACE_TOP", "10")))
+        config.pluginmanager.register(_tracer, "letp_tracer")
+
+
+def _get_file_name(nodeid):
+    """Get a file name from a test id."""
+    return re.sub(r"[^\w.-]+", "_", nodeid.split("/")[-1]).strip("_") + ".json"
+
+
+# ====================================================================================
+# Classes
+# ====================================================================================
+class Tracer:
+    """Pytest plugin recording the timeline of the tests."""
+
+    def __init__(self, trace_dir, top=10):
+        self.trace_dir = trace_dir
+        self.top = top
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.nodeid = None
+        self.step = None
+        self.events = []
+        self.self_times = collections.Counter()
+        self.counts = collections.Counter()
+        self.test_phases = collections.defaultdict(collections.Counter)
+        self.origin = time.time()
+        self.sleep = time.sleep
+        time.sleep = self.wrap(time.sleep, "time.sleep", WAIT)
+        os.makedirs(trace_dir, exist_ok=True)
+
+    def _get_phase(self, phase):
+        """Get the phase of a call from the thread and the test step."""
+        name = threading.current_thread().name
+        for prefix, thread_phase in THREAD_PHASES.items():
+            if name.startswith(prefix):
+                return thread_phase
+        if self.step == TEARDOWN:
+            return TEARDOWN
+        return phase or VERIFY
+
+    def _add_event(self, name, phase, start, duration, args=None):
+        """Add a complete event to the timeline."""
+        event = {
+            "name": name,
+            "cat": phase,
+            "ph": "X",
+            "ts": int((start - self.origin) * 1e6),
+            "dur": int(duration * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": dict(args or {}, test=self.nodeid),
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def wrap(self, func, name, phase=None):
+        """Wrap a function to record its calls.
+
+        :param func: function to wrap
+        :param name: name of the events
+        :param phase: phase of the calls (None: depends on the test step)
+
+        :returns: wrapped function
+        """
+
+        @functools.wraps(func)
+        def _traced(*args, **kwargs):
+            stack = self.local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.time() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += duration
+                call_phase = self._get_phase(phase)
+                detail = {"args": repr(args[0])[:200]} if args else None
+                self._add_event(name, call_phase, start, duration, detail)
+                with self.lock:
+                    self.self_times[(call_phase, name)] += duration - children
+                    self.counts[(call_phase, name)] += 1
+                    if self.nodeid is not None:
+                        self.test_phases[self.nodeid][call_phase] += duration - children
+
+        _traced.letp_traced = True
+        return _traced
+
+    def instrument(self, fixture_name, fixture):
+        """Wrap the traced methods of a fixture instance.
+
+        :param fixture_name: name of the fixture (target or legato)
+        :param fixture: fixture instance
+        """
+        for method, phase in TRACED_METHODS.get(fixture_name, {}).items():
+            func = getattr(fixture, method, None)
+            if callable(func) and not getattr(func, "letp_traced", False):
+                name = "%s.%s" % (fixture_name, method)
+                setattr(fixture, method, self.wrap(func, name, phase))
+
+    def _run_step(self, item, step):
+        """Record a pytest step of a test as an event."""
+        self.nodeid, self.step = item.nodeid, step
+        start = time.time()
+        yield
+        self._add_event(step, "test", start, time.time() - start)
+        if step == TEARDOWN:
+            self.write_test_trace(item.nodeid)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef):
+        """Instrument the target and legato fixtures once created."""
+        outcome = yield
+        if fixturedef.argname in TRACED_METHODS and outcome.excinfo is None:
+            self.instrument(fixturedef.argname, outcome.get_result())
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        """Record the setup of a test."""
+        yield from self._run_step(item, "setup")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        """Record the body of a test."""
+        yield from self._run_step(item, "call")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        """Record the teardown of a test and write its trace."""
+        yield from self._run_step(item, TEARDOWN)
+
+    def write_test_trace(self, nodeid):
+        """Write the events of a test to <trace dir>/<test>.json.
+
+        :param nodeid: pytest id of the test
+        """
+        with self.lock:
+            events = [e for e in self.events if e["args"].get("test") == nodeid]
+        with open(os.path.join(self.trace_dir, _get_file_name(nodeid)), "w") as f:
+            json.dump(events, f)
+
+    def get_test_phases(self, nodeid):
+        """Get the time spent by a test in each phase (self times).
+
+        :param nodeid: pytest id of the test
+
+        :returns: dictionary of durations by phase (build, install...)
+        """
+        with self.lock:
+            return dict(self.test_phases.get(nodeid, {}))
+
+    def get_summary(self):
+        """Get the most expensive phases of the campaign.
+
+        :returns: list of (phase, name, self time, calls), most expensive first
+        """
+        with self.lock:
+            return [
+                (phase, name, duration, self.counts[(phase, name)])
+                for (phase, name), duration in self.self_times.most_common(self.top)
+            ]
+
+    def pytest_terminal_summary(self, terminalreporter):
+        """Write the campaign trace and display the top phases."""
+        with open(os.path.join(self.trace_dir, "campaign.json"), "w") as f:
+            json.dump(self.events, f)
+        terminalreporter.section("Most expensive phases")
+        for phase, name, duration, calls in self.get_summary():
+            terminalreporter.write_line(
+                "%8.1fs  %-8s %-30s %d call(s)" % (duration, phase, name, calls)
+            )
+        terminalreporter.write_line("Traces written to %s" % self.trace_dir)
+
+    def pytest_unconfigure(self):
+        """Restore time.sleep."""
+        time.sleep = self.sleep
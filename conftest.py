@@ -0,0 +1,123 @@
+"""Fixtures and hooks shared by every test set."""
+import os
+import sys
+
+# Make the common package importable from the test modules whatever the
+# pytest import mode is.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import blocking_profiler, history, ssh_pool  # noqa: E402
+from common.build_cache import get_default_cache  # noqa: E402
+from common.log_collector import stop_log_collector  # noqa: E402
+from common.look_ahead import get_look_ahead, stop_look_ahead  # noqa: E402
+from common.scheduler import record_report, set_current_items  # noqa: E402
+from common.target_agent import stop_target_agents  # noqa: E402
+from common.teardown import (  # noqa: E402
+    BARRIER_MARKER,
+    TARGET_FIXTURES,
+    stop_teardown_queue,
+    wait_for_teardown,
+)
+from common.teardown import register as register_teardown  # noqa: E402
+from common.tracing import register as register_tracing  # noqa: E402
+
+__copyright__ = "Copyright (C) Sierra Wireless Inc."
+
+
+def pytest_configure(config):
+    """Register the markers of the test sets.
+
+    :param config: pytest config
+    """
+    config.addinivalue_line(
+        "markers",
+        "system_chain: the test accepts the system left by the previous test "
+        "and leaves it reusable (see common.scheduler)",
+    )
+    config.addinivalue_line(
+        "markers",
+        "%s: the test waits for the deferred teardowns itself before it "
+        "first uses the target (see common.teardown)" % BARRIER_MARKER,
+    )
+    # Before the tracing, which must wrap the pooled ssh_to_target
+    ssh_pool.register(config)
+    register_teardown(config)
+    register_tracing(config)
+    blocking_profiler.register(config)
+    history.register(config)
+
+
+def pytest_runtest_protocol(item, nextitem):
+    """Record the running test and the next one for the system chaining.
+
+    :param item: pytest item about to run
+    :param nextitem: pytest item which will run next, or None
+    """
+    set_current_items(item, nextitem)
+
+
+def pytest_runtest_logreport(report):
+    """Stop the system chaining on a failed or skipped test.
+
+    :param report: pytest TestReport
+    """
+    record_report(report)
+
+
+def pytest_collection_finish(session):
+    """Give the test order to the look-ahead builds.
+
+    :param session: pytest session
+    """
+    get_look_ahead().set_items(session.items)
+
+
+def pytest_fixture_setup(fixturedef, request):
+    """Wait for the deferred teardowns before a fixture uses the target.
+
+    The tests marked deferred_barrier wait for them themselves.
+
+    :param fixturedef: definition of the fixture
+    :param request: request of the fixture
+    """
+    if request.node.get_closest_marker(BARRIER_MARKER) is not None:
+        return
+    if TARGET_FIXTURES.intersection(fixturedef.argnames):
+        wait_for_teardown()
+
+
+def pytest_runtest_call(item):
+    """Build the systems of the next tests while this one runs.
+
+    The deferred teardowns are waited for first, unless the test does it.
+
+    :param item: pytest item about to run
+    """
+    funcargs = getattr(item, "funcargs", {})
+    target, legato = funcargs.get("target"), funcargs.get("legato")
+    if target is not None and legato is not None:
+        get_look_ahead().prefetch(item, legato, target.target_name)
+    if item.get_closest_marker(BARRIER_MARKER) is None:
+        wait_for_teardown()
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Report the efficiency of the build cache.
+
+    :param terminalreporter: pytest terminal reporter
+    """
+    cache = get_default_cache()
+    if cache.hits or cache.misses:
+        terminalreporter.write_line(
+            "Build cache: %d hit(s), %d miss(es) in %s"
+            % (cache.hits, cache.misses, cache.cache_dir)
+        )
+
+
+def pytest_sessionfinish():
+    """Stop the background services started during the session."""
+    stop_teardown_queue()
+    stop_look_ahead()
+    stop_log_collector()
+    stop_target_agents()
+    ssh_pool.stop_ssh_pool()
@@ -7,6 +7,8 @@ import shutil
 import pytest
 from pytest_letp.lib import swilog
 
+from common.manifest import format_diff, read_local_manifest, verify_manifest
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ====================================================================================
 # Constants and Globals
@@ -22,42 +24,26 @@ TEST_FILE = "testFile1.txt"
 # ====================================================================================
 # Functions
 # ====================================================================================
-def is_file_on_target(target, path, file_name):
-    """Check for <file> relative to path.
+def check_bundled_entries(target, path, names):
+    """Check the bundled files and directories against their local copy.
 
-    Args:
-        target: fixture to communicate with the target
-        legato: fixture to call useful functions regarding legato
-        path: path of file
-        file_name: the name of file
-    """
-    exit_status, rsp = target.run(
-        "[ -f %s/%s ]" % (path, file_name), withexitstatus=True
-    )
-
-    swilog.debug(rsp)
-    if exit_status == 0:
-        swilog.info("Found bundled file %s" % file_name)
-    else:
-        swilog.error("Could not find bundled file %s" % file_name)
-
-
-def is_directory_on_target(target, path, directory):
-    """Check for <directory> relative to path.
+    The bundled tree is listed with a single target command and compared,
+    content included, to the files of the component.
 
     Args:
         target: fixture to communicate with the target
-        path: path of directory
-        directory: name of directory
+        path: path of the bundled entries
+        names: names of the bundled files and directories
     """
-    exit_status, rsp = target.run(
-        "[ -d %s/%s ]" % (path, directory), withexitstatus=True
-    )
-    swilog.debug(rsp)
-    if exit_status == 0:
-        swilog.info("Found bundled directory %s" % directory)
-    else:
-        swilog.error("Could not find bundled directroy %s" % directory)
+    component_path = "%s/cdef/bundles/bundlesComponent" % TEST_RESOURCES
+    expected = []
+    for name in names:
+        expected += read_local_manifest(os.path.join(component_path, name), name)
+    differences = format_diff(verify_manifest(target, path, expected))
+    for difference in differences:
+        swilog.error("Bundled entries: %s" % difference)
+    if not differences:
+        swilog.info("Found %d bundled entries" % len(expected))
 
 
 # ====================================================================================
@@ -117,15 +103,9 @@ def L_CDEF_0001(target, legato, tmpdir):
     os.chdir(str(tmpdir))
     legato.make_install(APP_NAME, "%s/cdef/bundles" % TEST_RESOURCES)
 
-    # Check that bundled file was included
+    # Check that bundled file, directory and its contents were included
     path = "/legato/systems/current/appsWriteable/%s/bin" % APP_NAME
-    is_file_on_target(target, path, TEST_FILE)
-
-    # Check that bundled directory and its contents were included
-    is_directory_on_target(target, path, TEST_FOLDER)
-    is_file_on_target(target, path, "%s/file1.txt" % TEST_FOLDER)
-    is_directory_on_target(target, path, "%s/folder1" % TEST_FOLDER)
-    is_file_on_target(target, path, "%s/folder1/file2.txt" % TEST_FOLDER)
+    check_bundled_entries(target, path, [TEST_FILE, TEST_FOLDER])
 
     failed_testcases_list = swilog.get_error_list()
     if failed_testcases_list != []:
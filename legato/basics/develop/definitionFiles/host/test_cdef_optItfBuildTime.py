@@ -2,18 +2,27 @@
 
 Set of functions to test the Legato component definition files.
 """
+import glob
 import os
 
 import pytest
 
 from pytest_letp.lib import swilog
 
+from common import parallel_build
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ====================================================================================
 # Constants and Globals
 # ====================================================================================
 # Determine the resources folder (legato apps)
 TEST_RESOURCES = os.path.join(os.path.abspath(os.path.dirname(__file__)), "resources")
+OPTIONAL_RESOURCES = os.path.join(TEST_RESOURCES, "cdef/interfaceOptions/optional")
+
+is_first_execution = True
+
+# Results of the builds done in parallel, indexed by definition file
+parallel_results = {}
 
 
 # ====================================================================================
@@ -145,6 +154,70 @@ def verify_when_build_fail(
         )
 
 
+def prebuild_in_parallel(legato, target_name):
+    """Build every definition file of the build matrix concurrently.
+
+    Only done when LETP_PARALLEL_BUILDS is set. The tests then check the
+    stored results instead of building one after another. The first
+    definition file is also built through legato.make/make_sys, which must
+    give the same result.
+
+    Args:
+        legato: fixture to call useful functions regarding legato
+        target_name: name of the target
+    """
+    workers = parallel_build.get_worker_count()
+    if not workers:
+        return
+
+    def_files = glob.glob(
+        os.path.join(OPTIONAL_RESOURCES, "*/*/mkapp/*_with*Bindings.adef")
+    ) + glob.glob(os.path.join(OPTIONAL_RESOURCES, "*/*/mksys/*_with*Bindings.sdef"))
+    jobs = [parallel_build.make_job(f, target_name) for f in sorted(def_files)]
+    swilog.info(
+        "Building %d definition files with %d processes..." % (len(jobs), workers)
+    )
+    results = parallel_build.run_builds(jobs, workers)
+
+    reference = jobs[0].def_file
+    parallel_build.check_serial_result(
+        results[reference],
+        lambda should_fail: make_definition_file(
+            legato,
+            reference,
+            os.path.splitext(os.path.basename(reference))[0],
+            os.path.dirname(reference),
+            should_fail,
+        ),
+    )
+    parallel_results.update(results)
+
+
+def make_definition_file(legato, def_file, name, path, should_fail):
+    """Build a definition file, or check its result if built in parallel.
+
+    Args:
+        legato: fixture to call useful functions regarding legato
+        def_file: path of the .adef or .sdef file
+        name: name of the app or system
+        path: directory containing the definition file
+        should_fail: True if the build is expected to fail
+    """
+    result = parallel_results.get(def_file)
+    if result is None:
+        if def_file.endswith(".sdef"):
+            legato.make_sys(name, path, should_fail=should_fail)
+        else:
+            legato.make(name, path, should_fail=should_fail)
+        return
+
+    swilog.debug(result.output)
+    if should_fail:
+        assert result.returncode != 0, "Build should have failed:\n%s" % result.output
+    else:
+        assert result.returncode == 0, "Build failed:\n%s" % result.output
+
+
 def build_sys(
     legato,
     api_type_dir_name,
@@ -213,7 +286,13 @@ def build_sys(
         binding_str = "not bound"
 
     # Build the system based on the sdef file name
-    legato.make_sys(sdef_file_name, sys_path, should_fail=build_status)
+    make_definition_file(
+        legato,
+        os.path.join(sys_path, sdef_file_name + ".sdef"),
+        sdef_file_name,
+        sys_path,
+        build_status,
+    )
     if build_status is False:
         verify_when_build_successful(
             ipc_type_dir_name,
@@ -295,7 +374,13 @@ def build_app(
         binding_str = "not bound"
 
     # Build the app based on the adef file name
-    legato.make(adef_file_name, app_path, should_fail=build_status)
+    make_definition_file(
+        legato,
+        os.path.join(app_path, adef_file_name + ".adef"),
+        adef_file_name,
+        app_path,
+        build_status,
+    )
     if build_status is False:
         verify_when_build_successful(
             ipc_type_dir_name,
@@ -318,16 +403,25 @@ def build_app(
 # Local fixtures
 # ====================================================================================
 @pytest.fixture(autouse=True)
-def init_test(tmpdir):
+def init_test(legato, read_config, tmpdir):
     """Init the test.
 
     Args:
+        legato: fixture to call useful functions regarding legato
+        read_config: fixture to get value from .xml configuration file
         tmpdir: fixture to provide a temporary directory
              unique to the test invocation
     """
+    global is_first_execution
+
     # Go to temp directory
     os.chdir(str(tmpdir))
 
+    # Build the whole matrix at once when parallel builds are enabled
+    if is_first_execution:
+        is_first_execution = False
+        prebuild_in_parallel(legato, read_config.findtext("module/name"))
+
 
 # ====================================================================================
 # Test functions
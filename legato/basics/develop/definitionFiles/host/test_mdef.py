@@ -4,13 +4,24 @@ Set of functions to test the Legato kernel module definition files.
 """
 # pylint: disable=too-many-lines
 import os
-import time
 import shutil
-import fnmatch
-import pexpect
 import pytest
 from pytest_letp.lib import swilog
 
+from common import definition_files, module_events
+from common.build_cache import get_default_cache
+from common.golden import restore_golden_legato
+from common.kernel_modules import get_loaded_modules, wait_for_modules
+from common.log_collector import mark_log
+from common.manifest import DIRECTORY, FILE, ManifestEntry, verify_manifest
+from common.module_store import get_default_store
+from common.readiness import (
+    SYSTEM_STARTED_LOG,
+    mark_system_log,
+    wait_for_system_ready,
+)
+from common.target_exec import run_commands
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ====================================================================================
 # Constants and Globals
@@ -21,7 +32,17 @@ ASCENDING_ORDER = 1
 DESCENDING_ORDER = -1
 
 is_first_execution = True
+TARGET_MODULES_PATH = "/legato/systems/current/modules"
 TARGET_BUNDLE_PATH = "/legato/systems/current/modules/files/"
+# Files bundled by the L_MDEF_0018_0 and L_MDEF_prebuilt_0 modules
+BUNDLED_FILES = [
+    ManifestEntry("text.txt", FILE),
+    ManifestEntry("dir", DIRECTORY),
+    ManifestEntry("scripts", DIRECTORY),
+    ManifestEntry("scripts/install.sh", FILE),
+    ManifestEntry("scripts/remove.sh", FILE),
+    ManifestEntry("dir/dir.txt", FILE),
+]
 
 test_temp_dir = ""
 campaign_temp_dir = ""
@@ -68,14 +89,16 @@ def initialize(target, legato, logread, tmpdir):
         test_temp_dir = tmpdir.mkdir("test")
         campaign_temp_dir = tmpdir.mkdir("campaign")
 
-        # Build default legato and save package
+        # Build default legato and save package (shared with the other modules)
         swilog.info("Build default legato and save package...")
         os.chdir(str(campaign_temp_dir))
-        legato.make_sys("default", os.environ.get("LEGATO_ROOT"), quiet=True)
+        get_default_cache().make_default_sys(
+            legato, target.target_name, str(campaign_temp_dir)
+        )
 
         # Build prebuilt module and save them
         swilog.info("Build prebuilt module and save them...")
-        prebuild_system(legato)
+        prebuild_system(target, legato)
 
         # Set the marker for future executions
         is_first_execution = False
@@ -87,16 +110,17 @@ def initialize(target, legato, logread, tmpdir):
     logread.log_off()
 
 
-def finalize(legato):
+def finalize(target, legato):
     """Compile the default sdef and update the target with it.
 
     It will reinitialise the modules on the target.
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Clean target by restore golden legato
-    legato.restore_golden_legato()
+    restore_golden_legato(target, legato)
 
     # Wait for the unloading to be performed
     # Then verify every modules have been unloaded
@@ -104,74 +128,46 @@ def finalize(legato):
         "Some modules have not been unloaded properly "
         "after default legato installation."
     )
-    assert not check_presence(legato, "L_MDEF_"), failed_msg
+    test_modules = [m for m in get_loaded_modules(target) if m.startswith("L_MDEF_")]
+    assert not wait_for_modules(target, unloaded=test_modules), failed_msg
 
 
-def check_presence(legato, module_name):
-    """Check whether a module is loaded or not.
+def get_missing_module_files(target, module_names):
+    """Get the kernel modules whose .ko file is not in the current system.
 
-    Args:
-        legato: fixture to call useful functions regarding legato
-        module_name: name of module
-
-    Returns:
-        True: module is loaded successfully
-        False: module is not loaded properly
-    """
-    swilog.info("Check presence.")
-    exit_code = legato.ssh_to_target('/sbin/lsmod | grep -F "%s "' % module_name)
-    # To improve
-    if exit_code == 0:
-        return True
-    else:
-        time.sleep(20)
-        swilog.info("Try to check presence again...")
-        exit_code = legato.ssh_to_target('/sbin/lsmod | grep -F "%s "' % module_name)
-        swilog.info(exit_code)
-        return bool(exit_code == 0)
-
-
-def check_file_presence(legato, folder_path, file_name):
-    """Check whether a file exist or not.
+    The files of all the modules are checked concurrently.
 
     Args:
-        legato: fixture to call useful functions regarding legato
-        folder_path: path of folder
-        file_name: name of file to check
+        target: fixture to communicate with the target
+        module_names: names of the kernel modules
 
     Returns:
-        True: file exists
-        False: file does not exist
+        List of the modules whose file is missing
     """
-    exit_code = legato.ssh_to_target(
-        'ls "%s" | grep -F "%s"' % (folder_path, file_name)
+    results = run_commands(
+        target,
+        ['[ -f "%s/%s.ko" ]' % (TARGET_MODULES_PATH, m) for m in module_names],
     )
-    return bool(exit_code == 0)
+    return [m for m, result in zip(module_names, results) if result.status != 0]
+
 
+def get_missing_bundled_files(target, module_name):
+    """Get the bundled files of a module which are not on the target.
 
-def find_all_occurences_in_logread(legato, search_pattern):
-    """Retrieve all entries in logread containing the search pattern.
+    The bundle directory is listed with a single target command.
 
     Args:
-        legato: fixture to call useful functions regarding legato
-        search_pattern: pattern for searching
+        target: fixture to communicate with the target
+        module_name: name of the module bundling BUNDLED_FILES
 
     Returns:
-        result: all entries in logread containing
-        the search pattern
+        List of the missing files (or of the wrong type), relative to the
+        bundle directory
     """
-    result = []
-
-    # Retrieve content of logread an split by lines
-    full_log = (legato.ssh_to_target("/sbin/logread | cut -d '|' -f 3-", True)).split(
-        "\n"
+    diff = verify_manifest(
+        target, os.path.join(TARGET_BUNDLE_PATH, module_name), BUNDLED_FILES
     )
-
-    # Search all lines
-    for line in full_log:
-        if line.find(search_pattern) != -1:
-            result.append(line)
-    return result
+    return [e.path for e in diff.missing] + [m[0] for m in diff.mismatched]
 
 
 def display_errors():
@@ -186,16 +182,19 @@ def display_errors():
     return output
 
 
-def check_order(logread, order, ordered_list):
-    """Check order of appearance for strings contained.
+def check_order(log_mark, order, ordered_list, action, test_name=None):
+    """Check order of the load or unload events of the modules.
 
-    in ordered_list following order.
+    in ordered_list following order, and against the dependencies of the
+    mdef files of the test system.
 
-    :param logread: fixture to check log on the target
+    :param log_mark: mark taken before the modules are loaded or unloaded
     :param order: order type
                   ASCENDING_ORDER = 1
                   DESCENDING_ORDER = -1
     :param ordered_list: the list needs to be checked
+    :param action: LOAD or UNLOAD
+    :param test_name: name of the test system whose dependencies are checked
 
     :returns A tuble: (test_result, observed_list)
     :returns test_result: the result of checking
@@ -203,8 +202,6 @@ def check_order(logread, order, ordered_list):
     :returns observed_list: the list after checked
     """
     list_checked = ordered_list
-    test_result = True
-    observed_list = ""
 
     # Process check
     if order is not DESCENDING_ORDER and order is not ASCENDING_ORDER:
@@ -213,72 +210,68 @@ def check_order(logread, order, ordered_list):
     if order == DESCENDING_ORDER:
         list_checked = ordered_list[::-1]
 
-    # Use the expect function to determine the order of appearance
-    for i in range(0, len(list_checked)):
-        try:
-            index = logread.expect(list_checked)
-            observed_list += "\n" + list_checked[index]
-            if index != i:
-                test_result = False
-        except pexpect.EOF:
-            swilog.error("check_order: Logread stopped unexpectedly")
-            test_result = False
-        except pexpect.TIMEOUT:
-            swilog.error(
-                "check_order: None of the expected output "
-                "has been found. Expect timed out"
-            )
-            test_result = False
+    graph = None
+    if test_name:
+        sdef_file = os.path.join(TEST_RESOURCES, "%s.sdef" % test_name)
+        graph = definition_files.get_kernel_module_graph(sdef_file)
+
+    # Parse the events once and check every constraint in a single pass
+    events = module_events.get_module_events(log_mark)
+    test_result, observed, errors = module_events.verify_module_order(
+        events, action, list_checked, graph=graph
+    )
+    for error in errors:
+        swilog.error("check_order: %s" % error)
+    observed_list = "".join("\n" + module for module in observed)
     return test_result, observed_list
 
 
-def check_loading_order(logread, order, ordered_list):
-    """Transform a list of module name into loading message in logread.
+def check_loading_order(log_mark, order, ordered_list, test_name=None):
+    """Check the loading order of a list of module name in the log.
 
     Args:
-        logread: fixture to check log on the target
+        log_mark: mark taken before the modules are loaded
         order: order type
                ASCENDING_ORDER = 1
                DESCENDING_ORDER = -1
         ordered_list: the list needs to be checked
+        test_name: name of the test system whose dependencies are checked
 
     Returns:
         The result of check_order function. \
         It is a tuple (test_result, observed_list)
     """
-    list_checked = []
-    for element in ordered_list:
-        list_checked.append("New kernel module '%s.ko'" % element)
-    return check_order(logread, order, list_checked)
+    return check_order(log_mark, order, ordered_list, module_events.LOAD, test_name)
 
 
-def check_unloading_order(logread, order, ordered_list):
-    """Transform a list of module name into unloading message in logread.
+def check_unloading_order(log_mark, order, ordered_list, test_name=None):
+    """Check the unloading order of a list of module name in the log.
 
     Args:
-        logread: fixture to check log on the target
+        log_mark: mark taken before the modules are unloaded
         order: order type
              ASCENDING_ORDER = 1
              DESCENDING_ORDER = -1
         ordered_list: the list needs to be checked
+        test_name: name of the test system whose dependencies are checked
 
     Returns:
         The result of check_order function. \
         It is a tuple (test_result, observed_list)
     """
-    list_checked = []
-    for e in ordered_list:
-        list_checked.append("Removed kernel module '%s.ko'" % e)
-    return check_order(logread, order, list_checked)
+    return check_order(log_mark, order, ordered_list, module_events.UNLOAD, test_name)
 
 
-def install_system(legato, test_name):
+def install_system(target, legato, test_name):
     """Compile the provided sdef and update the target with it.
 
     Function called in each test. It's not part of kmod setup because it needs
-    parameters to work.
+    parameters to work. The package is taken from the build cache when none
+    of its inputs changed. Only the framework is waited for: the loading of
+    the modules is checked by the steps of the test.
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
         test_name: test case name
     """
@@ -289,19 +282,27 @@ def install_system(legato, test_name):
 
     # Compile and update target
     swilog.info("Compile and update target...")
-    legato.make_install_sys(test_name, source_file_path, quiet=True)
+    get_default_cache().make_sys(
+        legato, target.target_name, test_name, source_file_path, quiet=True
+    )
+    mark = mark_system_log(target)
+    legato.install_sys(test_name, sys_path=os.getcwd(), quiet=True)
 
-    # Wait for the module to be loaded
-    # TO IMPROVE
-    time.sleep(60)
+    # Wait for the system to be started
+    wait_for_system_ready(
+        target, log_pattern=SYSTEM_STARTED_LOG, timeout=60, log_since=mark
+    )
 
 
-def prebuild_system(legato):
-    """Compile the provided sdef This script could be part of initialize.
+def prebuild_system(target, legato):
+    """Get the prebuilt kernel modules used by the preBuilt tests.
 
-    But it will make test execution longer.
+    The .ko files come from the persistent module store, and are only
+    built on a miss. They are copied to the current directory, where the
+    .mdef files of the tests look for them.
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Sdef file
@@ -309,19 +310,12 @@ def prebuild_system(legato):
     source_file_path = os.path.join(TEST_RESOURCES, sdef_file)
     assert os.path.exists(source_file_path), "Sdef file does not exist"
 
-    # Compile and store only the .ko files
-    swilog.info("Compile and store only the .ko files...")
-    legato.make_sys("L_MDEF_prebuild", source_file_path, quiet=True)
-    time.sleep(3)  # Wait for the module to be loaded
-
-    matches = []
-    for root, dirnames, filenames in os.walk(os.getcwd()):
-        for filename in fnmatch.filter(filenames, "*.ko"):
-            swilog.info(dirnames)
-            matches.append(os.path.join(root, filename))
-            shutil.copyfile(
-                os.path.join(root, filename), os.path.join(os.getcwd(), filename)
-            )
+    swilog.info("Get the prebuilt .ko files...")
+    modules = get_default_store().get_modules(
+        legato, target.target_name, source_file_path, os.getcwd()
+    )
+    for name, path in modules.items():
+        shutil.copyfile(path, os.path.join(os.getcwd(), name))
 
 
 # ====================================================================================
@@ -340,13 +334,13 @@ def mdef_setup(target, legato, logread, tmpdir):
     """
     initialize(target, legato, logread, tmpdir)
     yield
-    finalize(legato)
+    finalize(target, legato)
 
 
 # ====================================================================================
 # Test functions
 # ====================================================================================
-def L_MDEF_0001(legato):
+def L_MDEF_0001(target, legato):
     """Verify that mdef can be use to include kernel module to be built.
 
     This script will
@@ -357,6 +351,7 @@ def L_MDEF_0001(legato):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -366,12 +361,13 @@ def L_MDEF_0001(legato):
     test_passed = True
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
+    not_loaded = wait_for_modules(target, loaded=list_modules)
     for module in list_modules:
-        if not check_presence(legato, module):
+        if module in not_loaded:
             test_passed = False
             swilog.error(
                 "Step 2: Kernel module %s has not been properly loaded" % module
@@ -385,12 +381,9 @@ def L_MDEF_0001(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
@@ -398,18 +391,15 @@ def L_MDEF_0001(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
 
 
-def L_MDEF_0002(legato):
+def L_MDEF_0002(target, legato):
     """Verify that mdef can be use to include prebuilt kernel module.
 
     This script will
@@ -420,6 +410,7 @@ def L_MDEF_0002(legato):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -429,16 +420,13 @@ def L_MDEF_0002(legato):
     test_passed = True
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
@@ -446,12 +434,9 @@ def L_MDEF_0002(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
@@ -459,12 +444,9 @@ def L_MDEF_0002(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
@@ -498,7 +480,7 @@ def L_MDEF_0003(legato):
     assert returned_value.find(err_msg) != -1, failed_msg
 
 
-def L_MDEF_0005(legato, logread):
+def L_MDEF_0005(target, legato):
     """Verify that mdef including kernel module built from source.
 
     are able to create multiple level dependencies.
@@ -513,8 +495,8 @@ def L_MDEF_0005(legato, logread):
         7. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
-        logread: fixture to check log on the target
     """
     # Verify existence of environment variables and files needed.
     # Prepare compilation
@@ -525,19 +507,19 @@ def L_MDEF_0005(legato, logread):
     list_modules = ["L_MDEF_0005_2", "L_MDEF_0005_1", "L_MDEF_0005_0"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    log_mark = mark_log(target)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -547,19 +529,19 @@ def L_MDEF_0005(legato, logread):
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
+    log_mark = mark_log(target)
     legato.legato_stop()
 
     # Verify mod has been unloaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Verify unloading order
-    (result, message) = check_unloading_order(logread, DESCENDING_ORDER, list_modules)
+    (result, message) = check_unloading_order(
+        log_mark, DESCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -569,19 +551,19 @@ def L_MDEF_0005(legato, logread):
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
+    log_mark = mark_log(target)
     legato.legato_start()
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -593,7 +575,7 @@ def L_MDEF_0005(legato, logread):
     assert test_passed, display_errors()
 
 
-def L_MDEF_0006(legato, logread):
+def L_MDEF_0006(target, legato):
     """Verify that mdef including prebuilt kernel module.
 
     are able to create multiple level dependencies.
@@ -608,8 +590,8 @@ def L_MDEF_0006(legato, logread):
         7. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
-        logread: fixture to check log on the target
     """
     # Verify existence of environment variables and files needed.
     # Prepare compilation
@@ -620,19 +602,19 @@ def L_MDEF_0006(legato, logread):
     list_modules = ["L_MDEF_prebuilt_2", "L_MDEF_prebuilt_1", "L_MDEF_prebuilt_0"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    log_mark = mark_log(target)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -642,19 +624,19 @@ def L_MDEF_0006(legato, logread):
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
+    log_mark = mark_log(target)
     legato.legato_stop()
 
     # Verify mod has been unloaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Verify unloading order
-    (result, message) = check_unloading_order(logread, DESCENDING_ORDER, list_modules)
+    (result, message) = check_unloading_order(
+        log_mark, DESCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -664,19 +646,19 @@ def L_MDEF_0006(legato, logread):
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
+    log_mark = mark_log(target)
     legato.legato_start()
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -688,7 +670,7 @@ def L_MDEF_0006(legato, logread):
     assert test_passed, display_errors()
 
 
-def L_MDEF_0009(legato):
+def L_MDEF_0009(target, legato):
     """Verify that mdef able to take more than two sources using {}.
 
     This script will
@@ -699,6 +681,7 @@ def L_MDEF_0009(legato):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -710,16 +693,13 @@ def L_MDEF_0009(legato):
     list_modules = [test_name]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Stop legato
     swilog.step("Step 3: Starting legato...")
@@ -727,12 +707,9 @@ def L_MDEF_0009(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
@@ -740,18 +717,15 @@ def L_MDEF_0009(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
 
 
-def L_MDEF_0010(legato):
+def L_MDEF_0010(target, legato):
     """Verify mksys is able to handle empty kernel modules section.
 
     This script will
@@ -762,6 +736,7 @@ def L_MDEF_0010(legato):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -773,16 +748,13 @@ def L_MDEF_0010(legato):
     list_modules = [test_name]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has been unexpectedly loaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has been unexpectedly loaded" % module)
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
@@ -794,18 +766,15 @@ def L_MDEF_0010(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 5: Verify mod has been loaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 5: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 5: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
 
 
-def L_MDEF_0011(legato):
+def L_MDEF_0011(target, legato):
     """Verify mdef is not loaded when load is set to manual.
 
     This script will
@@ -816,6 +785,7 @@ def L_MDEF_0011(legato):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -827,19 +797,15 @@ def L_MDEF_0011(legato):
     list_modules = [test_name]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has not been loaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has been unexpectedly loaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has been unexpectedly loaded" % module)
 
-    folder_path = "/legato/systems/current/modules"
-    if not check_file_presence(legato, folder_path, test_name):
+    for module in get_missing_module_files(target, list_modules):
         test_passed = False
         swilog.error("Step 3: Kernel module %s is not present in folder" % module)
 
@@ -853,14 +819,11 @@ def L_MDEF_0011(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has not been loaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has been unexpectedly loaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has been unexpectedly loaded" % module)
 
-    if not check_file_presence(legato, folder_path, module):
+    for module in get_missing_module_files(target, list_modules):
         test_passed = False
         swilog.error("Step 7: Kernel module %s is not present in folder" % module)
 
@@ -898,7 +861,7 @@ def L_MDEF_0012(legato):
     assert returned_value.find(err_msg) != -1, failed_msg
 
 
-def L_MDEF_0014(legato):
+def L_MDEF_0014(target, legato):
     """Verify relative path could be taken by specifying moduleSearch.
 
     This script will
@@ -909,6 +872,7 @@ def L_MDEF_0014(legato):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -921,16 +885,13 @@ def L_MDEF_0014(legato):
     list_modules = [test_name]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
@@ -938,12 +899,9 @@ def L_MDEF_0014(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
@@ -951,12 +909,9 @@ def L_MDEF_0014(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
@@ -1025,7 +980,7 @@ def L_MDEF_0016(legato):
     assert returned_value.find(err_msg) != -1, failed_msg
 
 
-def L_MDEF_0017(legato):
+def L_MDEF_0017(target, legato):
     """Verify mksys should be able to handle both relative path.
 
     and absolute path.
@@ -1038,6 +993,7 @@ def L_MDEF_0017(legato):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -1049,16 +1005,13 @@ def L_MDEF_0017(legato):
     list_modules = ["L_MDEF_0017_0", "L_MDEF_0017_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
@@ -1066,12 +1019,9 @@ def L_MDEF_0017(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
@@ -1079,18 +1029,15 @@ def L_MDEF_0017(legato):
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
 
 
-def L_MDEF_0018(legato):
+def L_MDEF_0018(target, legato):
     """Verify that files, bin and scripts directory is bundled.
 
     under system module directory.
@@ -1102,6 +1049,7 @@ def L_MDEF_0018(legato):
     4. Verify presence of the bundled files
 
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -1113,46 +1061,23 @@ def L_MDEF_0018(legato):
     list_modules = ["L_MDEF_0018_0"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     swilog.step("Step 3: Verify module file is present...")
-    folder_path = "/legato/systems/current/modules"
-    if not check_file_presence(legato, folder_path, test_name):
+    for module in get_missing_module_files(target, list_modules):
         test_passed = False
-        swilog.error("Step 3: Module file isn't present")
+        swilog.error("Step 3: Module file %s.ko isn't present" % module)
 
     swilog.step("Step 4: Verify bundled files are present...")
-    files = ["text.txt", "dir", "scripts"]
-    folder_path = "/legato/systems/current/modules/files/L_MDEF_0018_0"
-    for file_name in files:
-        if not check_file_presence(legato, folder_path, file_name):
-            test_passed = False
-            swilog.error("Step 3: File or directory %s isn't present" % file_name)
-
-    files = ["install.sh", "remove.sh"]
-    folder_path = "/legato/systems/current/modules/files/L_MDEF_0018_0/scripts"
-    for file_name in files:
-        if not check_file_presence(legato, folder_path, file_name):
-            test_passed = False
-            swilog.error(
-                "Step 3: File or directory scripts/%s isn't present" % file_name
-            )
-
-    files = ["dir.txt"]
-    folder_path = "/legato/systems/current/modules/files/L_MDEF_0018_0/dir"
-    for file_name in files:
-        if not check_file_presence(legato, folder_path, file_name):
-            test_passed = False
-            swilog.error("Step 3: File dir/%s isn't present" % file_name)
+    for file_name in get_missing_bundled_files(target, "L_MDEF_0018_0"):
+        test_passed = False
+        swilog.error("Step 3: File or directory %s isn't present" % file_name)
 
     # End of script
     assert test_passed, display_errors()
@@ -1187,7 +1112,7 @@ def L_MDEF_0019(legato):
     assert returned_value.find(err_msg) != -1, failed_msg
 
 
-def L_MDEF_0020(legato):
+def L_MDEF_0020(target, legato):
     """Test to load more than one kernelModule with scripts.
 
     This script will
@@ -1195,6 +1120,7 @@ def L_MDEF_0020(legato):
         2. Verify loading of the module
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -1206,16 +1132,13 @@ def L_MDEF_0020(legato):
     list_modules = ["L_MDEF_0020_0", "L_MDEF_0020_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
@@ -1244,11 +1167,11 @@ def L_MDEF_0021(target, legato):
     list_modules = ["L_MDEF_0021_0", "L_MDEF_0021_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify auto loading mod has been loaded...")
-    if not check_presence(legato, "L_MDEF_0021_0"):
+    if wait_for_modules(target, loaded=["L_MDEF_0021_0"]):
         test_passed = False
         swilog.error("Step 2: Kernel module L_MDEF_0021_0 has not been properly loaded")
 
@@ -1263,12 +1186,9 @@ def L_MDEF_0021(target, legato):
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mods have been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
@@ -1301,7 +1221,7 @@ def L_MDEF_0022(legato):
     assert returned_value.find("error: Unexpected character") != -1, failed_msg
 
 
-def L_MDEF_0023(legato):
+def L_MDEF_0023(target, legato):
     """Relative path in script section of mdef.
 
     This script will
@@ -1309,6 +1229,7 @@ def L_MDEF_0023(legato):
         2. Verify loading of the module
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -1324,16 +1245,13 @@ def L_MDEF_0023(legato):
     swilog.warning(
         "WARNING: Works only if you run the test script from qa/letp/ directory"
     )
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
@@ -1428,7 +1346,7 @@ def L_MDEF_0026(legato):
     assert returned_value.find(err_msg) != -1, failed_msg
 
 
-def L_MDEF_0029(legato, logread):
+def L_MDEF_0029(target, legato):
     """Verify that mdef can be use to include multiple prebuilt kernel module.
 
     This script will
@@ -1439,8 +1357,8 @@ def L_MDEF_0029(legato, logread):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
-        logread: fixture to check log on the target
     """
     # Verify existence of environment variables and files needed.
     # Prepare compilation
@@ -1451,19 +1369,19 @@ def L_MDEF_0029(legato, logread):
     list_modules = ["L_MDEF_prebuilt_0", "L_MDEF_prebuilt_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    log_mark = mark_log(target)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1473,19 +1391,19 @@ def L_MDEF_0029(legato, logread):
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
+    log_mark = mark_log(target)
     legato.legato_stop()
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Verify unloading order
-    (result, message) = check_unloading_order(logread, DESCENDING_ORDER, list_modules)
+    (result, message) = check_unloading_order(
+        log_mark, DESCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1495,19 +1413,19 @@ def L_MDEF_0029(legato, logread):
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
+    log_mark = mark_log(target)
     legato.legato_start()
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1629,7 +1547,7 @@ def L_MDEF_0033(legato):
     assert returned_value.find(err_msg) != -1, failed_msg
 
 
-def L_MDEF_0043(legato, logread):
+def L_MDEF_0043(target, legato):
     """Verify that mdef able to take more than two prebuilt using "{}" and ":".
 
     This script will
@@ -1640,8 +1558,8 @@ def L_MDEF_0043(legato, logread):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
-        logread: fixture to check log on the target
     """
     # Verify existence of environment variables and files needed.
     # Prepare compilation
@@ -1652,19 +1570,19 @@ def L_MDEF_0043(legato, logread):
     list_modules = ["L_MDEF_prebuilt_0", "L_MDEF_prebuilt_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    log_mark = mark_log(target)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1674,19 +1592,19 @@ def L_MDEF_0043(legato, logread):
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
+    log_mark = mark_log(target)
     legato.legato_stop()
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Verify unloading order
-    (result, message) = check_unloading_order(logread, DESCENDING_ORDER, list_modules)
+    (result, message) = check_unloading_order(
+        log_mark, DESCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1696,19 +1614,19 @@ def L_MDEF_0043(legato, logread):
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
+    log_mark = mark_log(target)
     legato.legato_start()
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1720,7 +1638,7 @@ def L_MDEF_0043(legato, logread):
     assert test_passed, display_errors()
 
 
-def L_MDEF_0046(legato, logread):
+def L_MDEF_0046(target, legato):
     """Verify relative path could be taken by specifying moduleSearch.
 
     This script will
@@ -1731,8 +1649,8 @@ def L_MDEF_0046(legato, logread):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
-        logread: fixture to check log on the target
     """
     # Verify existence of environment variables and files needed.
     # Prepare compilation
@@ -1743,19 +1661,19 @@ def L_MDEF_0046(legato, logread):
     list_modules = ["L_MDEF_0046_0", "L_MDEF_0046_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    log_mark = mark_log(target)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1765,19 +1683,19 @@ def L_MDEF_0046(legato, logread):
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
+    log_mark = mark_log(target)
     legato.legato_stop()
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Verify unloading order
-    (result, message) = check_unloading_order(logread, DESCENDING_ORDER, list_modules)
+    (result, message) = check_unloading_order(
+        log_mark, DESCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1787,19 +1705,19 @@ def L_MDEF_0046(legato, logread):
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
+    log_mark = mark_log(target)
     legato.legato_start()
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1811,7 +1729,7 @@ def L_MDEF_0046(legato, logread):
     assert test_passed, display_errors()
 
 
-def L_MDEF_0047(legato, logread):
+def L_MDEF_0047(target, legato):
     """Verify relative path could be taken by specifying moduleSearch.
 
     This script will
@@ -1822,8 +1740,8 @@ def L_MDEF_0047(legato, logread):
         5. Compile the default package and update the target with it
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
-        logread: fixture to check log on the target
     """
     # Verify existence of environment variables and files needed.
     # Prepare compilation
@@ -1834,19 +1752,19 @@ def L_MDEF_0047(legato, logread):
     list_modules = ["L_MDEF_0047_1", "L_MDEF_0047_0"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    log_mark = mark_log(target)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1856,19 +1774,19 @@ def L_MDEF_0047(legato, logread):
 
     # Stop legato
     swilog.step("Step 3: Stopping legato...")
+    log_mark = mark_log(target)
     legato.legato_stop()
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mod has been unloaded...")
-    for module in list_modules:
-        if check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly unloaded" % module
-            )
+    for module in wait_for_modules(target, unloaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly unloaded" % module)
 
     # Verify unloading order
-    (result, message) = check_unloading_order(logread, DESCENDING_ORDER, list_modules)
+    (result, message) = check_unloading_order(
+        log_mark, DESCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -1878,19 +1796,19 @@ def L_MDEF_0047(legato, logread):
 
     # Start legato
     swilog.step("Step 5: Starting legato...")
+    log_mark = mark_log(target)
     legato.legato_start()
 
     # Verify mod has been loaded
     swilog.step("Step 6: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 6: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 6: Kernel module %s has not been properly loaded" % module)
 
     # Verify loading order
-    (result, message) = check_loading_order(logread, ASCENDING_ORDER, list_modules)
+    (result, message) = check_loading_order(
+        log_mark, ASCENDING_ORDER, list_modules, test_name
+    )
     if not result:
         test_passed = False
         swilog.error(
@@ -2010,7 +1928,7 @@ def L_MDEF_0051(legato):
     assert returned_value.find(err_msg) != -1, failed_msg
 
 
-def L_MDEF_0052(legato):
+def L_MDEF_0052(target, legato):
     """Test to load more than one kernelModule with scripts.
 
     This script will
@@ -2019,6 +1937,7 @@ def L_MDEF_0052(legato):
         2. Verify loading of the module
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -2030,22 +1949,19 @@ def L_MDEF_0052(legato):
     list_modules = ["L_MDEF_prebuilt_0", "L_MDEF_prebuilt_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
 
 
-def L_MDEF_0053(legato):
+def L_MDEF_0053(target, legato):
     """Test to load more than one kernelModule with scripts.
 
     This script will
@@ -2054,6 +1970,7 @@ def L_MDEF_0053(legato):
         2. Verify loading of the module
 
     Args:
+        target: fixture to communicate with the target
         legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -2065,16 +1982,13 @@ def L_MDEF_0053(legato):
     list_modules = ["L_MDEF_prebuilt_0", "L_MDEF_prebuilt_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mods have been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
@@ -2101,11 +2015,11 @@ def L_MDEF_0054(target, legato):
     list_modules = ["L_MDEF_prebuilt_0", "L_MDEF_prebuilt_1"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify auto loading mod has been loaded...")
-    if not check_presence(legato, "L_MDEF_prebuilt_0"):
+    if wait_for_modules(target, loaded=["L_MDEF_prebuilt_0"]):
         test_passed = False
         swilog.error(
             "Step 2: Kernel module L_MDEF_prebuilt_0 has not been properly loaded"
@@ -2122,12 +2036,9 @@ def L_MDEF_0054(target, legato):
 
     # Verify mod has been loaded
     swilog.step("Step 4: Verify mods have been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 4: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 4: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
@@ -2156,7 +2067,7 @@ def L_MDEF_0055(legato):
     assert returned_value.find("error: Unexpected character") != -1, failed_msg
 
 
-def L_MDEF_0056(legato):
+def L_MDEF_0056(target, legato):
     """Specify install and remove in your script section.
 
     This script will
@@ -2166,6 +2077,7 @@ def L_MDEF_0056(legato):
     3. Compile the default package and update the target with it
 
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -2177,22 +2089,19 @@ def L_MDEF_0056(legato):
     list_modules = [test_name]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
 
 
-def L_MDEF_0057(legato):
+def L_MDEF_0057(target, legato):
     """Specify install and remove in your script section.
 
     This script will
@@ -2201,6 +2110,7 @@ def L_MDEF_0057(legato):
     2. Verify loading of the module
     3. Compile the default package and update the target with it
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -2212,22 +2122,19 @@ def L_MDEF_0057(legato):
     list_modules = ["L_MDEF_prebuilt_0"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
 
 
-def L_MDEF_0058(legato):
+def L_MDEF_0058(target, legato):
     """Relative path in script section of mdef.
 
     This script will
@@ -2236,6 +2143,7 @@ def L_MDEF_0058(legato):
         2. Verify loading of the module
         3. Compile the default package and update the target with it
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -2251,16 +2159,13 @@ def L_MDEF_0058(legato):
     swilog.warning(
         "WARNING: Works only if you run the test script from qa/letp/ directory"
     )
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     # End of script
     assert test_passed, display_errors()
@@ -2345,7 +2250,7 @@ def L_MDEF_0061(legato):
     assert returned_value.find(err_msg) != -1, failed_msg
 
 
-def L_MDEF_0062(legato):
+def L_MDEF_0062(target, legato):
     """Verify that files, bin and scripts directory is bundled.
 
     under system module directory.
@@ -2357,6 +2262,7 @@ def L_MDEF_0062(legato):
         3. Verify presence of the module file
         4. Verify presence of the bundled files
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     """
     # Verify existence of environment variables and files needed.
@@ -2368,46 +2274,23 @@ def L_MDEF_0062(legato):
     list_modules = ["L_MDEF_prebuilt_0"]
 
     # Compile and update target
-    install_system(legato, test_name)
+    install_system(target, legato, test_name)
 
     # Verify mod has been loaded
     swilog.step("Step 2: Verify mod has been loaded...")
-    for module in list_modules:
-        if not check_presence(legato, module):
-            test_passed = False
-            swilog.error(
-                "Step 2: Kernel module %s has not been properly loaded" % module
-            )
+    for module in wait_for_modules(target, loaded=list_modules):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has not been properly loaded" % module)
 
     swilog.step("Step 3: Verify module file is present...")
-    folder_path = "/legato/systems/current/modules"
-    if not check_file_presence(legato, folder_path, "L_MDEF_prebuilt_0"):
+    for module in get_missing_module_files(target, list_modules):
         test_passed = False
-        swilog.error("Step 3: Module file isn't present")
+        swilog.error("Step 3: Module file %s.ko isn't present" % module)
 
     swilog.step("Step 4: Verify bundled files are present...")
-    files = ["text.txt", "dir", "scripts"]
-    folder_path = "/legato/systems/current/modules/files/L_MDEF_prebuilt_0"
-    for file_name in files:
-        if not check_file_presence(legato, folder_path, file_name):
-            test_passed = False
-            swilog.error("Step 3: File or directory %s isn't present" % file_name)
-
-    files = ["install.sh", "remove.sh"]
-    folder_path = "/legato/systems/current/modules/files/L_MDEF_prebuilt_0/scripts"
-    for file_name in files:
-        if not check_file_presence(legato, folder_path, file_name):
-            test_passed = False
-            swilog.error(
-                "Step 3: File or directory scripts/%s isn't present" % file_name
-            )
-
-    files = ["dir.txt"]
-    folder_path = "/legato/systems/current/modules/files/L_MDEF_prebuilt_0/dir"
-    for file_name in files:
-        if not check_file_presence(legato, folder_path, file_name):
-            test_passed = False
-            swilog.error("Step 3: File dir/%s isn't present" % file_name)
+    for file_name in get_missing_bundled_files(target, "L_MDEF_prebuilt_0"):
+        test_passed = False
+        swilog.error("Step 3: File or directory %s isn't present" % file_name)
 
     # End of script
     assert test_passed, display_errors()
@@ -8,9 +8,29 @@ import pexpect
 import pytest
 from pytest_letp.lib import swilog, sim_lib
 
+from common.golden import restore_golden_legato
+from common.readiness import (
+    SYSTEM_STARTED_LOG,
+    mark_system_log,
+    wait_for_system_ready,
+)
+from common.teardown import defer_teardown
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 
 
+def cleanup_target(target, legato):
+    """Stop the test app and restore the golden system (teardown action).
+
+    :param target: fixture to communicate with the target
+    :param legato: fixture to call useful functions regarding legato
+    """
+    # In case the test is still in app runProc, terminate it
+    target.sendcontrol("c")
+    target.prompt()
+    restore_golden_legato(target, legato)
+
+
 @pytest.fixture
 def installapp_cleanup(target, legato, request, tmpdir):
     """Fixture to initialize (make, install application...).
@@ -109,10 +129,7 @@ def installapp_cleanup(target, legato, request, tmpdir):
 
     yield phone_num
     # Clean up target
-    # In case the test is still in app runProc, terminate it
-    target.sendcontrol("c")
-    target.prompt()
-    legato.restore_golden_legato()
+    defer_teardown("target cleanup", cleanup_target, target, legato)
 
 
 @pytest.fixture()
@@ -143,16 +160,14 @@ def installsys_cleanup(target, legato, request, tmpdir):
         assert "/usr/bin/mosquitto_pub" in ret[0], fail_msg
 
     # Build and instal system
+    mark = mark_system_log(target)
     legato.make_install_sys(sys_name, sys_path=sys_path)
     # wait for system ready
-    time.sleep(30)
+    wait_for_system_ready(target, log_pattern=SYSTEM_STARTED_LOG, log_since=mark)
 
     yield
     # Clean up target
-    # In case the test is still in app runProc, terminate it
-    target.sendcontrol("c")
-    target.prompt()
-    legato.restore_golden_legato()
+    defer_teardown("target cleanup", cleanup_target, target, legato)
 
 
 @pytest.fixture()
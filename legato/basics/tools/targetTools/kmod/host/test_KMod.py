@@ -8,6 +8,21 @@ import pytest
 import pexpect
 from pytest_letp.lib import swilog
 
+from common.build_cache import get_default_cache
+from common.kernel_modules import wait_for_modules
+from common.readiness import (
+    CM_INFO_READY_CMD,
+    SYSTEM_STARTED_LOG,
+    mark_system_log,
+    wait_for_system_ready,
+)
+from common.scheduler import keeps_system, mark_system_installed, reuses_system
+from common.target_state import (
+    get_kernel_residue,
+    get_system_residue,
+    get_target_state,
+)
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -21,6 +36,9 @@ test_passed = True
 
 is_first_execution = True
 
+# State of the target after the last reboot, None until the first one
+clean_state = None
+
 
 # ======================================================================================
 # Functions
@@ -106,27 +124,17 @@ def check_unloading(target, module_name, expected_output_index):
     return (test_passed, found_expected)
 
 
-def check_presence(legato, module_name):
-    r"""Check whether a module is loaded or not.
-
-    :param target: fixture to communicate with the target
-    :param legato: fixture to call useful functions regarding legato
-    :param module_name: name of kernel module (\*.ko)
-
-    :returns True: a module is loaded
-    :returns False: a module is not loaded
-    """
-    exit_code = legato.ssh_to_target('/sbin/lsmod | grep -F "%s"' % module_name)
-    return bool(exit_code == 0)
-
-
-def install_system(target, legato, dir_path, test_name):
+def install_system(target, legato, dir_path, test_name, modules=()):
     """Compile the provided sdef and update the target with it.
 
+    The install is skipped when the previous test left the same system
+    (system_chain marker, see common.scheduler).
+
     :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     :param dir_path: a temporary directory unique to the test invocation
     :param test_name: test case name
+    :param modules: kernel modules expected to be loaded once the system is ready
     """
     swilog.debug(dir_path)
     # Sdef file
@@ -134,37 +142,39 @@ def install_system(target, legato, dir_path, test_name):
     source_file_path = os.path.join(TEST_RESOURCES, sdef_file)
     assert os.path.exists(source_file_path), "sdef file does not exist"
 
-    # Compile and update target
-    swilog.info("Compilation in progress. Please wait...")
-    make_install_sys_in_temporary_directory(
-        legato, dir_path, test_name, source_file_path
-    )
+    # Compile and update target, unless the previous test left the system
+    mark = None
+    if reuses_system():
+        swilog.info("System left by the previous test: install skipped")
+    else:
+        swilog.info("Compilation in progress. Please wait...")
+        mark = mark_system_log(target)
+        make_install_sys_in_temporary_directory(
+            target, legato, dir_path, test_name, source_file_path
+        )
 
     # Waiting for legato to be ready
-    time.sleep(30)
-    wait_for_cm_info(target)
-    time.sleep(5)
+    wait_for_legato(target, modules, mark)
+    mark_system_installed()
 
 
-def wait_for_cm_info(target):
-    """Check target is available.
+def wait_for_legato(target, modules=(), log_since=None):
+    """Check legato is operational.
 
     :param target: fixture to communicate with the target
+    :param modules: kernel modules expected to be loaded
+    :param log_since: marker written before an install (see mark_system_log),
+                      to also wait for the supervisor to log the start
     """
     swilog.info("Checking legato is operational...")
-    timer = 30
-    while timer >= 0:
-        try:
-            target.sendline("/legato/systems/current/bin/cm info")
-            target.expect("Device:", 3)
-            timer = -1
-        except pexpect.TIMEOUT:
-            swilog.debug("Unable to install system for now")
-            timer -= 1
-        except pexpect.EOF:
-            swilog.debug("cm info returned unexpected value")
-            timer -= 1
-        time.sleep(1)
+    wait_for_system_ready(
+        target,
+        modules=modules,
+        commands=[CM_INFO_READY_CMD],
+        log_pattern=SYSTEM_STARTED_LOG if log_since else None,
+        timeout=65,
+        log_since=log_since,
+    )
 
 
 def wait_for_app_presence(legato, app_name):
@@ -211,10 +221,11 @@ def display_errors():
 
 
 def make_sys_in_temporary_directory(
-    legato, temp_dir_path, sys_name, definition_file_path
+    target, legato, temp_dir_path, sys_name, definition_file_path
 ):
-    """Compile the provided sdef and update the target.
+    """Compile the provided sdef, or get it from the build cache.
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     :param temp_dir_path: a temporary directory unique to the test invocation
     :param sys_name: name of the system definition file
@@ -222,9 +233,11 @@ def make_sys_in_temporary_directory(
     """
     old_path = os.getcwd()
     os.chdir(temp_dir_path)
-    legato.make_sys(
+    get_default_cache().make_sys(
+        legato,
+        target.target_name,
         sys_name,
-        sys_path=definition_file_path,
+        definition_file_path,
         option="--output-dir=%s" % temp_dir_path,
         quiet=True,
     )
@@ -232,25 +245,20 @@ def make_sys_in_temporary_directory(
 
 
 def make_install_sys_in_temporary_directory(
-    legato, temp_dir_path, sys_name, definition_file_path
+    target, legato, temp_dir_path, sys_name, definition_file_path
 ):
     """Compile the provided sdef and update the target.
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     :param temp_dir_path: a temporary directory unique to the test invocation
     :param sys_name: name of the system definition file
     :param definition_file_path: path of the  system definition file (.sdef)
     """
-    old_path = os.getcwd()
-    os.chdir(temp_dir_path)
-    legato.make_sys(
-        sys_name,
-        sys_path=definition_file_path,
-        option="--output-dir=%s" % temp_dir_path,
-        quiet=True,
+    make_sys_in_temporary_directory(
+        target, legato, temp_dir_path, sys_name, definition_file_path
     )
     legato.install_sys(sys_name, sys_path=temp_dir_path, quiet=True)
-    os.chdir(old_path)
 
 
 # =====================================================================================
@@ -260,6 +268,9 @@ def make_install_sys_in_temporary_directory(
 def check_environment(target, legato, create_temp_workspace):
     """Check environment and clean up after each test.
 
+    The default system is reinstalled and the target rebooted only when the
+    state probe shows that the test left residue.
+
     :param legato: fixture to call useful functions regarding legato
     :param target: fixture to communicate with the target
     :param create_temp_workspace: fixture to create a temporary folder
@@ -273,19 +284,47 @@ def check_environment(target, legato, create_temp_workspace):
     yield
 
     # Waiting for legato to be ready
-    wait_for_cm_info(target)
-
-    # Clean target by uploading default legato
-    swilog.info("Updating target with default legato...")
-    legato.install_sys("default", sys_path=create_temp_workspace)
-
-    # Waiting for legato to be ready
-    time.sleep(30)
-    wait_for_cm_info(target)
+    wait_for_legato(target)
+
+    # The next test runs on the same system (see common.scheduler)
+    if keeps_system():
+        swilog.info("System kept for the next test")
+        return
+
+    # Only clean what the test left: reinstall the default system if it
+    # changed, reboot if the kernel kept traces of the test
+    global clean_state
+    state = get_target_state(target)
+    if clean_state is None:
+        residue = ["no clean state recorded"]
+    else:
+        residue = get_system_residue(clean_state, state)
+
+    if residue:
+        # Clean target by uploading default legato
+        swilog.info("Updating target with default legato (%s)..." % "; ".join(residue))
+        mark = mark_system_log(target)
+        legato.install_sys("default", sys_path=create_temp_workspace)
+
+        # Waiting for legato to be ready
+        wait_for_legato(target, log_since=mark)
+        state = get_target_state(target)
+
+    if clean_state is not None:
+        # The default system is installed again with a new index
+        clean_state = clean_state._replace(
+            index=state.index, system_modules=state.system_modules
+        )
+        residue = get_kernel_residue(clean_state, state)
 
-    # Rebooting target
-    swilog.info("Rebooting target...")
-    target.reboot(60)
+    if residue:
+        # Rebooting target
+        swilog.info("Rebooting target (%s)..." % "; ".join(residue))
+        target.reboot(60)
+        wait_for_legato(target)
+        clean_state = get_target_state(target)
+    else:
+        swilog.info("Target state is clean: reboot skipped")
 
 
 @pytest.fixture
@@ -316,10 +355,10 @@ def environment_setting(target, legato, create_temp_workspace):
                 os.environ.get(sys_root_variable), "usr/src/kernel"
             )
 
-        # Build default legato and save package
+        # Build default legato and save package (shared with the other modules)
         swilog.info("Compiling default legato...")
-        make_sys_in_temporary_directory(
-            legato, create_temp_workspace, "default", os.environ.get("LEGATO_ROOT")
+        get_default_cache().make_default_sys(
+            legato, target.target_name, create_temp_workspace
         )
 
         # Clean target by uploading default legato
@@ -346,6 +385,7 @@ def create_temp_workspace(tmpdir_factory):
 # =====================================================================================
 # Test functions
 # =====================================================================================
+@pytest.mark.system_chain
 @pytest.mark.usefixtures("check_environment", "environment_setting")
 def L_Tools_Kmod_0004(target, legato, create_temp_workspace):
     """Verify that kmod command able to load and unload the kernel module.
@@ -367,10 +407,10 @@ def L_Tools_Kmod_0004(target, legato, create_temp_workspace):
 
     # Compile and update target
     swilog.step("Step 1: Compiling...")
-    install_system(target, legato, create_temp_workspace, test_name)
+    install_system(target, legato, create_temp_workspace, test_name, [test_name])
 
     swilog.step("Step 2: Verify mod has been loaded...")
-    if not check_presence(legato, test_name):
+    if wait_for_modules(target, loaded=[test_name]):
         test_passed = False
         swilog.error("Step 2: Kernel module has not been properly loaded")
 
@@ -415,7 +455,7 @@ def L_Tools_Kmod_0005(target, legato, create_temp_workspace):
     install_system(target, legato, create_temp_workspace, test_name)
 
     swilog.step("Step 2: Verify mod has not been loaded...")
-    if check_presence(legato, test_name):
+    if wait_for_modules(target, unloaded=[test_name]):
         test_passed = False
         swilog.error("Step 2: Kernel module has been unexpectedly loaded")
 
@@ -436,6 +476,7 @@ def L_Tools_Kmod_0005(target, legato, create_temp_workspace):
     assert test_passed, display_errors()
 
 
+@pytest.mark.system_chain
 @pytest.mark.usefixtures("check_environment", "environment_setting")
 def L_Tools_Kmod_0006(target, legato, create_temp_workspace):
     """Verify kmod cmd should not be able to load if it already loaded.
@@ -458,10 +499,10 @@ def L_Tools_Kmod_0006(target, legato, create_temp_workspace):
     test_passed = True
     # Compile and update target
     swilog.step("Step 1: Compiling...")
-    install_system(target, legato, create_temp_workspace, test_name)
+    install_system(target, legato, create_temp_workspace, test_name, [test_name])
 
     swilog.step("Step 2: Verify mod has been loaded...")
-    if not check_presence(legato, test_name):
+    if wait_for_modules(target, loaded=[test_name]):
         test_passed = False
         swilog.error("Step 2: Kernel module has not been properly loaded")
 
@@ -500,12 +541,16 @@ def L_Tools_Kmod_0007(target, legato, create_temp_workspace):
     test_passed = True
     # Compile and update target
     swilog.step("Step 1: Compiling...")
-    install_system(target, legato, create_temp_workspace, test_name)
+    install_system(
+        target,
+        legato,
+        create_temp_workspace,
+        test_name,
+        ["L_Tools_Kmod_0004", test_name],
+    )
 
     swilog.step("Step 2: Verify mods have been loaded...")
-    check_presence_0004 = check_presence(legato, "L_Tools_Kmod_0004")
-    check_presence_0007 = check_presence(legato, test_name)
-    if (not check_presence_0007) or (not check_presence_0004):
+    if wait_for_modules(target, loaded=["L_Tools_Kmod_0004", test_name]):
         test_passed = False
         swilog.error("Step 2: Kernel module have not been properly loaded")
 
@@ -552,10 +597,10 @@ def L_Tools_Kmod_0008(target, legato, create_temp_workspace):
     test_passed = True
     # Compile and update target
     swilog.step("Step 1: Compiling...")
-    install_system(target, legato, create_temp_workspace, test_name)
+    install_system(target, legato, create_temp_workspace, test_name, [test_name])
 
     swilog.step("Step 2: Verify mod has been loaded and app is running...")
-    if not check_presence(legato, test_name):
+    if wait_for_modules(target, loaded=[test_name]):
         test_passed = False
         swilog.error("Step 2: Kernel module has not been properly loaded")
     if not legato.is_app_running("LoopingHelloWorld"):
@@ -604,7 +649,9 @@ def L_Tools_Kmod_0009(target, legato, create_temp_workspace):
     install_system(target, legato, create_temp_workspace, test_name)
 
     swilog.step("Step 2: Verify mod has not been loaded and app is not running...")
-    if check_presence(legato, test_name) or legato.is_app_running("LoopingHelloWorld"):
+    if wait_for_modules(target, unloaded=[test_name]) or legato.is_app_running(
+        "LoopingHelloWorld"
+    ):
         test_passed = False
         swilog.error(
             "Step 2: Kernel module has been erroneously loaded or App is running"
@@ -617,7 +664,7 @@ def L_Tools_Kmod_0009(target, legato, create_temp_workspace):
         swilog.error("Step 3: Kernel module has not been properly loaded")
 
     swilog.step("Step 5: Verify mod has been loaded...")
-    if not check_presence(legato, test_name):
+    if wait_for_modules(target, loaded=[test_name]):
         test_passed = False
         swilog.error("Step 5: Kernel module has not been properly loaded")
 
@@ -633,7 +680,7 @@ def L_Tools_Kmod_0009(target, legato, create_temp_workspace):
     wait_for_app_running(legato, "LoopingHelloWorld")
 
     swilog.step("Step 9: Verify mod has been loaded...")
-    if not check_presence(legato, test_name):
+    if wait_for_modules(target, loaded=[test_name]):
         test_passed = False
         swilog.error("Step 9: Kernel module has not been properly loaded")
 
@@ -648,7 +695,7 @@ def L_Tools_Kmod_0009(target, legato, create_temp_workspace):
     legato.stop("LoopingHelloWorld")
 
     swilog.step("Step 13: Verify mod has been unloaded...")
-    if check_presence(legato, test_name):
+    if wait_for_modules(target, unloaded=[test_name]):
         test_passed = False
         swilog.error("Step 13: Kernel module should have been unloaded")
 
@@ -692,7 +739,7 @@ def L_Tools_Kmod_0010(target, legato, create_temp_workspace):
     install_system(target, legato, create_temp_workspace, test_name)
 
     swilog.step("Step 2: Verify mod has not been loaded and app is not running...")
-    if check_presence(legato, test_name):
+    if wait_for_modules(target, unloaded=[test_name]):
         test_passed = False
         swilog.error("Step 2: Kernel module has been erroneously loaded")
     if legato.is_app_running("LoopingHelloWorld"):
@@ -703,7 +750,7 @@ def L_Tools_Kmod_0010(target, legato, create_temp_workspace):
     target.sendline("/legato/systems/current/bin/app start LoopingHelloWorld")
 
     swilog.step("Step 4: Verify mod has been loaded and app is running...")
-    if not check_presence(legato, test_name):
+    if wait_for_modules(target, loaded=[test_name]):
         test_passed = False
         swilog.error("Step 2: Kernel module has not been properly loaded")
     if not legato.is_app_running("LoopingHelloWorld"):
@@ -715,7 +762,7 @@ def L_Tools_Kmod_0010(target, legato, create_temp_workspace):
     legato.remove("LoopingHelloWorld")
 
     swilog.step("Step 6: Verify mod unloaded and app removed...")
-    if check_presence(legato, test_name):
+    if wait_for_modules(target, unloaded=[test_name]):
         test_passed = False
         swilog.error("Step 6: Kernel module has been erroneously loaded")
     if legato.is_app_exist("LoopingHelloWorld"):
@@ -727,10 +774,9 @@ def L_Tools_Kmod_0010(target, legato, create_temp_workspace):
     if not returned_value:
         test_passed = False
         swilog.error("Step 3: Kernel module has not been properly loaded")
-    time.sleep(5)  # Wait the module to be loaded
 
     swilog.step("Step 9: Verify mod has been loaded...")
-    if not check_presence(legato, test_name):
+    if wait_for_modules(target, loaded=[test_name]):
         test_passed = False
         swilog.error("Step 9: Kernel module has not been properly loaded")
     swilog.debug(returned_index)
@@ -765,10 +811,11 @@ def L_Tools_Kmod_0011(target, legato, create_temp_workspace):
     install_system(target, legato, create_temp_workspace, test_name)
 
     swilog.step("Step 2: Verify mods have not been loaded...")
-    if check_presence(legato, test_name):
+    unexpected = wait_for_modules(target, unloaded=[test_name, "L_Tools_Kmod_0005"])
+    if test_name in unexpected:
         test_passed = False
         swilog.error("Step 2: Primary kernel module has been unexpectedly loaded")
-    if check_presence(legato, "L_Tools_Kmod_0005"):
+    if "L_Tools_Kmod_0005" in unexpected:
         test_passed = False
         swilog.error("Step 2: Required kernel module has been unexpectedly loaded")
 
@@ -795,10 +842,11 @@ def L_Tools_Kmod_0011(target, legato, create_temp_workspace):
         swilog.error("Step 6: Kernel module has not been properly unloaded")
 
     swilog.step("Step 7: Verify mods have been unloaded...")
-    if check_presence(legato, test_name):
+    unexpected = wait_for_modules(target, unloaded=[test_name, "L_Tools_Kmod_0005"])
+    if test_name in unexpected:
         test_passed = False
         swilog.error("Step 7: Primary kernel module has not been unloaded")
-    if check_presence(legato, "L_Tools_Kmod_0005"):
+    if "L_Tools_Kmod_0005" in unexpected:
         test_passed = False
         swilog.error("Step 7: Required kernel module has not been unloaded")
     swilog.debug(returned_index)
@@ -841,10 +889,9 @@ def L_Tools_Kmod_0020(target, legato, create_temp_workspace):
     install_system(target, legato, create_temp_workspace, test_name)
 
     swilog.step("Step 2: Verify mods have not been loaded...")
-    for m in module_list:
-        if check_presence(legato, test_name):
-            test_passed = False
-            swilog.error("Step 2: Kernel module %s has been unexpectedly loaded" % m)
+    for m in wait_for_modules(target, unloaded=module_list):
+        test_passed = False
+        swilog.error("Step 2: Kernel module %s has been unexpectedly loaded" % m)
 
     swilog.step("Step 3: Loading...")
     (returned_value, returned_index) = check_loading(target, test_name, RESULT_OK)
@@ -852,12 +899,9 @@ def L_Tools_Kmod_0020(target, legato, create_temp_workspace):
         test_passed = False
         swilog.error("Step 3: Kernel module has not been properly loaded")
 
-    wait_for_cm_info(target)
-
-    for m in module_list:
-        if not check_presence(legato, m):
-            test_passed = False
-            swilog.error("Step 3: Kernel module %s should have been loaded" % m)
+    for m in wait_for_modules(target, loaded=module_list):
+        test_passed = False
+        swilog.error("Step 3: Kernel module %s should have been loaded" % m)
 
     swilog.step("Step 5: Unloading...")
     (returned_value, returned_index) = check_unloading(target, test_name, RESULT_OK)
@@ -865,12 +909,9 @@ def L_Tools_Kmod_0020(target, legato, create_temp_workspace):
         test_passed = False
         swilog.error("Step 5: Kernel module has not been properly unloaded")
 
-    wait_for_cm_info(target)
-
-    for m in module_list:
-        if check_presence(legato, m):
-            test_passed = False
-            swilog.error("Step 3: Kernel module %s should have been unloaded" % m)
+    for m in wait_for_modules(target, unloaded=module_list):
+        test_passed = False
+        swilog.error("Step 3: Kernel module %s should have been unloaded" % m)
     swilog.debug(returned_index)
     # End of script: Build the default package to reinitialise the target
     # And clean the LEGATO_ROOT directory
@@ -900,10 +941,10 @@ def L_Tools_Kmod_0021(target, legato, create_temp_workspace):
 
     # Compile and update target
     swilog.step("Step 1: Compiling...")
-    install_system(target, legato, create_temp_workspace, test_name)
+    install_system(target, legato, create_temp_workspace, test_name, [test_name])
 
     swilog.step("Step 2: Verify mod has been loaded...")
-    if not check_presence(legato, test_name):
+    if wait_for_modules(target, loaded=[test_name]):
         test_passed = False
         swilog.error("Step 2: Kernel module has not been properly loaded")
 
@@ -917,7 +958,7 @@ def L_Tools_Kmod_0021(target, legato, create_temp_workspace):
     swilog.step("Step 4: Unloading...")
     (returned_value, returned_index) = check_unloading(target, test_name, RESULT_OK)
 
-    if check_presence(legato, test_name):
+    if wait_for_modules(target, unloaded=[test_name]):
         test_passed = False
         swilog.error("Step 4:" "Kernel module %s should have been unloaded" % test_name)
 
@@ -938,7 +979,7 @@ def L_Tools_Kmod_0021(target, legato, create_temp_workspace):
     swilog.step("Step 7: Unloading...")
     (returned_value, returned_index) = check_unloading(target, test_name, RESULT_OK)
 
-    if check_presence(legato, test_name):
+    if wait_for_modules(target, unloaded=[test_name]):
         test_passed = False
         swilog.error("Step7:" "Kernel module %s should have been unloaded" % test_name)
 
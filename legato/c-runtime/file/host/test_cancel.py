@@ -7,6 +7,8 @@ import os
 import pytest
 from pytest_letp.lib import files, swilog
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -64,9 +66,9 @@ def L_AtomicFile_Operation_0031(target, legato, init_atomicFile):
 
     for td in test_descriptions:
         files.scp([hw_file_path], test_file_path, target.target_ip)
-        legato.clear_target_log()
+        log_mark = mark_log(target)
         legato.runProc(test_app_name, test_app_proc_name, test_file_path, td)
-        assert legato.wait_for_log_msg("le_atomFile_Cancel is called", 20) is True
+        assert log_mark.wait_for_msg("le_atomFile_Cancel is called", 20) is True
         target.run("diff %s %s" % (test_file_path, ref_file_path))
 
     swilog.info(
@@ -119,9 +121,9 @@ def L_AtomicFile_Operation_0032(target, legato, init_atomicFile):
 
     for td in test_descriptions:
         files.scp([hw_file_path], test_file_path, target.target_ip)
-        legato.clear_target_log()
+        log_mark = mark_log(target)
         legato.runProc(test_app_name, test_app_proc_name, test_file_path, td)
-        assert legato.wait_for_log_msg("le_atomFile_Cancel is called", 20) is True
+        assert log_mark.wait_for_msg("le_atomFile_Cancel is called", 20) is True
         target.run("diff %s %s" % (test_file_path, ref_file_path))
 
     swilog.info(
@@ -8,6 +8,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -68,9 +70,9 @@ def L_AtomicFile_Stream_0031(target, legato, init_atomicFile):
 
     for td in test_descriptions:
         files.scp([hw_file_path], test_file_path, target.target_ip)
-        legato.clear_target_log()
+        log_mark = mark_log(target)
         legato.runProc(test_app_name, test_app_proc_name, test_file_path, td)
-        assert legato.wait_for_log_msg("le_atomFile_CancelStream is called", 20) is True
+        assert log_mark.wait_for_msg("le_atomFile_CancelStream is called", 20) is True
         target.run("diff %s %s" % (test_file_path, ref_file_path))
         swilog.info(
             "[PASSED] le_atomFile_CancelStream cancels"
@@ -127,9 +129,9 @@ def L_AtomicFile_Stream_0032(target, legato, init_atomicFile):
 
     for td in test_descriptions:
         files.scp([hw_file_path], test_file_path, target.target_ip)
-        legato.clear_target_log()
+        log_mark = mark_log(target)
         legato.runProc(test_app_name, test_app_proc_name, test_file_path, td)
-        assert legato.wait_for_log_msg("le_atomFile_CancelStream is called", 20) is True
+        assert log_mark.wait_for_msg("le_atomFile_CancelStream is called", 20) is True
         target.run("diff %s %s" % (test_file_path, ref_file_path))
 
     swilog.info(
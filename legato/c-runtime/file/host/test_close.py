@@ -8,6 +8,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -65,9 +67,9 @@ def L_AtomicFile_Operation_0029(target, legato, init_atomicFile):
 
     for td in test_descriptions:
         files.scp([hw_file_path], test_file_path, target.target_ip)
-        legato.clear_target_log()
+        log_mark = mark_log(target)
         legato.runProc(test_app_name, test_app_proc_name, test_file_path, td)
-        assert legato.wait_for_log_msg("le_atomFile_Close is called", 20) is True
+        assert log_mark.wait_for_msg("le_atomFile_Close is called", 20) is True
 
         if (
             legato.ssh_to_target(r" cat %s | grep -q \"String Foo\"" % (test_file_path))
@@ -78,7 +80,7 @@ def L_AtomicFile_Operation_0029(target, legato, init_atomicFile):
                 "commit all changes for test scenario of %s" % td
             )
         exp_log = "le_atomFile_Close returns LE_OK"
-        if legato.find_in_target_log(exp_log) is False:
+        if log_mark.find(exp_log) is False:
             assert 0, (
                 "[FAILED] le_atomFile_Close doesn't"
                 "return LE_OK for test scenario of %s" % td
@@ -139,15 +141,15 @@ def L_AtomicFile_Operation_0030(target, legato, init_atomicFile):
 
     for td in test_descriptions:
         files.scp([hw_file_path], test_file_path, target.target_ip)
-        legato.clear_target_log()
+        log_mark = mark_log(target)
         legato.runProc(test_app_name, test_app_proc_name, test_file_path, td)
 
-        assert legato.wait_for_log_msg("le_atomFile_Close is called", 20) is True
+        assert log_mark.wait_for_msg("le_atomFile_Close is called", 20) is True
 
         target.run("diff %s %s" % (test_file_path, ref_file_path))
 
         exp_log = "le_atomFile_Close returns LE_OK"
-        if legato.find_in_target_log(exp_log) is False:
+        if log_mark.find(exp_log) is False:
             assert 0, (
                 "[FAILED] le_atomFile_Close doesn't return "
                 "LE_OK for test scenario of %s" % td
@@ -9,6 +9,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -51,21 +53,19 @@ def L_AtomicFile_Operation_0008(target, legato, init_atomicFile):
     test_app_name = "atomCreate"
     test_app_proc_name = "atomCreateProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "duplicate"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
 
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
 
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     swilog.info(rsp)
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the "
@@ -103,17 +103,15 @@ def L_AtomicFile_Operation_0010(target, legato, init_atomicFile):
     """
     test_app_name = "atomCreate"
     test_app_proc_name = "atomCreateProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "fd"
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     swilog.info(rsp)
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the "
@@ -172,20 +170,20 @@ def L_AtomicFile_Operation_0018(target, legato, init_atomicFile):
     # Param: $1 - message to be expected from the log; $2 - wait time period
     # Post: return 0 when the message has been found; 1 otherwise
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
-    assert legato.wait_for_log_msg("first process is holding a file lock", 20) is True
-    assert legato.wait_for_log_msg("second process is holding a file lock", 20) is False
+    assert log_mark.wait_for_msg("first process is holding a file lock", 20) is True
+    assert log_mark.wait_for_msg("second process is holding a file lock", 20) is False
     # Process of the test app held the file lock"
 
-    assert legato.wait_for_log_msg("first process's file lock is released", 45) is True
-    assert legato.wait_for_log_msg("second process is holding a file lock", 20) is True
+    assert log_mark.wait_for_msg("first process's file lock is released", 45) is True
+    assert log_mark.wait_for_msg("second process is holding a file lock", 20) is True
     # Previous file lock was released"
 
     expected_log = "second process writes string 123 to the file"
-    assert legato.wait_for_log_msg(expected_log, 20) is True
+    assert log_mark.wait_for_msg(expected_log, 20) is True
 
     rsp = target.run(" %s stop %s" % (target_app_cmd, test_app_name))
 
@@ -9,6 +9,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -54,18 +56,16 @@ def L_AtomicFile_Stream_0008(target, legato, init_atomicFile):
     test_app_name = "atomCreateStream"
     test_app_proc_name = "atomCreateStreamProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "duplicate"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the "
         "test app's output message "
@@ -101,18 +101,16 @@ def L_AtomicFile_Stream_0009(target, legato, init_atomicFile):
     """
     test_app_name = "atomCreateStream"
     test_app_proc_name = "atomCreateStreamProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = "/abc/def/abc.txt"
     test_description = "fault"
     swilog.debug(init_atomicFile)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the "
         "test app's output message "
@@ -149,18 +147,16 @@ def L_AtomicFile_Stream_0010(target, legato, init_atomicFile):
     """
     test_app_name = "atomCreateStream"
     test_app_proc_name = "atomCreateStreamProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "fp"
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
 
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the "
         "test app's output message"
@@ -220,17 +216,17 @@ def L_AtomicFile_Stream_0018(target, legato, init_atomicFile):
     # Param: $1 - message to be expected from the log; $2 - wait time period
     # Post: return 0 when the message has been found; 1 otherwise
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
-    assert legato.wait_for_log_msg("first process is holding a file lock", 20) is True
-    assert legato.wait_for_log_msg("second process is holding a file lock", 20) is False
-    assert legato.wait_for_log_msg("first process's file lock is released", 45) is True
-    assert legato.wait_for_log_msg("second process is holding a file lock", 20) is True
+    assert log_mark.wait_for_msg("first process is holding a file lock", 20) is True
+    assert log_mark.wait_for_msg("second process is holding a file lock", 20) is False
+    assert log_mark.wait_for_msg("first process's file lock is released", 45) is True
+    assert log_mark.wait_for_msg("second process is holding a file lock", 20) is True
 
     mgs = "second process writes string 123 to the file"
-    assert legato.wait_for_log_msg(mgs, 20) is True
+    assert log_mark.wait_for_msg(mgs, 20) is True
 
     if (
         target.run(" %s stop %s" % (target_app_cmd, test_app_name), withexitstatus=1)[0]
@@ -9,6 +9,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -48,17 +50,15 @@ def L_AtomicFile_Operation_0001(target, legato, init_atomicFile):
     """
     test_app_name = "atomOpen"
     test_app_proc_name = "atomOpenProc"
-    target_log_cmd = "/sbin/logread"
     test_description = "notFound"
     swilog.debug(init_atomicFile)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
 
     rsp = legato.runProc(test_app_name, test_app_proc_name, APP_PATH, test_description)
 
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     swilog.info(rsp)
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the "
@@ -93,20 +93,18 @@ def L_AtomicFile_Operation_0002(target, legato, init_atomicFile):
     """
     test_app_name = "atomOpen"
     test_app_proc_name = "atomOpenProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = "/abc/def/abc.txt"
     test_description = "fault"
     swilog.debug(init_atomicFile)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
 
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
 
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     swilog.info(rsp)
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the"
@@ -142,21 +140,19 @@ def L_AtomicFile_Operation_0003(target, legato, init_atomicFile):
     test_app_name = "atomOpen"
     test_app_proc_name = "atomOpenProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "fd"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
 
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
 
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     swilog.info(rsp)
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the "
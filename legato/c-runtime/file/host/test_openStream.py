@@ -9,6 +9,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -50,18 +52,16 @@ def L_AtomicFile_Stream_0001(target, legato, init_atomicFile):
     """
     test_app_name = "atomOpenStream"
     test_app_proc_name = "atomOpenStreamProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "notFound"
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
 
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     swilog.info(rsp)
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the "
@@ -96,18 +96,16 @@ def L_AtomicFile_Stream_0002(target, legato, init_atomicFile):
     """
     test_app_name = "atomOpenStream"
     test_app_proc_name = "atomOpenStreamProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = "/abc/def/abc.txt"
     test_description = "fault"
     swilog.debug(init_atomicFile)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     swilog.info(rsp)
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get"
@@ -144,18 +142,16 @@ def L_AtomicFile_Stream_0003(target, legato, init_atomicFile):
     test_app_name = "atomOpenStream"
     test_app_proc_name = "atomOpenStreamProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "fp"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     rsp = legato.runProc(
         test_app_name, test_app_proc_name, test_file_path, test_description
     )
     time.sleep(5)
-    cmd = target_log_cmd
-    rsp = target.run(cmd)
+    rsp = log_mark.get_text()
     swilog.info(rsp)
     assert "PASSED" in rsp or "FAILED" in rsp, (
         "[FAILED] unable to get the"
@@ -8,6 +8,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -52,23 +54,20 @@ def L_AtomicFile_Operation_0024(target, legato, init_atomicFile):
     test_app_name = "atomTryCreate"
     test_app_proc_name = "atomTryCreateProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "duplicate"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's output message "
             "form the target's syslog"
         )
 
-    cmd = r"%s | grep \"\[PASSED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
@@ -100,23 +99,20 @@ def L_AtomicFile_Operation_0025(target, legato, init_atomicFile):
     """
     test_app_name = "atomTryCreate"
     test_app_proc_name = "atomTryCreateProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "wouldBlock"
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     target.run("ls -a /tmp")
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's output message "
             "form the target's syslog"
         )
 
-    cmd = r"%s | grep \"\[PASSED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
@@ -147,27 +143,25 @@ def L_AtomicFile_Operation_0026(target, legato, init_atomicFile):
     """
     test_app_name = "atomTryCreate"
     test_app_proc_name = "atomTryCreateProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "fd"
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     target.run("ls -a /tmp")
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's output message "
             "form the target's syslog"
         )
 
-    if legato.ssh_to_target(r"%s | grep \"\[PASSED\]\"" % target_log_cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
 @pytest.mark.usefixtures("app_leg")
-def L_AtomicFile_Operation_0027(legato, init_atomicFile):
+def L_AtomicFile_Operation_0027(target, legato, init_atomicFile):
     """Purpose: Verify that le_atomFile_TryCreate returns LE_FAULT.
 
     there was an error (accesses to a non-existed dir == 0:
@@ -193,27 +187,25 @@ def L_AtomicFile_Operation_0027(legato, init_atomicFile):
     """
     test_app_name = "atomTryCreate"
     test_app_proc_name = "atomTryCreateProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = "/abc/def/abc.txt"
     test_description = "fault"
     swilog.debug(init_atomicFile)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's output message"
             " form the target's syslog"
         )
 
-    if legato.ssh_to_target(r"%s | grep \"\[PASSED\]\"" % target_log_cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
 @pytest.mark.usefixtures("app_leg")
-def L_AtomicFile_Operation_0028(legato, init_atomicFile):
+def L_AtomicFile_Operation_0028(target, legato, init_atomicFile):
     """Purpose: Verify that le_atomFile_TryCreate can successfully.
 
     acquire a file lock to the target file
@@ -250,9 +242,9 @@ def L_AtomicFile_Operation_0028(legato, init_atomicFile):
     # Param: $1 - message to be expected from the log; $2 - wait time period
     # Post: return 0 when the message has been found; 1 otherwise
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
-    assert legato.wait_for_log_msg("first process is holding a file lock", 5) is True, (
+    assert log_mark.wait_for_msg("first process is holding a file lock", 5) is True, (
         "[FAILED] the first process"
         " can't acquire a file lock "
         "when it calls "
@@ -260,7 +252,7 @@ def L_AtomicFile_Operation_0028(legato, init_atomicFile):
     )
 
     assert (
-        legato.wait_for_log_msg("second process is holding a file lock", 120) is True
+        log_mark.wait_for_msg("second process is holding a file lock", 120) is True
     ), (
         "[FAILED] "
         "le_atomFile_TryCreate can't"
@@ -8,6 +8,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -24,7 +26,7 @@ APP_PATH = os.path.join(
 # Test functions
 # ======================================================================================
 @pytest.mark.usefixtures("app_leg")
-def L_AtomicFile_Operation_0037(legato, init_atomicFile):
+def L_AtomicFile_Operation_0037(target, legato, init_atomicFile):
     """Purpose: Verify that le_atomFile_TryDelete returns LE_NOT_FOUND.
 
     file doesn't exists == 0
@@ -49,26 +51,24 @@ def L_AtomicFile_Operation_0037(legato, init_atomicFile):
     """
     test_app_name = "atomTryDelete"
     test_app_proc_name = "atomTryDeleteProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "notFound"
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's output"
             " message form the target's syslog"
         )
 
-    if legato.ssh_to_target(r"%s | grep \"\[PASSED\]\"" % target_log_cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
 @pytest.mark.usefixtures("app_leg")
-def L_AtomicFile_Operation_0038(legato, init_atomicFile):
+def L_AtomicFile_Operation_0038(target, legato, init_atomicFile):
     """Purpose: Verify that le_atomFile_TryDelete returns LE_FAULT.
 
     there was an error (accesses to a non-existed dir == 0
@@ -93,22 +93,20 @@ def L_AtomicFile_Operation_0038(legato, init_atomicFile):
     """
     test_app_name = "atomTryDelete"
     test_app_proc_name = "atomTryDeleteProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = "/abc/def/abc.txt"
     test_description = "fault"
     swilog.debug(init_atomicFile)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's"
             " output message form the target's syslog"
         )
 
-    if legato.ssh_to_target(r"%s | grep \"\[PASSED\]\"" % target_log_cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
@@ -139,22 +137,20 @@ def L_AtomicFile_Operation_0039(target, legato, init_atomicFile):
     test_app_name = "atomTryDelete"
     test_app_proc_name = "atomTryDeleteProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "ok"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's"
             " output message form the target's syslog"
         )
 
-    if legato.ssh_to_target(r"%s | grep \"\[PASSED\]\"" % target_log_cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
     if target.run(" [ -e %s ]" % (test_file_path), withexitstatus=1)[0] != 0:
@@ -197,22 +193,20 @@ def L_AtomicFile_Operation_0040(target, legato, init_atomicFile):
     test_app_name = "atomTryDelete"
     test_app_proc_name = "atomTryDeleteProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "wouldBlock"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's"
             " output message form the target's syslog"
         )
 
-    if legato.ssh_to_target(r"%s | grep \"\[PASSED\]\"" % target_log_cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
     if target.run(" [ -e %s ]" % (test_file_path), withexitstatus=1)[0] == 0:
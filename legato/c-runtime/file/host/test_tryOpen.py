@@ -8,6 +8,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -48,24 +50,22 @@ def L_AtomicFile_Operation_0019(target, legato, init_atomicFile):
     test_app_name = "atomTryOpen"
     test_app_proc_name = "atomTryOpenProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "wouldBlock"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
 
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's output message"
             " form the target's syslog"
         )
 
-    if legato.ssh_to_target(r"%s | grep \"\[PASSED\]\"" % target_log_cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
@@ -96,27 +96,25 @@ def L_AtomicFile_Operation_0021(target, legato, init_atomicFile):
     test_app_name = "atomTryOpen"
     test_app_proc_name = "atomTryOpenProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "fd"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's output message "
             "form the target's syslog"
         )
 
-    if legato.ssh_to_target(r"%s | grep \"\[PASSED\]\"" % target_log_cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
 @pytest.mark.usefixtures("app_leg")
-def L_AtomicFile_Operation_0022(legato, init_atomicFile):
+def L_AtomicFile_Operation_0022(target, legato, init_atomicFile):
     """Purpose: Verify that le_atomFile_TryOpen returns LE_FAULT.
 
     there was an error (accesses to a non-existed dir == 0:
@@ -141,21 +139,18 @@ def L_AtomicFile_Operation_0022(legato, init_atomicFile):
     """
     test_app_name = "atomTryOpen"
     test_app_proc_name = "atomTryOpenProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = "/abc/def/abc.txt"
     test_description = "fault"
     swilog.debug(init_atomicFile)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's "
             "output message form the target's syslog"
         )
 
-    cmd = r"%s | grep \"\[PASSED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
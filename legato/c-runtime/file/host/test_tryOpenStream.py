@@ -8,6 +8,8 @@ import pytest
 
 from pytest_letp.lib import swilog, files
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ======================================================================================
 # Constants and Globals
@@ -51,28 +53,25 @@ def L_AtomicFile_Stream_0019(target, legato, init_atomicFile):
     test_app_name = "atomTryOpenStream"
     test_app_proc_name = "atomTryOpenStreamProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "wouldBlock"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's "
             "output message form the target's syslog"
         )
 
-    cmd = r"%s | grep \"\[PASSED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
 @pytest.mark.usefixtures("app_leg")
-def L_AtomicFile_Stream_0020(legato, init_atomicFile):
+def L_AtomicFile_Stream_0020(target, legato, init_atomicFile):
     """Purpose: Verify resultPtr of that le_atomFile_TryOpenStream returns.
 
     LE_NOT_FOUND  the file does not exist == 0
@@ -97,22 +96,19 @@ def L_AtomicFile_Stream_0020(legato, init_atomicFile):
     """
     test_app_name = "atomTryOpenStream"
     test_app_proc_name = "atomTryOpenStreamProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "notFound"
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's "
             "output message form the target's syslog"
         )
 
-    cmd = r"%s | grep \"\[PASSED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
@@ -143,28 +139,25 @@ def L_AtomicFile_Stream_0021(target, legato, init_atomicFile):
     test_app_name = "atomTryOpenStream"
     test_app_proc_name = "atomTryOpenStreamProc"
     hw_file_path = os.path.join(TEST_TOOLS, "testFile.txt")
-    target_log_cmd = "/sbin/logread"
     test_file_path = init_atomicFile
     test_description = "fp"
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's"
             " output message form the target's syslog"
         )
 
-    cmd = r"%s | grep \"\[PASSED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
 @pytest.mark.usefixtures("app_leg")
-def L_AtomicFile_Stream_0022(legato, init_atomicFile):
+def L_AtomicFile_Stream_0022(target, legato, init_atomicFile):
     """Purpose: Verify that resultPtr of le_atomFile_TryOpenStream returns.
 
     LE_FAULT  there was an error (accesses to a non-existed dir == 0
@@ -189,23 +182,20 @@ def L_AtomicFile_Stream_0022(legato, init_atomicFile):
     """
     test_app_name = "atomTryOpenStream"
     test_app_proc_name = "atomTryOpenStreamProc"
-    target_log_cmd = "/sbin/logread"
     test_file_path = "/abc/def/abc.txt"
     test_description = "fault"
     swilog.debug(init_atomicFile)
 
-    legato.clear_target_log()
+    log_mark = mark_log(target)
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    cmd = r"%s | grep \"\[PASSED\]\|\[FAILED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]", "[FAILED]"):
         assert 0, (
             "[FAILED] unable to get the test app's "
             "output message form the target's syslog"
         )
 
-    cmd = r"%s | grep \"\[PASSED\]\"" % target_log_cmd
-    if legato.ssh_to_target(cmd) != 0:
+    if not log_mark.find("[PASSED]"):
         assert 0, "test returned [FAILED]"
 
 
@@ -249,11 +239,11 @@ def L_AtomicFile_Stream_0023(target, legato, init_atomicFile):
     # Post: return 0 when the message has been found; 1 otherwise
 
     files.scp([hw_file_path], test_file_path, target.target_ip)
-    legato.clear_target_log()
+    log_mark = mark_log(target)
 
     legato.runProc(test_app_name, test_app_proc_name, test_file_path, test_description)
 
-    assert legato.wait_for_log_msg("first process is holding a file lock", 5) is True, (
+    assert log_mark.wait_for_msg("first process is holding a file lock", 5) is True, (
         "[FAILED] the first process "
         "can't acquire a file lock "
         "when it calls "
@@ -261,7 +251,7 @@ def L_AtomicFile_Stream_0023(target, legato, init_atomicFile):
     )
 
     assert (
-        legato.wait_for_log_msg("second process is holding a file lock", 120) is True
+        log_mark.wait_for_msg("second process is holding a file lock", 120) is True
     ), (
         "[FAILED] "
         "le_atomFile_TryOpenStream"
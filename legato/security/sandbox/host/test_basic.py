@@ -10,6 +10,8 @@ import pytest
 
 from pytest_letp.lib import swilog
 
+from common.log_query import LogPattern, query_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ====================================================================================
 # Constants and Globals
@@ -213,7 +215,7 @@ def L_SandBox_0006(target, logread):
 
 
 @pytest.mark.usefixtures("app_leg")
-def L_SandBox_0004(target, legato, logread):
+def L_SandBox_0004(target, logread):
     """Signaling other sandboxed apps.
 
     1) Run SB_110() from sandbox app \
@@ -223,7 +225,6 @@ def L_SandBox_0004(target, legato, logread):
     4) Kill itself
 
     :param target: fixture to communicate with the target
-    :param legato: fixture to call useful functions regarding legato
     :param logread: fixture to check logread on the target
     :param app_leg: fixture regarding to build, install and remove app
     """
@@ -237,12 +238,16 @@ def L_SandBox_0004(target, legato, logread):
     # Check message get PID from sandbox app
     check_message_in_log(logread, cur_pid_msg, parrent_pid_msg)
 
-    cur_rsp = legato.ssh_to_target(
-        '/sbin/logread | grep \\"%s\\"' % cur_pid_msg, output=True
-    )
-    parent_rsp = legato.ssh_to_target(
-        '/sbin/logread | grep \\"%s\\"' % parrent_pid_msg, output=True
+    # Both messages are searched in one pass of the log on the target
+    log = query_log(
+        target,
+        [
+            LogPattern("current", cur_pid_msg, regex=True),
+            LogPattern("parent", parrent_pid_msg, regex=True),
+        ],
     )
+    cur_rsp = "\n".join(log["current"])
+    parent_rsp = "\n".join(log["parent"])
 
     # Get current PID from log read
     cur_exp = r"(.*)Current PID: \[(.*)\](.*)"
@@ -9,6 +9,10 @@ import pytest
 import pexpect
 from pytest_letp.lib import swilog
 
+from common.build_cache import get_default_cache
+from common.log_query import LogPattern, query_log
+from common.teardown import defer_teardown, wait_for_teardown
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ====================================================================================
 # Constants and Globals
@@ -88,12 +92,12 @@ DEFAULT_VALUE_STR_TBL = {
 # ====================================================================================
 # Functions
 # ====================================================================================
-def sandbox_verification(val_under_test, expected_val, temp_output_file, test_title):
+def sandbox_verification(target, val_under_test, expected_val, test_title):
     """Verification sandbox limitation test.
 
+    :param target: fixture to communicate with the target
     :param val_under_test: value under test
     :param expected_val: expected value from the test
-    :param temp_output_file: temporary output file
     :param test_title: title of the test
 
     :returns exit_code: return value for verification sandbox
@@ -131,10 +135,15 @@ def sandbox_verification(val_under_test, expected_val, temp_output_file, test_ti
         )
         return 2
 
-    # NEED TO: use SED to get actual value, and trim leading/trailing spaces
-    cmd = "grep '%s' '%s'" % (current_limit_leading_str, temp_output_file)
-    swilog.info("Grep command: %s" % cmd)
-    rsp = pexpect.run(cmd, encoding="utf-8")
+    # Filter the log on the target: only the matching lines are transferred
+    log = query_log(
+        target,
+        [
+            LogPattern("limit", current_limit_leading_str),
+            LogPattern("runtime", runtime_verification_str, count=True),
+        ],
+    )
+    rsp = "\n".join(log["limit"])
     swilog.info(rsp)
 
     # Search value in grep response.
@@ -191,15 +200,9 @@ def sandbox_verification(val_under_test, expected_val, temp_output_file, test_ti
             )
             return exit_code
 
-    rsp, exit_status = pexpect.run(
-        "grep '%s' '%s'" % (runtime_verification_str, temp_output_file),
-        withexitstatus=True,
-        encoding="utf-8",
-    )
-    swilog.debug(rsp)
-    swilog.debug(exit_status)
+    swilog.debug(log["runtime"])
 
-    if exit_status != 0:
+    if log["runtime"] == 0:
         exit_code = 1
         swilog.info("[FAILED] Test of %s" % test_title)
         return exit_code
@@ -208,28 +211,44 @@ def sandbox_verification(val_under_test, expected_val, temp_output_file, test_ti
     return exit_code
 
 
-def make_install_sandbox_app(legato, tmpdir, app_name, app_path, expect_tst):
-    """Build and install sandbox test app.
+def build_sandbox_app(target, legato, tmpdir, app_name, app_path):
+    """Build sandbox test app on the host.
+
+    The app is taken from the build cache when the generated adef and its
+    sources did not change since a previous build.
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     :param tmpdir: fixture to provide a temporary directory
                  unique to the test invocation
     :param app_name: name of the app
     :param app_path: path to the adef file
-    :param expect_tst: expected value
+
+    :returns: True if the app was built
     """
     rsp = pexpect.run("cat %s/%s.adef" % (app_path, app_name), encoding="utf-8")
     swilog.info(rsp)
-    make_should_fail = False
 
     # Go to temp directory
     os.chdir(str(tmpdir))
     try:
-        legato.clean(app_name)
+        get_default_cache().make_app(legato, target.target_name, app_name, app_path)
     except:
-        swilog.info("Failed to clean the app.")
+        swilog.info("Failed to build the app.")
+        return False
+    return True
+
+
+def install_sandbox_app(legato, app_name, built, expect_tst):
+    """Install and start sandbox test app.
+
+    :param legato: fixture to call useful functions regarding legato
+    :param app_name: name of the app
+    :param built: True if the app was built
+    :param expect_tst: expected value
+    """
     try:
-        legato.make(app_name, app_path, make_should_fail)
+        assert built, "Failed to build %s" % app_name
         legato.clear_target_log()
         legato.install(app_name)
         legato.start(app_name)
@@ -274,16 +293,15 @@ def sandbox(target, legato, tmpdir, tpl_val, expect_tst, failed_reason, init_san
     )
     swilog.info(rsp)
 
-    expect_tst = make_install_sandbox_app(
-        legato, tmpdir, list_obj[0], list_obj[1], expect_tst
-    )
+    # Build on the host while the cleanup of the previous test runs (it also
+    # removes the app from the target)
+    built = build_sandbox_app(target, legato, tmpdir, list_obj[0], list_obj[1])
+    wait_for_teardown()
 
-    if expect_tst != "invalid":
-        logread = target.run("/sbin/logread")
-        with open("temp.out", "w") as f:
-            f.write(logread.replace("\r", ""))
+    expect_tst = install_sandbox_app(legato, list_obj[0], built, expect_tst)
 
-        status = sandbox_verification(tpl_val, expect_tst, "temp.out", list_obj[3])
+    if expect_tst != "invalid":
+        status = sandbox_verification(target, tpl_val, expect_tst, list_obj[3])
 
         # Test is passed if verification OK
         # Or if status != 0 but there is a reason to fail.
@@ -299,6 +317,12 @@ def sandbox(target, legato, tmpdir, tpl_val, expect_tst, failed_reason, init_san
         assert status == 0 or operator2, err_msg
 
 
+def _remove_app(legato, app_name):
+    """Remove the test app from the target (teardown action)."""
+    if legato.is_app_exist(app_name):
+        legato.remove(app_name)
+
+
 # ====================================================================================
 # Local fixtures
 # ====================================================================================
@@ -320,14 +344,17 @@ def init_sandbox(request, legato):
 
     yield (app_name, app_path, template_name, test_title)
 
-    if legato.is_app_exist(app_name):
-        legato.clean(app_name)
+    # The generated adef is rewritten by the next test: remove it now. Only
+    # the target is cleaned in background: the build outputs are in the
+    # tmpdir of the test, where the next test does not build.
     pexpect.run("rm %s/%s.adef" % (app_path, app_name), encoding="utf-8")
+    defer_teardown("removal of %s" % app_name, _remove_app, legato, app_name)
 
 
 # ====================================================================================
 # Test functions
 # ====================================================================================
+@pytest.mark.deferred_barrier
 @pytest.mark.parametrize(
     ("tpl_val", "expect_tst", "failed_reason"),
     [
@@ -365,6 +392,7 @@ def L_SandBox_0007(
     sandbox(target, legato, tmpdir, tpl_val, expect_tst, failed_reason, init_sandbox)
 
 
+@pytest.mark.deferred_barrier
 @pytest.mark.parametrize(
     ("tpl_val", "expect_tst", "failed_reason"),
     [
@@ -404,6 +432,7 @@ def L_SandBox_0010(
     sandbox(target, legato, tmpdir, tpl_val, expect_tst, failed_reason, init_sandbox)
 
 
+@pytest.mark.deferred_barrier
 @pytest.mark.parametrize(
     ("tpl_val", "expect_tst", "failed_reason"),
     [
@@ -457,6 +486,7 @@ def L_SandBox_0012(
     sandbox(target, legato, tmpdir, tpl_val, expect_tst, failed_reason, init_sandbox)
 
 
+@pytest.mark.deferred_barrier
 @pytest.mark.parametrize(
     ("tpl_val", "expect_tst", "failed_reason"),
     [
@@ -7,6 +7,8 @@ import time
 import pytest
 from pytest_letp.lib import swilog
 
+from common.log_collector import mark_log
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 # ====================================================================================
 # Constants and Globals
@@ -47,10 +49,11 @@ def set_test_app_repeat_cycle(target, test_cycle):
     assert exit_status == 0
 
 
-def check_log(legato, test_title):
+def check_log(legato, log_mark, test_title):
     """Check log for test app.
 
     :param legato: fixture to call useful functions regarding legato
+    :param log_mark: mark taken before the test app was restarted
     :param test_title: title of test
 
     :returns 1: Failed to check log
@@ -60,12 +63,12 @@ def check_log(legato, test_title):
     retry_count = 0
     retry_max = 5
 
-    cmd = r"/sbin/logread | grep -c '\- Round \['"
-    last_round_count = legato.ssh_to_target(cmd, output=True)
+    round_text = "- Round ["
+    last_round_count = log_mark.count(round_text)
 
     while last_round_count == 0 and retry_count <= retry_max:
         time.sleep(1)
-        last_round_count = legato.ssh_to_target(cmd, output=True)
+        last_round_count = log_mark.count(round_text)
         retry_count += 1
 
     err_msg = (
@@ -90,7 +93,7 @@ def check_log(legato, test_title):
 
         # If app has stopped, there is already a definite result; exit loop.
         if legato.is_app_running(APP_NAME):
-            new_round_count = legato.ssh_to_target(cmd, output=True)
+            new_round_count = log_mark.count(round_text)
             if new_round_count == last_round_count:
                 break
 
@@ -102,7 +105,7 @@ def check_log(legato, test_title):
         time.sleep(10)
         retry_count += 1
 
-    if legato.find_in_target_log("Secure Storage Test Passed"):
+    if log_mark.find("Secure Storage Test Passed"):
         swilog.info("[PASSED] %s" % test_title)
         return 0
 
@@ -119,40 +122,6 @@ def check_log(legato, test_title):
         return 1
 
 
-def restart_syslog(target, legato):
-    """Restart syslog and try to re-mount the log socket.
-
-    Since sandbox is persistent May 2016.
-
-    :param target: fixture to communicate with the target
-    :param legato: fixture to call useful functions regarding legato
-    """
-    # Restart syslogd to have a clean slate of logs
-    legato.clear_target_log()
-
-    # (May 2016) Since sandbox is now persistent,
-    # the log socket has to be re-mounted.
-    # If an app has already started, doing the above without re-mounting
-    # the log socket will cause the app's logs not showing up in syslog.
-    # Consider putting this in common.sh.
-    # Another solution is, instead of restarting syslogd,
-    # do "logread -f > logfile &" at the point where log needs to be captured
-    # (typically before test app start), and kill that process
-    # and grep logfile when test app finishes.  It's less convenient.
-    test_app_log_socket = "/legato/systems/current/appsWriteable/%s/dev/log" % APP_NAME
-    exit_status, rsp = target.run(
-        "umount %s" % test_app_log_socket, withexitstatus=True
-    )
-    swilog.debug(rsp)
-    assert exit_status == 0, "[FAILED] Unmount failed."
-
-    exit_status, rsp = target.run(
-        "mount --bind /dev/log %s" % test_app_log_socket, withexitstatus=True
-    )
-    swilog.debug(rsp)
-    assert exit_status == 0, "[FAILED] Mount failed."
-
-
 def secure_storage_test_post(target, legato, test_title, test_type, test_cycle):
     """Secure storage test post.
 
@@ -164,13 +133,13 @@ def secure_storage_test_post(target, legato, test_title, test_type, test_cycle):
     """
     time.sleep(5)
     assert test_title != "", "[FAILED] Test title is empty."
-    restart_syslog(target, legato)
+    log_mark = mark_log(target)
     set_test_app_test_type(target, test_type)
     set_test_app_repeat_cycle(target, test_cycle)
     legato.restart(APP_NAME)
 
     err_msg = "[FAILED] Secure Storage test post failed."
-    assert check_log(legato, test_title) == 0, err_msg
+    assert check_log(legato, log_mark, test_title) == 0, err_msg
 
 
 # ====================================================================================
@@ -206,7 +175,7 @@ def test_app(legato, tmpdir):
 # Test functions
 # ====================================================================================
 @pytest.mark.usefixtures("test_app")
-def L_SecureStorage_0004(legato):
+def L_SecureStorage_0004(target, legato):
     """Multiple apps have independent access to the secured storage.
 
     Verification:
@@ -224,23 +193,23 @@ def L_SecureStorage_0004(legato):
            stored, by using the "read" API in both apps, and check that the
            data read are as per the originally written data in steps 1 and 2.
 
+    :param target: fixture to communicate with the target
     :param legato: fixture to call useful functions regarding legato
     :param test_app: fixture regarding to build, install and remove app
     """
     swilog.step("Execute L_SecureStorage_0004")
-    legato.clear_target_log()
+    log_mark = mark_log(target)
 
     legato.runProc("%s" % TEST_APP_A, "--exe=%s" % TEST_APP_A, "write")
     legato.runProc("%s" % TEST_APP_B, "--exe=%s" % TEST_APP_B, "write")
     legato.runProc("%s" % TEST_APP_A, "--exe=%s" % TEST_APP_A, "read")
     legato.runProc("%s" % TEST_APP_B, "--exe=%s" % TEST_APP_B, "read")
 
-    time.sleep(10)
-    rsp1 = legato.find_in_target_log(
-        "appA successfully read" " its own written content"
+    rsp1 = log_mark.wait_for_msg(
+        "appA successfully read" " its own written content", 10
     )
-    rsp2 = legato.find_in_target_log(
-        "appB successfully read" " its own written content"
+    rsp2 = log_mark.wait_for_msg(
+        "appB successfully read" " its own written content", 10
     )
     if not rsp1:
         swilog.error("%s doesn't read what it wrote" % TEST_APP_A)
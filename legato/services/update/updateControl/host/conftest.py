@@ -4,11 +4,28 @@ import os
 
 import pytest
 
+from common.golden import restore_golden_legato
+from common.teardown import defer_teardown
+
 __copyright__ = "Copyright (C) Sierra Wireless Inc."
 
 
+def remove_apps(legato, app_names):
+    """Stop and remove apps from the target (teardown action).
+
+    :param legato: fixture to call useful functions regarding legato
+    :param app_names: names of the apps
+    """
+    for app_name in app_names:
+        # Stop the app if it is running
+        if legato.is_app_running(app_name):
+            legato.stop(app_name)
+        if legato.is_app_exist(app_name):
+            legato.remove(app_name)
+
+
 @pytest.fixture()
-def clean_test(legato, tmpdir):
+def clean_test(target, legato, tmpdir):
     """Fixture to clean up legato after the test.
 
     :param target: fixture to communicate with the target
@@ -18,7 +35,26 @@ def clean_test(legato, tmpdir):
     """
     os.chdir(str(tmpdir))
     yield True
-    legato.restore_golden_legato()
+    defer_teardown("golden restore", restore_golden_legato, target, legato)
+
+
+@pytest.fixture()
+def removed_apps(legato):
+    """Remove apps from the target after the test.
+
+    The removal is a deferred teardown action: it only touches the target,
+    the build outputs stay in the tmpdir of the test.
+
+    :param legato: fixture to call useful functions regarding legato
+
+    :returns: list to which the names of the apps to remove are added
+    """
+    app_names = []
+    yield app_names
+    if app_names:
+        defer_teardown(
+            "removal of %s" % ", ".join(app_names), remove_apps, legato, app_names
+        )
 
 
 @pytest.fixture()
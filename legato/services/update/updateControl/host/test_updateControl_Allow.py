@@ -26,11 +26,12 @@ APP_PATH_02 = os.path.join(APP_PATH_00, "helloWorldApp")
 # Local fixtures
 # ======================================================================================
 @pytest.fixture(autouse=True)
-def install_and_clean_app(legato, clean_test):
+def install_and_clean_app(legato, clean_test, removed_apps):
     """Clean up environment and install app.
 
     :param legato: fixture to call useful functions regarding legato
     :param clean_test: fixture to clean up environment
+    :param removed_apps: fixture removing apps from the target after the test
     """
     assert clean_test
     if legato.get_current_system_index() != 0:
@@ -40,11 +41,7 @@ def install_and_clean_app(legato, clean_test):
     swilog.info("[PASSED] Make and install the test app successfully.")
     yield
     # Clean environment
-    for app_name in [APP_NAME_01, APP_NAME_02]:
-        # Stop the app if it is running
-        if legato.is_app_running(app_name):
-            legato.stop(app_name)
-        legato.clean(app_name)
+    removed_apps.extend([APP_NAME_01, APP_NAME_02])
 
 
 # ======================================================================================
@@ -28,11 +28,12 @@ HELLO_WORLD_PATH = os.path.join(APP_PATH, "helloWorldApp")
 # Local fixtures
 # ======================================================================================
 @pytest.fixture()
-def install_and_clean_app(legato, clean_test, request):
+def install_and_clean_app(legato, clean_test, removed_apps, request):
     """Clean up environment and install app.
 
     :param legato: fixture to call useful functions regarding legato
     :param clean_test: fixture to clean up environment
+    :param removed_apps: fixture removing apps from the target after the test
     """
     assert clean_test
     if legato.get_current_system_index() != 0:
@@ -42,13 +43,10 @@ def install_and_clean_app(legato, clean_test, request):
     swilog.info("[PASSED] Make and install the test app successfully.")
     yield
     test_name = request.node.name
-    for app_name in [UPDATE_CTRL_APP, HELLO_WORLD_APP]:
-        # Stop the app if it is running
-        if legato.is_app_running(app_name):
-            legato.stop(app_name)
-        legato.clean(app_name)
-        if test_name != "L_UpdateCtrl_Defer_0004":
-            break
+    app_names = [UPDATE_CTRL_APP]
+    if test_name == "L_UpdateCtrl_Defer_0004":
+        app_names.append(HELLO_WORLD_APP)
+    removed_apps.extend(app_names)
 
 
 # ======================================================================================
@@ -23,12 +23,13 @@ APP_PATH_01 = os.path.join(APP_PATH_00, "testUpdateCtrlApp")
 # Local fixtures
 # ======================================================================================
 @pytest.fixture()
-def install_and_clean_app(request, legato, clean_test):
+def install_and_clean_app(request, legato, clean_test, removed_apps):
     """Clean up environment and install app.
 
     :param request: object to access data
     :param legato: fixture to call useful functions regarding legato
     :param clean_test: fixture to clean up environment
+    :param removed_apps: fixture removing apps from the target after the test
     """
     assert clean_test
     test_name = request.node.name
@@ -43,9 +44,7 @@ def install_and_clean_app(request, legato, clean_test):
     legato.make_install(APP_NAME_01, APP_PATH_01)
     swilog.info("[PASSED] Make and install the test app successfully.")
     yield
-    if legato.is_app_running(APP_NAME_01):
-        legato.stop(APP_NAME_01)
-    legato.clean(APP_NAME_01)
+    removed_apps.append(APP_NAME_01)
 
 
 # ======================================================================================